@@ -6,8 +6,10 @@ import sys
 from openpyxl import load_workbook
 from PIL import Image as PILImage
 # 将项目根目录添加到系统路径
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
 from utils import ComfyApiWrapper, ComfyWorkflowWrapper, ComfyWebSocketClient
+from utils.model_catalog import load_model_catalog, ModelIndex
 
 # 配置日志
 logging.basicConfig(stream=sys.stdout, level=logging.INFO)
@@ -23,7 +25,11 @@ class BatchModelTester:
             comfy_host: ComfyUI服务器地址
         """
         self.model_info_path = model_info_path
-        self.model_info_wb = load_workbook(model_info_path, data_only=True)
+        self.model_catalog = None
+        self.sd_models = []
+        self.lora_models = []
+        self.sd_index = ModelIndex([])
+        self.lora_index = ModelIndex([])
         self.comfy_host = comfy_host
         self.ws_client = None
     
@@ -49,32 +55,15 @@ class BatchModelTester:
     def load_model_info(self):
         """
         加载模型信息表格中的数据
+        使用只读流式模式解析（不加载预览图片），表格未修改时直接使用缓存
         """
-        # 加载Stable-diffusion工作簿数据
-        if "Stable-diffusion" in self.model_info_wb.sheetnames:
-            sd_sheet = self.model_info_wb["Stable-diffusion"]
-            headers = [cell.value for cell in sd_sheet[1]]
-            self.sd_models = []
-            for row in sd_sheet.iter_rows(min_row=2, values_only=True):
-                model_data = {headers[i]: row[i] for i in range(len(headers))}
-                if model_data.get("文件名"):
-                    self.sd_models.append(model_data)
-        else:
-            self.sd_models = []
-            logger.warning("模型信息表格中没有Stable-diffusion工作簿")
-        
-        # 加载Lora工作簿数据
-        if "Lora" in self.model_info_wb.sheetnames:
-            lora_sheet = self.model_info_wb["Lora"]
-            headers = [cell.value for cell in lora_sheet[1]]
-            self.lora_models = []
-            for row in lora_sheet.iter_rows(min_row=2, values_only=True):
-                model_data = {headers[i]: row[i] for i in range(len(headers))}
-                if model_data.get("文件名"):
-                    self.lora_models.append(model_data)
-        else:
-            self.lora_models = []
-            logger.warning("模型信息表格中没有Lora工作簿")
+        self.model_catalog = load_model_catalog(self.model_info_path, ("Stable-diffusion", "Lora"))
+        self.sd_models = self.model_catalog.rows("Stable-diffusion")
+        self.lora_models = self.model_catalog.rows("Lora")
+        # 建立按路径/文件名/ComfyUI路径的查找索引，处理测试表时不再逐行遍历模型列表
+        self.sd_index = self.model_catalog.index("Stable-diffusion")
+        self.lora_index = self.model_catalog.index("Lora")
+        logger.info(f"已加载模型信息: Stable-diffusion {len(self.sd_models)} 个, Lora {len(self.lora_models)} 个")
     
     def process_test_file(self, test_file_path):
         """
@@ -125,7 +114,11 @@ class BatchModelTester:
         
         # 加载工作流
         try:
-            workflow = ComfyWorkflowWrapper(f'workflow/{workflow_file}')
+            workflow_path = f'workflow/{workflow_file}'
+            if not os.path.exists(workflow_path):
+                # 从其他目录调用时（如训练流程中边训练边测试），使用项目根目录下的workflow
+                workflow_path = os.path.join(ROOT_DIR, "workflow", workflow_file)
+            workflow = ComfyWorkflowWrapper(workflow_path)
         except Exception as e:
             logger.error(f"加载工作流失败: {e}")
             return
@@ -193,18 +186,14 @@ class BatchModelTester:
                 
                 # 如果编号和触发词为空，从模型信息表中查找
                 if not model_id or not trigger_word:
-                    for sd_model in self.sd_models:
-                        if model_path_for_search and sd_model.get("文件名"):
-                            # 规范化比较路径
-                            sd_path = os.path.normpath(sd_model.get("文件名"))
-                            if model_path_for_search in sd_path or sd_path in model_path_for_search:
-                                if not model_id:
-                                    model_id = sd_model.get("编号")
-                                    base_sheet.cell(row=row_idx, column=model_id_idx+1, value=model_id)
-                                if not trigger_word:
-                                    trigger_word = sd_model.get("触发词")
-                                    base_sheet.cell(row=row_idx, column=trigger_idx+1, value=trigger_word)
-                                break
+                    sd_model = self.sd_index.find(model_path_for_search)
+                    if sd_model:
+                        if not model_id:
+                            model_id = sd_model.get("编号")
+                            base_sheet.cell(row=row_idx, column=model_id_idx+1, value=model_id)
+                        if not trigger_word:
+                            trigger_word = sd_model.get("触发词")
+                            base_sheet.cell(row=row_idx, column=trigger_idx+1, value=trigger_word)
                 
                 # 构建图片保存路径
                 prompt_id = params.get("提示词编号", {}).get("值")
@@ -273,12 +262,9 @@ class BatchModelTester:
             model_path_for_search = os.path.normpath(default_model)
             
         # 从模型信息表中查找默认底模的编号
-        for sd_model in self.sd_models:
-            if sd_model.get("文件名"):
-                sd_path = os.path.normpath(sd_model.get("文件名"))
-                if model_path_for_search in sd_path or sd_path in model_path_for_search:
-                    default_model_id = sd_model.get("编号")
-                    break
+        sd_model = self.sd_index.find(model_path_for_search)
+        if sd_model:
+            default_model_id = sd_model.get("编号")
         
         if not default_model_id:
             logger.warning("未找到默认底模的编号，将使用文件名作为编号")
@@ -335,19 +321,16 @@ class BatchModelTester:
                     if isinstance(lora_value, list) and len(lora_value) > 0:
                         lora_path_for_search = lora_value[0]
                     
-                    for lora_model in self.lora_models:
-                        if (lora_path_for_search and 
-                            lora_model.get("文件名") and 
-                            lora_model.get("文件名") in lora_path_for_search):
-                            if not lora_id:
-                                lora_id = lora_model.get("编号")
-                                if model_id_idx is not None:
-                                    lora_sheet.cell(row=row_idx, column=model_id_idx+1, value=lora_id)
-                            if not trigger_word:
-                                trigger_word = lora_model.get("触发词")
-                                if trigger_idx is not None:
-                                    lora_sheet.cell(row=row_idx, column=trigger_idx+1, value=trigger_word)
-                            break
+                    lora_model = self.lora_index.find(lora_path_for_search)
+                    if lora_model:
+                        if not lora_id:
+                            lora_id = lora_model.get("编号")
+                            if model_id_idx is not None:
+                                lora_sheet.cell(row=row_idx, column=model_id_idx+1, value=lora_id)
+                        if not trigger_word:
+                            trigger_word = lora_model.get("触发词")
+                            if trigger_idx is not None:
+                                lora_sheet.cell(row=row_idx, column=trigger_idx+1, value=trigger_word)
                 
                 # 构建图片保存路径
                 prompt_id = params.get("提示词编号", {}).get("值")
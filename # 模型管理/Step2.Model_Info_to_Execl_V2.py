@@ -94,17 +94,155 @@ import time
 import json
 import datetime
 import shutil
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from openpyxl import load_workbook
 from openpyxl.utils import get_column_letter
-from openpyxl.styles import Alignment, Font
+from openpyxl.styles import Alignment, Font, NamedStyle
+from copy import copy
 import openpyxl.utils
 from openpyxl.drawing.image import Image as OpenpyxlImage
 from PIL import Image as PILImage
 from openpyxl.worksheet.hyperlink import Hyperlink
 from openpyxl import Workbook
 
+# 将项目根目录添加到系统路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.model_snapshot import ModelSnapshot
+from utils.model_hash import HashService, hash_matches
+from utils.safetensors_header import read_summaries
+from utils.model_dedupe import find_duplicates, snapshot_files
+from utils.preview_gallery import PreviewGallery
+from utils.move_planner import MovePlanner, apply_journal_to_workbook, read_journal, replay_journal, rollback_journal
 
-def json_to_execl(folder_path):
+
+# 报告类工作表，不是模型目录，各步骤遍历工作表时跳过
+DUPLICATE_SHEET = "重复模型"
+REMOVED_SHEET = "已删除模型"
+REPORT_SHEETS = {DUPLICATE_SHEET, REMOVED_SHEET}
+
+def catalog_sheets(wb):
+    """返回模型目录工作表名（排除报告类工作表）"""
+    return [sheet for sheet in wb.sheetnames if sheet not in REPORT_SHEETS]
+
+def header_map(ws):
+    """
+    读取工作表表头，返回 {列名: 列号(从1开始)}，每个工作表在每个步骤中只解析一次
+    """
+    return {cell.value: cell.column for cell in next(ws.iter_rows(min_row=1, max_row=1)) if cell.value is not None}
+
+def path_exists(path, snapshot=None):
+    # 有快照时直接查快照，不再逐个访问磁盘
+    return snapshot.exists(path) if snapshot is not None else os.path.exists(path)
+
+def execute_move_plan(planner, folder_path, wb, snapshot=None, name="move"):
+    """
+    检查冲突后执行移动计划，全部成功后按日志更新工作簿和快照；出错时已完成的移动会被回滚，工作簿不做修改
+    
+    Args:
+        planner: MovePlanner 实例，分组为(工作表名, 行号)
+        folder_path: 模型根目录，日志保存在其下的#backup文件夹
+        wb: 工作簿
+        snapshot: 文件快照
+        name: 计划名称，用于日志文件名
+    
+    Returns:
+        成功返回True，失败返回False
+    """
+    for (sheet, row), message in planner.resolve_conflicts():
+        print(f"跳过 {sheet} 第{row}行: {message}")
+    if not planner.row_updates:
+        print(f"{name}: 没有需要处理的行")
+        return True
+    
+    timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+    journal_path = os.path.join(folder_path, "#backup", f"{name}_journal_{timestamp}.jsonl")
+    print(f"{name}计划: {len(planner.row_updates)} 行，{len(planner.ops)} 个文件移动")
+    result = planner.execute(journal_path)
+    print(f"{name}执行{'成功' if result['success'] else '失败'}: 完成 {result['moved']} 次移动，耗时 {result['elapsed']:.2f} 秒")
+    print(f"日志文件: {journal_path}")
+    if not result["success"]:
+        print(f"出错，已回滚全部移动: {result['error']}")
+        return False
+    
+    apply_journal_to_workbook(wb, journal_path)
+    if snapshot is not None:
+        _, steps, _ = read_journal(journal_path)
+        for step in steps:
+            snapshot.rename(step["from"], step["to"])
+    return True
+
+
+def describe_safetensors(summary):
+    """
+    将safetensors头部信息整理为notes文本，如"底模: SDXL, dim: 32, alpha: 16"
+    """
+    parts = []
+    if summary["base_model"]:
+        parts.append(f"底模: {summary['base_model']}")
+    if summary["network_dim"]:
+        parts.append(f"dim: {summary['network_dim']}")
+    if summary["network_alpha"]:
+        parts.append(f"alpha: {summary['network_alpha']}")
+    if summary["training_comment"]:
+        parts.append(summary["training_comment"])
+    return ", ".join(parts)
+
+def change_keys(folder_path, rel_paths):
+    """快照对比结果中的相对路径 -> 规范化的绝对路径集合"""
+    return {os.path.normcase(os.path.abspath(os.path.join(folder_path, rel_path))) for rel_path in rel_paths}
+
+def report_removed_models(folder_path, wb, changes):
+    """
+    表格中模型文件已被删除（或被重命名/移走）的行追加记录到"已删除模型"工作表，由用户确认后手动删除
+    
+    Returns:
+        记录的行数
+    """
+    removed = {key: "" for key in change_keys(folder_path, changes["removed"])}
+    for old_path, new_path in changes["renamed"]:
+        removed[os.path.normcase(os.path.abspath(os.path.join(folder_path, old_path)))] = f"重命名为 {new_path}"
+    if not removed:
+        return 0
+    
+    found = []
+    for sheet in catalog_sheets(wb):
+        ws = wb[sheet]
+        columns = header_map(ws)
+        index_文件名 = columns['文件名']
+        index_拓展名 = columns['拓展名']
+        index_文件夹名 = columns['文件夹名']
+        for row_number, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
+            file_name = row[index_文件名-1]
+            if not file_name:
+                continue
+            model_path = os.path.join(folder_path, sheet, row[index_文件夹名-1] or '', f'{file_name}{row[index_拓展名-1] or ""}')
+            key = os.path.normcase(os.path.abspath(model_path))
+            if key in removed:
+                found.append([sheet, row_number, file_name, os.path.relpath(model_path, folder_path), removed[key]])
+    if not found:
+        return 0
+    
+    if REMOVED_SHEET in wb.sheetnames:
+        ws = wb[REMOVED_SHEET]
+    else:
+        ws = wb.create_sheet(title=REMOVED_SHEET)
+        ws.append(["工作表", "行号", "文件名", "路径", "说明", "检测时间"])
+        ws.column_dimensions['D'].width = 80
+    detected = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for values in found:
+        ws.append(values + [detected])
+        print(f"模型文件已删除: {values[0]} 第{values[1]}行 {values[3]} {values[4]}")
+    return len(found)
+
+def json_to_execl(folder_path, wb=None, snapshot=None, read_safetensors=True, changes=None):
+    """
+    把model_info.json中的新模型追加到表格
+    
+    Args:
+        changes: 文件快照的对比结果，提供时把模型文件已被删除或重命名的行记录到"已删除模型"工作表
+                 （JSON中表格里还没有的模型始终全部导入，不按对比结果过滤：文件可能早于JSON记录出现）
+    """
     json_name = "model_info.json"
     json_path = os.path.join(folder_path, json_name)
     with open(json_path, 'r', encoding='utf-8') as f:
@@ -112,9 +250,12 @@ def json_to_execl(folder_path):
     
     excel_name = "model_info.xlsx"
     excel_path = os.path.join(folder_path, excel_name)
-    wb = load_workbook(excel_path)
+    # 传入wb时由run_catalog_session统一加载和保存
+    standalone = wb is None
+    if standalone:
+        wb = load_workbook(excel_path)
     
-    sheets = wb.sheetnames
+    sheets = catalog_sheets(wb)
     # 先遍历所有工作表清空已有图片
     for sheet in sheets:
         ws = wb[sheet]
@@ -130,6 +271,22 @@ def json_to_execl(folder_path):
             default_sheet = wb[sheet]
             wb.remove(default_sheet)
     
+    # 每个工作表已有的文件名集合，只构建一次，追加新行时同步更新，避免每条记录都重新扫描整张表
+    existing_names = {}
+    for sheet in catalog_sheets(wb):
+        existing_names[sheet] = {row[0] for row in wb[sheet].iter_rows(min_row=2, max_col=1, values_only=True)}
+    # 待追加的新行，全部处理完后按工作表批量写入
+    pending_rows = {}
+    if changes is not None:
+        report_removed_models(folder_path, wb, changes)
+    # 新行对应的safetensors文件 [(模型路径, 行数据)]，用于从文件头补充信息
+    safetensors_rows = []
+    headers = [
+        "文件名", "拓展名", "原名", "文件夹名", "ComfyUI路径", "新文件夹", "类型", "风格", "用途", "版本", "url", "图片路径", "图片预览", 
+        "描述", "SD Link", "特指词", "主描述词", "触发词", "可选形象", "可选服装", "notes", "默认权重", "权重范围", "否定提示词", 
+        "hash","喜爱", "修改时间"
+    ]
+    
     for file_path, model_info in json_data.items():
         # 分解路径和文件信息
         split_list = file_path.split('\\')
@@ -152,40 +309,30 @@ def json_to_execl(folder_path):
         
         # 判断模型文件是否存在
         model_path = os.path.join(model_dir, file_name_ext)
-        if not os.path.exists(model_path):
+        if not path_exists(model_path, snapshot):
+            continue
+        
+        # 检查数据是否存在，已存在的记录不再读取模型JSON
+        if file_name in existing_names.get(sheet_name, ()):
             continue
         
         # 读取模型 JSON 信息
         model_extra_info = {}
-        if os.path.exists(model_json_path):
+        if path_exists(model_json_path, snapshot):
             with open(model_json_path, 'r', encoding='utf-8') as f:
                 model_extra_info = json.load(f)
         
         # 检查文件是否存在
-        img_exists = os.path.exists(img_path)
-        json_exists = os.path.exists(model_json_path)
+        img_exists = path_exists(img_path, snapshot)
+        json_exists = path_exists(model_json_path, snapshot)
         
         # 如果工作表不存在，则创建
         if sheet_name not in wb.sheetnames:
             ws = wb.create_sheet(title=sheet_name)
             # 写入表头
-            headers = [
-                "文件名", "拓展名", "原名", "文件夹名", "ComfyUI路径", "新文件夹", "类型", "风格", "用途", "版本", "url", "图片路径", "图片预览", 
-                "描述", "SD Link", "特指词", "主描述词", "触发词", "可选形象", "可选服装", "notes", "默认权重", "权重范围", "否定提示词", 
-                "hash","喜爱", "修改时间"
-            ]
             ws.append(headers)
-        else:
-            ws = wb[sheet_name]
-        
-        # 检查数据是否存在
-        file_name_exsit = False
-        for row in ws.iter_rows(min_row=2):
-            if row[0].value == file_name:
-                file_name_exsit = True
-                break
-        if file_name_exsit:
-            continue
+            existing_names[sheet_name] = set()
+        existing_names[sheet_name].add(file_name)
         
         # 写入行数据
         # 计算ComfyUI路径
@@ -220,44 +367,60 @@ def json_to_execl(folder_path):
             model_info.get("is_favorite", ""), #24 喜爱
             model_info.get("last_modified", ""), #25 修改时间
         ]
-        ws.append(row_data)
+        pending_rows.setdefault(sheet_name, []).append(row_data)
+        if read_safetensors and file_ext.lower() == '.safetensors':
+            safetensors_rows.append((model_path, row_data))
     
-    wb.save(excel_path)
+    # 并行读取新模型的safetensors文件头，只补充为空的触发词和notes
+    # 类型列会参与rename_filenames生成文件名，不自动填写，底模写入notes供手动确认
+    if safetensors_rows:
+        start = time.perf_counter()
+        summaries = read_summaries([path for path, _ in safetensors_rows])
+        index_触发词 = headers.index('触发词')
+        index_notes = headers.index('notes')
+        for model_path, row_data in safetensors_rows:
+            summary = summaries.get(model_path)
+            if summary is None:
+                continue
+            if not row_data[index_触发词]:
+                row_data[index_触发词] = summary["trigger_words"]
+            if not row_data[index_notes]:
+                row_data[index_notes] = describe_safetensors(summary)
+        print(f"读取safetensors文件头: {len(summaries)}/{len(safetensors_rows)} 个，耗时 {time.perf_counter() - start:.2f} 秒")
+    
+    # 批量追加新行
+    for sheet_name, rows in pending_rows.items():
+        ws = wb[sheet_name]
+        for row_data in rows:
+            ws.append(row_data)
+    
+    if standalone:
+        wb.save(excel_path)
 
 
-def rename_filenames(folder_path):
+def rename_filenames(folder_path, wb=None, snapshot=None):
     excel_name = "model_info.xlsx"
     excel_path = os.path.join(folder_path, excel_name)
-    wb = load_workbook(excel_path)
+    standalone = wb is None
+    if standalone:
+        wb = load_workbook(excel_path)
+    planner = MovePlanner(exists=lambda path: path_exists(path, snapshot))
     
-    sheets = wb.sheetnames
+    sheets = catalog_sheets(wb)
     for sheet in sheets:
         ws = wb[sheet]
         
         # 获取表头索引
-        columns = [cell.value for cell in list(ws.iter_rows(min_row=1, max_row=1))[0]]
-        index_文件名 = columns.index('文件名')+1
-        index_拓展名 = columns.index('拓展名')+1
-        index_原名 = columns.index('原名')+1
-        index_文件夹名 = columns.index('文件夹名')+1
-        index_图片路径 = columns.index('图片路径')+1
-        index_类型 = columns.index('类型')+1
-        index_风格 = columns.index('风格')+1
-        index_用途 = columns.index('用途')+1
-        index_版本 = columns.index('版本')+1
-        
-        rows = list(ws.iter_rows(min_row=2, values_only=True))
-        total_rows = len(rows)  
-        columns = [cell.value for cell in list(ws.iter_rows(min_row=1, max_row=1))[0]]
-        index_文件名 = columns.index('文件名')+1
-        index_拓展名 = columns.index('拓展名')+1
-        index_原名 = columns.index('原名')+1
-        index_文件夹名 = columns.index('文件夹名')+1
-        index_图片路径 = columns.index('图片路径')+1
-        index_类型 = columns.index('类型')+1
-        index_风格 = columns.index('风格')+1
-        index_用途 = columns.index('用途')+1
-        index_版本 = columns.index('版本')+1
+        columns = header_map(ws)
+        index_文件名 = columns['文件名']
+        index_拓展名 = columns['拓展名']
+        index_原名 = columns['原名']
+        index_文件夹名 = columns['文件夹名']
+        index_图片路径 = columns['图片路径']
+        index_类型 = columns['类型']
+        index_风格 = columns['风格']
+        index_用途 = columns['用途']
+        index_版本 = columns['版本']
         
         for row in ws.iter_rows(min_row=2):
             # 类型_用途_风格_原名_版本
@@ -284,67 +447,63 @@ def rename_filenames(folder_path):
                 continue
                 
             if old_filename != new_filename:
-                try:
-                    拓展名 = row[index_拓展名-1].value
-                    old_model_path = os.path.join(file_folder, f'{old_filename}{拓展名}')
-                    new_model_path = os.path.join(file_folder, f'{new_filename}{拓展名}')
-                    #print(os.path.exists(old_model_path))
-                    if os.path.exists(old_model_path):
-                        os.rename(old_model_path, new_model_path)
-                except Exception as e:
-                    print(e)
+                拓展名 = row[index_拓展名-1].value
+                图片路径 = row[index_图片路径-1].value
+                group = (sheet, row[0].row)
                 
-                try:
-                    图片路径 = row[index_图片路径-1].value
-                    old_image_path = os.path.join(file_folder, f'{old_filename}.png')
-                    new_image_path = os.path.join(file_folder, f'{new_filename}.png')
-                    # 图片要存在才能修改
-                    if 图片路径:
-                        if os.path.exists(old_image_path):
-                            os.rename(old_image_path, new_image_path)
-                            row[index_图片路径-1].value = new_image_path
-                except Exception as e:
-                    print(e)
-                
-                try:
-                    old_json_path = os.path.join(file_folder, f'{old_filename}.json')
-                    new_json_path = os.path.join(file_folder, f'{new_filename}.json')
-                    if os.path.exists(old_json_path):
-                        os.rename(old_json_path, new_json_path)
-                except Exception as e:
-                    print(e)
+                old_model_path = os.path.join(file_folder, f'{old_filename}{拓展名}')
+                new_model_path = os.path.join(file_folder, f'{new_filename}{拓展名}')
+                if path_exists(old_model_path, snapshot):
+                    planner.add_move(old_model_path, new_model_path, group)
                 
                 # 可行的，本质上是cell数据格式
-                row[index_文件名-1].value = new_filename
+                values = {index_文件名: new_filename}
+                
+                # 图片要存在才能修改
+                old_image_path = os.path.join(file_folder, f'{old_filename}.png')
+                new_image_path = os.path.join(file_folder, f'{new_filename}.png')
+                if 图片路径 and path_exists(old_image_path, snapshot):
+                    planner.add_move(old_image_path, new_image_path, group)
+                    values[index_图片路径] = new_image_path
+                
+                old_json_path = os.path.join(file_folder, f'{old_filename}.json')
+                new_json_path = os.path.join(file_folder, f'{new_filename}.json')
+                if path_exists(old_json_path, snapshot):
+                    planner.add_move(old_json_path, new_json_path, group)
                 
                 # 更新ComfyUI路径
-                # 获取ComfyUI路径列的索引
-                columns = [cell.value for cell in list(ws.iter_rows(min_row=1, max_row=1))[0]]
                 if 'ComfyUI路径' in columns:
-                    index_ComfyUI路径 = columns.index('ComfyUI路径') + 1
-                    # 更新ComfyUI路径值
-                    comfyui_path = f"{文件夹名}\\{new_filename}{拓展名}" if 文件夹名 else f"{new_filename}{拓展名}"
-                    row[index_ComfyUI路径-1].value = comfyui_path
+                    index_ComfyUI路径 = columns['ComfyUI路径']
+                    values[index_ComfyUI路径] = f"{文件夹名}\\{new_filename}{拓展名}" if 文件夹名 else f"{new_filename}{拓展名}"
+                
+                planner.set_row_update(group, sheet, row[0].row, values)
+    
+    # 先计算全部重命名，检查冲突后统一执行，成功后再写回表格
+    execute_move_plan(planner, folder_path, wb, snapshot, "rename")
     
     # 保存修改后的表格
-    wb.save(excel_path)
+    if standalone:
+        wb.save(excel_path)
 
-def move_to_newfolder(folder_path):
+def move_to_newfolder(folder_path, wb=None, snapshot=None):
     excel_name = "model_info.xlsx"
     excel_path = os.path.join(folder_path, excel_name)
-    wb = load_workbook(excel_path)
+    standalone = wb is None
+    if standalone:
+        wb = load_workbook(excel_path)
+    planner = MovePlanner(exists=lambda path: path_exists(path, snapshot))
     
-    sheets = wb.sheetnames
+    sheets = catalog_sheets(wb)
     for sheet in sheets:
         ws = wb[sheet]
         
         # 获取表头索引
-        columns = [cell.value for cell in list(ws.iter_rows(min_row=1, max_row=1))[0]]
-        index_文件名 = columns.index('文件名') + 1
-        index_拓展名 = columns.index('拓展名') + 1
-        index_文件夹名 = columns.index('文件夹名') + 1
-        index_新文件夹 = columns.index('新文件夹') + 1
-        index_图片路径 = columns.index('图片路径') + 1
+        columns = header_map(ws)
+        index_文件名 = columns['文件名']
+        index_拓展名 = columns['拓展名']
+        index_文件夹名 = columns['文件夹名']
+        index_新文件夹 = columns['新文件夹']
+        index_图片路径 = columns['图片路径']
         
         for row in ws.iter_rows(min_row=2):
             文件名 = row[index_文件名 - 1].value
@@ -362,135 +521,140 @@ def move_to_newfolder(folder_path):
             # 新文件夹路径
             if 新文件夹:
                 new_folder = os.path.join(folder_path, sheet, 新文件夹)
-                if not os.path.exists(new_folder):
-                    os.makedirs(new_folder)
+                group = (sheet, row[0].row)
                 
                 # 移动模型文件
-                try:
-                    old_model_path = os.path.join(old_folder, f"{文件名}{拓展名}")
-                    new_model_path = os.path.join(new_folder, f"{文件名}{拓展名}")
-                    if os.path.exists(old_model_path):
-                        os.rename(old_model_path, new_model_path)
-                except Exception as e:
-                    print(e)
+                old_model_path = os.path.join(old_folder, f"{文件名}{拓展名}")
+                new_model_path = os.path.join(new_folder, f"{文件名}{拓展名}")
+                if path_exists(old_model_path, snapshot):
+                    planner.add_move(old_model_path, new_model_path, group)
                 
                 # 移动图片文件
-                try:
-                    old_image_path = os.path.join(old_folder, f"{文件名}.png")
-                    new_image_path = os.path.join(new_folder, f"{文件名}.png")
-                    if 图片路径:
-                        if os.path.exists(old_image_path):
-                            os.rename(old_image_path, new_image_path)
-                except Exception as e:
-                    print(e)
+                old_image_path = os.path.join(old_folder, f"{文件名}.png")
+                new_image_path = os.path.join(new_folder, f"{文件名}.png")
+                if 图片路径 and path_exists(old_image_path, snapshot):
+                    planner.add_move(old_image_path, new_image_path, group)
                 
                 # 移动 JSON 文件
-                try:
-                    old_json_path = os.path.join(old_folder, f"{文件名}.json")
-                    new_json_path = os.path.join(new_folder, f"{文件名}.json")
-                    if os.path.exists(old_json_path):
-                        os.rename(old_json_path, new_json_path)
-                except Exception as e:
-                    print(e)
+                old_json_path = os.path.join(old_folder, f"{文件名}.json")
+                new_json_path = os.path.join(new_folder, f"{文件名}.json")
+                if path_exists(old_json_path, snapshot):
+                    planner.add_move(old_json_path, new_json_path, group)
                 
-                row[index_图片路径 - 1].value = new_image_path
-                row[index_文件夹名-1].value = 新文件夹
-                row[index_新文件夹-1].value = ''
+                values = {
+                    index_图片路径: new_image_path,
+                    index_文件夹名: 新文件夹,
+                    index_新文件夹: '',
+                }
                 
                 # 更新ComfyUI路径
-                # 获取ComfyUI路径列的索引
-                columns = [cell.value for cell in list(ws.iter_rows(min_row=1, max_row=1))[0]]
                 if 'ComfyUI路径' in columns:
-                    index_ComfyUI路径 = columns.index('ComfyUI路径') + 1
-                    # 更新ComfyUI路径值
-                    comfyui_path = f"{新文件夹}\\{文件名}{拓展名}" if 新文件夹 else f"{文件名}{拓展名}"
-                    row[index_ComfyUI路径-1].value = comfyui_path
+                    index_ComfyUI路径 = columns['ComfyUI路径']
+                    values[index_ComfyUI路径] = f"{新文件夹}\\{文件名}{拓展名}"
+                
+                planner.set_row_update(group, sheet, row[0].row, values)
+    
+    # 先计算全部移动，检查冲突后统一执行，成功后再写回表格
+    execute_move_plan(planner, folder_path, wb, snapshot, "move")
     
     # 保存修改后的表格
-    wb.save(excel_path)
+    if standalone:
+        wb.save(excel_path)
 
 
-def update_model_json(folder_path):
-    excel_name = "model_info.xlsx"
-    excel_path = os.path.join(folder_path, excel_name)
-    wb = load_workbook(excel_path)
+# update_model_json 从表格中读取的列：(model_info.json中的键, 列名)，同一列可以写入多个键
+MODEL_JSON_FIELDS = [
+    ("pname", "原名"),
+    ("type", "类型"),
+    ("sd version", "类型"),
+    ("风格", "风格"),
+    ("用途", "用途"),
+    ("版本", "版本"),
+    ("url", "url"),
+    ("description", "描述"),
+    ("SD Link", "SD Link"),
+    ("specific_words", "特指词"),
+    ("main_words", "主描述词"),
+    ("trigger_words", "触发词"),
+    ("activation text", "触发词"),
+    ("可选形象", "可选形象"),
+    ("可选服装", "可选服装"),
+    ("notes", "notes"),
+    ("preferred weight", "默认权重"),
+    ("权重范围", "权重范围"),
+    ("negative text", "否定提示词"),
+    ("hash", "hash"),
+    ("is_favorite", "喜爱"),
+    ("last_modified", "修改时间"),
+]
+
+def read_json_files(paths, max_workers=8):
+    """
+    并行读取多个JSON文件
     
-    json_name = "model_info.json"
-    base_json_path = os.path.join(folder_path, json_name)
+    Returns:
+        {路径: 数据}，读取失败的文件不包含在结果中
+    """
+    def read(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return path, json.load(f)
+        except Exception as e:
+            print(f"读取 {path} 时出错: {e}")
+            return path, None
     
-    # 读取现有的 model_info.json 数据
-    with open(base_json_path, 'r', encoding='utf-8') as f:
-        base_model_info_json = json.load(f)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return {path: data for path, data in executor.map(read, paths) if data is not None}
+
+def write_json_if_changed(path, data, indent=4):
+    """
+    内容有变化时才写入JSON文件（按内容hash比较），先写临时文件再替换，避免写入中断损坏原文件
     
-    # 遍历工作表
-    for sheet in wb.sheetnames:
+    Returns:
+        写入返回True，内容未变化返回False
+    """
+    content = json.dumps(data, ensure_ascii=False, indent=indent).encode('utf-8')
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            if hashlib.sha256(f.read()).digest() == hashlib.sha256(content).digest():
+                return False
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return True
+
+def collect_model_json_rows(folder_path, wb):
+    """
+    计算阶段第一步：从工作簿中提取每个模型要写入model_info.json的数据（不访问磁盘）
+    
+    Returns:
+        [(model_info.json中的键, 模型数据, 模型同名json路径), ...]
+    """
+    rows = []
+    for sheet in catalog_sheets(wb):
         ws = wb[sheet]
-        # 获取表头索引映射
-        columns = [cell.value for cell in list(ws.iter_rows(min_row=1, max_row=1))[0]]
-        index_文件名 = columns.index('文件名')
-        index_拓展名 = columns.index('拓展名')
-        index_原名 = columns.index('原名')
-        index_文件夹名 = columns.index('文件夹名')
-        index_类型 = columns.index('类型')
-        index_风格 = columns.index('风格')
-        index_用途 = columns.index('用途')
-        index_版本 = columns.index('版本')
-        index_url = columns.index('url')
-        index_图片路径 = columns.index('图片路径')
-        index_图片预览 = columns.index('图片预览')
-        index_描述 = columns.index('描述')
-        index_SD_Link = columns.index('SD Link')
-        index_特指词 = columns.index('特指词')
-        index_主描述词 = columns.index('主描述词')
-        index_触发词 = columns.index('触发词')
-        index_可选形象 = columns.index('可选形象')
-        index_可选服装 = columns.index('可选服装')
-        index_notes = columns.index('notes')
-        index_默认权重 = columns.index('默认权重')
-        index_权重范围 = columns.index('权重范围')
-        index_否定提示词 = columns.index('否定提示词')
-        index_hash = columns.index('hash')
-        index_喜爱 = columns.index('喜爱')
-        index_修改时间 = columns.index('修改时间')
+        # 每个工作表只解析一次表头
+        columns = header_map(ws)
+        index_文件名 = columns['文件名']
+        index_拓展名 = columns['拓展名']
+        index_文件夹名 = columns['文件夹名']
+        index_url = columns['url']
+        fields = [(key, columns[name]) for key, name in MODEL_JSON_FIELDS]
         
-        for row in ws.iter_rows(min_row=2, values_only=False):
+        for row in ws.iter_rows(min_row=2):
             # 获取文件名及文件夹信息
-            file_name = row[0].value  # 文件名
-            if not bool(file_name) :
+            if not bool(row[0].value):
                 continue
             
-            # 使用动态获取的索引来获取单元格值
-            file_name = row[index_文件名].value or ''  # 文件名
-            file_ext = row[index_拓展名].value or ''  # 拓展名
-            original_name = row[index_原名].value or '' # 原名
-            model_folder = row[index_文件夹名].value or ''  # 文件夹名
-            类型 = row[index_类型].value or ''  # 类型
-            风格 = row[index_风格].value or ''  # 风格
-            用途 = row[index_用途].value or ''  # 用途
-            版本 = row[index_版本].value or ''  # 版本
+            file_name = row[index_文件名-1].value or ''  # 文件名
+            file_ext = row[index_拓展名-1].value or ''  # 拓展名
+            model_folder = row[index_文件夹名-1].value or ''  # 文件夹名
             
+            model_json_data = {key: row[index-1].value or '' for key, index in fields}
             # 处理URL超链接
-            if row[index_url].hyperlink:
-                url = row[index_url].hyperlink.target
-            else:
-                url = row[index_url].value or ''
-                
-            图片路径 = row[index_图片路径].value or ''  # 图片路径
-            图片预览 = row[index_图片预览].value or ''  # 图片预览
-            描述 = row[index_描述].value or ''  # 描述
-            sd_link = row[index_SD_Link].value or ''  # SD Link
-            特指词 = row[index_特指词].value or ''  # 特指词
-            主描述词 = row[index_主描述词].value or ''  # 主描述词
-            触发词 = row[index_触发词].value or ''  # 触发词
-            可选形象 = row[index_可选形象].value or ''  # 可选组合
-            可选服装 = row[index_可选服装].value or ''  # 可选服装
-            notes = row[index_notes].value or ''  # notes
-            默认权重 = row[index_默认权重].value or ''  # 默认权重
-            权重范围 = row[index_权重范围].value or ''  # 权重范围
-            否定提示词 = row[index_否定提示词].value or ''  # 否定提示词
-            hash_value = row[index_hash].value or ''  # hash
-            喜爱 = row[index_喜爱].value or ''  # 喜爱
-            修改时间 = row[index_修改时间].value or ''  # 修改时间
+            if row[index_url-1].hyperlink:
+                model_json_data["url"] = row[index_url-1].hyperlink.target
             
             # 计算模型的文件夹路径
             model_dir = os.path.join(folder_path, sheet, model_folder) if model_folder else os.path.join(folder_path, sheet)
@@ -498,149 +662,215 @@ def update_model_json(folder_path):
             model_json_path = os.path.join(model_dir, f'{file_name}.json')
             # 创建 model_info.json 中的键
             model_key = os.path.join(sheet, model_folder, f'{file_name}{file_ext}')
-            
-            # 创建模型的 JSON 数据（从工作表中提取）
-            model_json_data = {
-                "pname": original_name,
-                "type": 类型,
-                "sd version": 类型,
-                "风格":风格,
-                "用途":用途,
-                "版本":版本,
-                "url": url,
-                "description": 描述,
-                "SD Link": sd_link,
-                "specific_words": 特指词,
-                "main_words": 主描述词,
-                "trigger_words": 触发词,
-                "activation text": 触发词,
-                "可选形象":可选形象,
-                "可选服装":可选服装,
-                "notes": notes,
-                "preferred weight": 默认权重,
-                "权重范围":权重范围,
-                "negative text": 否定提示词,
-                "hash": hash_value,
-                "is_favorite": 喜爱,
-                "last_modified": 修改时间,
-            }
-            # model_json_data.update(existing_json_data) 
-            # 如果 existing_json_data 中的键在 model_json_data 中不存在，那么会直接将该键值对添加到 model_json_data 中
-            # 如果 existing_json_data 中的键在 model_json_data 中已经存在，那么会用 existing_json_data 中对应键的值覆盖 model_json_data 中原来的值
-            # ==========================
-            # 如果 existing_json_data 中的键在 model_json_data 中已经存在，不进行覆盖model_json_data；
-            # 如果 existing_json_data 中的键在 model_json_data 中不存在，直接将该键值对添加到 model_json_data 中
-            # 这份代码是将模型同名的json内容追加到要写入model_json文件中的数据
-            if os.path.exists(model_json_path):
-                with open(model_json_path, 'r', encoding='utf-8') as f:
-                    existing_json_data = json.load(f)
-                    for key, value in existing_json_data.items():
-                        if key not in model_json_data:
-                            model_json_data[key] = value
-            
-            # 更新 model_info.json 数据
-            base_model_info_json[model_key] = model_json_data
-            #single_base_model_info_json = {model_key:model_json_data}
-            #base_model_info_json.update(single_base_model_info_json)
-            
-            """
-            {
-                "description": "=== 从Civitai抓取的描述 ===\nI've trained two sets of clothing. The trigger words are as follows\n\ntype A: pantyhose, sweater, jacket\n\ntype B: shirt, skirt, fishnet thighhighs\n\n\nV3.0\n\nThe previous 1.0 version of Marie was really too ugly, so I collected a large amount of new material and made the latest XL version, which took a lot of time... I hope everyone can provide more image feedback to build the SDXL community ecosystem and let more people know the advantages of XL...\n\n\n现在网上的ai玛丽实在是太丑了不忍直视，因此希望大家用这个模型创造出更多可爱的还原的玛丽，更多的优质返图就是对我最大的支持，也希望和更多的朋友讨论如何生成更好看的玛丽。可以关注我的p站和X账号，以后会有更多的图片创作以及优质模型放出...",
-                "sd version": "Flux",
-                "activation text": "marie rose",
-                "preferred weight": 0.76,
-                "negative text": "Negative prompt\n",
-                "notes": "Notes"
-            }
-            """
-            single_model_json_data = {
-                "description": 描述,
-                "sd version": 类型,
-                "activation text": 触发词,
-                "preferred weight": 默认权重,
-                "negative text": 否定提示词,
-                "notes": notes,
-            }
-            # 不由代码写入，用月光宝盒的批处理
-            # 如果文件不存在，先确保文件夹存在
-            #if not os.path.exists(model_json_path):
-            #    os.makedirs(os.path.dirname(model_json_path), exist_ok=True)
-            #with open(model_json_path, 'w', encoding='utf-8') as f:
-            #    json.dump(single_model_json_data, f, ensure_ascii=False, indent=4)
-            
-            """if os.path.exists(model_json_path):
-                with open(model_json_path, 'r+', encoding='utf-8') as f:
-                    model_data = json.load(f)
-                    model_data.update(model_json_data)  # 使用了model_json_data之前合并数据
-                    f.seek(0) # 将文件指针移回文件开头
-                    json.dump(model_data, f, ensure_ascii=False, indent=4) # 写入更新后的 JSON 数据
+            rows.append((model_key, model_json_data, model_json_path))
+    return rows
+
+def merge_model_json(base_model_info_json, rows, sidecars):
+    """
+    计算阶段第二步：合并模型同名json中的额外键，生成新的model_info.json内容并统计变化
+    
+    Args:
+        base_model_info_json: 现有的model_info.json数据
+        rows: collect_model_json_rows的结果
+        sidecars: {模型同名json路径: 数据}
+    
+    Returns:
+        (新的model_info.json数据, {"added": 新增数, "changed": 修改数, "unchanged": 未变化数})
+    """
+    new_model_info_json = dict(base_model_info_json)
+    stats = {"added": 0, "changed": 0, "unchanged": 0}
+    for model_key, model_json_data, model_json_path in rows:
+        # 模型同名json中的键在model_json_data中已经存在时不覆盖，不存在时追加
+        for key, value in sidecars.get(model_json_path, {}).items():
+            if key not in model_json_data:
+                model_json_data[key] = value
+        
+        old = base_model_info_json.get(model_key)
+        if old is None:
+            stats["added"] += 1
+        elif old != model_json_data:
+            stats["changed"] += 1
+        else:
+            stats["unchanged"] += 1
+        new_model_info_json[model_key] = model_json_data
+    return new_model_info_json, stats
+
+def update_model_json(folder_path, wb=None, snapshot=None):
+    excel_name = "model_info.xlsx"
+    excel_path = os.path.join(folder_path, excel_name)
+    if wb is None:
+        wb = load_workbook(excel_path)
+    
+    json_name = "model_info.json"
+    base_json_path = os.path.join(folder_path, json_name)
+    
+    # 读取现有的 model_info.json 数据
+    with open(base_json_path, 'r', encoding='utf-8') as f:
+        base_model_info_json = json.load(f)
+    
+    # 计算阶段：提取表格数据
+    rows = collect_model_json_rows(folder_path, wb)
+    
+    # I/O阶段：并行读取存在的模型同名json
+    sidecar_paths = [path for _, _, path in rows if path_exists(path, snapshot)]
+    sidecars = read_json_files(sidecar_paths)
+    
+    # 计算阶段：合并并统计变化
+    new_model_info_json, stats = merge_model_json(base_model_info_json, rows, sidecars)
+    print(f"model_info.json: 新增 {stats['added']}，修改 {stats['changed']}，未变化 {stats['unchanged']}")
+    
+    # 模型同名json不由代码写入，用月光宝盒的批处理
+    
+    # 保存更新后的 model_info.json 文件（内容未变化时不写入）
+    if write_json_if_changed(base_json_path, new_model_info_json):
+        print(f"已更新: {base_json_path}")
+    else:
+        print(f"内容未变化，跳过写入: {base_json_path}")
+
+def update_hash(folder_path, wb=None, snapshot=None, verify=False):
+    """
+    计算模型文件的SHA-256，填写表格中为空的hash列；verify为True时同时校验已有的hash（支持完整SHA-256和AutoV2）
+    结果按 (路径, 大小, 修改时间) 缓存在模型根目录，文件未变化时不会重新计算
+    """
+    excel_name = "model_info.xlsx"
+    excel_path = os.path.join(folder_path, excel_name)
+    standalone = wb is None
+    if standalone:
+        wb = load_workbook(excel_path)
+    
+    # 需要计算hash的行 [(单元格, 模型路径)]
+    targets = []
+    for sheet in catalog_sheets(wb):
+        ws = wb[sheet]
+        columns = header_map(ws)
+        index_文件名 = columns['文件名']
+        index_拓展名 = columns['拓展名']
+        index_文件夹名 = columns['文件夹名']
+        index_hash = columns['hash']
+        for row in ws.iter_rows(min_row=2):
+            if not bool(row[0].value):
+                continue
+            hash_cell = row[index_hash-1]
+            if hash_cell.value and not verify:
+                continue
+            file_name = row[index_文件名-1].value or ''
+            file_ext = row[index_拓展名-1].value or ''
+            model_folder = row[index_文件夹名-1].value or ''
+            model_dir = os.path.join(folder_path, sheet, model_folder) if model_folder else os.path.join(folder_path, sheet)
+            model_path = os.path.join(model_dir, f'{file_name}{file_ext}')
+            if path_exists(model_path, snapshot):
+                targets.append((hash_cell, model_path))
+    
+    service = HashService.for_library(folder_path)
+    
+    def progress(path, sha256, count, total):
+        print(f"[{count}/{total}] {sha256[:10]} {path}")
+    
+    start = time.perf_counter()
+    try:
+        hashes = service.hash_files([path for _, path in targets], progress=progress)
+    finally:
+        # 中途中断时已计算的结果也保留下来
+        service.save()
+    
+    filled = 0
+    mismatched = 0
+    for hash_cell, model_path in targets:
+        sha256 = hashes.get(model_path)
+        if sha256 is None:
+            continue
+        if snapshot is not None:
+            entry = snapshot.get(model_path)
+            if entry is not None:
+                entry[2] = sha256
+        if not hash_cell.value:
+            hash_cell.value = sha256
+            filled += 1
+        elif hash_matches(hash_cell.value, sha256) is False:
+            mismatched += 1
+            print(f"hash不一致: {model_path} 表格: {hash_cell.value} 实际: {sha256}")
+    print(f"hash: 检查 {len(targets)} 个文件，填写 {filled} 个，不一致 {mismatched} 个，耗时 {time.perf_counter() - start:.2f} 秒")
+    
+    if standalone:
+        wb.save(excel_path)
+
+# 表格单元格的命名样式：自动换行、左对齐、垂直居中
+CATALOG_CELL_STYLE = "模型目录"
+CATALOG_ALIGNMENT = Alignment(wrap_text=True, horizontal='left', vertical='center')
+
+def apply_catalog_style(ws, header_height=14, row_height=100):
+    """
+    设置行高和单元格对齐方式
+    单元格对齐按原有样式分组，每种原有样式只计算一次新样式，其余单元格直接复用，
+    保留单元格原有的字体、超链接等样式
+    """
+    wb = ws.parent
+    if CATALOG_CELL_STYLE not in wb.named_styles:
+        style = NamedStyle(name=CATALOG_CELL_STYLE)
+        style.alignment = CATALOG_ALIGNMENT
+        wb.add_named_style(style)
+    
+    ws.row_dimensions[1].height = header_height
+    for row in range(2, ws.max_row + 1):
+        ws.row_dimensions[row].height = row_height
+    
+    # {原有样式: 新样式}
+    styled = {}
+    for row in ws.iter_rows(min_row=1):
+        for cell in row:
+            key = tuple(cell._style)
+            new_style = styled.get(key)
+            if new_style is None:
+                if cell.has_style:
+                    cell.alignment = CATALOG_ALIGNMENT
+                else:
+                    cell.style = CATALOG_CELL_STYLE
+                styled[key] = copy(cell._style)
             else:
-                # 如果文件不存在，则创建并写入
-                os.makedirs(os.path.dirname(model_json_path), exist_ok=True)
-                with open(model_json_path, 'w', encoding='utf-8') as f:
-                    json.dump(model_json_data, f, ensure_ascii=False, indent=4)"""
-    
-    # 保存更新后的 model_info.json 文件
-    with open(base_json_path, 'w', encoding='utf-8') as f:
-        json.dump(base_model_info_json, f, ensure_ascii=False, indent=4)
+                cell._style = copy(new_style)
 
-def format_excel(folder_path):
+def format_excel(folder_path, wb=None):
     excel_name = "model_info.xlsx"
     excel_path = os.path.join(folder_path, excel_name)
-    wb = load_workbook(excel_path)
-    for sheet in wb.sheetnames:
+    standalone = wb is None
+    if standalone:
+        wb = load_workbook(excel_path)
+    for sheet in catalog_sheets(wb):
         ws = wb[sheet]
-        rows = list(ws.iter_rows(min_row=2, values_only=True))
-        total_rows = len(rows)  
-        columns = [cell.value for cell in list(ws.iter_rows(min_row=1, max_row=1))[0]]
-        index_文件名 = columns.index('文件名')+1
-        index_拓展名 = columns.index('拓展名')+1
-        index_原名 = columns.index('原名')+1
-        index_文件夹名 = columns.index('文件夹名')+1
-        index_新文件夹 = columns.index('新文件夹')+1
-        index_类型 = columns.index('类型')+1
-        index_风格 = columns.index('风格')+1
-        index_用途 = columns.index('用途')+1
-        index_版本 = columns.index('版本')+1
-        index_url = columns.index('url')+1
-        index_图片路径 = columns.index('图片路径')+1
-        index_图片预览 = columns.index('图片预览')+1
-        index_描述 = columns.index('描述')+1
-        index_SD_Link = columns.index('SD Link')+1
-        index_特指词 = columns.index('特指词')+1
-        index_主描述词 = columns.index('主描述词')+1
-        index_触发词 = columns.index('触发词')+1
-        index_可选形象 = columns.index('可选形象')+1
-        index_可选服装 = columns.index('可选服装')+1
-        index_notes = columns.index('notes')+1
-        index_默认权重 = columns.index('默认权重')+1
-        index_权重范围 = columns.index('权重范围')+1
-        index_否定提示词 = columns.index('否定提示词')+1
-        index_hash = columns.index('hash')+1
-        index_喜爱 = columns.index('喜爱')+1
-        index_修改时间 = columns.index('修改时间')+1
+        columns = header_map(ws)
+        index_文件名 = columns['文件名']
+        index_拓展名 = columns['拓展名']
+        index_原名 = columns['原名']
+        index_文件夹名 = columns['文件夹名']
+        index_新文件夹 = columns['新文件夹']
+        index_类型 = columns['类型']
+        index_风格 = columns['风格']
+        index_用途 = columns['用途']
+        index_版本 = columns['版本']
+        index_url = columns['url']
+        index_图片路径 = columns['图片路径']
+        index_图片预览 = columns['图片预览']
+        index_描述 = columns['描述']
+        index_SD_Link = columns['SD Link']
+        index_特指词 = columns['特指词']
+        index_主描述词 = columns['主描述词']
+        index_触发词 = columns['触发词']
+        index_可选形象 = columns['可选形象']
+        index_可选服装 = columns['可选服装']
+        index_notes = columns['notes']
+        index_默认权重 = columns['默认权重']
+        index_权重范围 = columns['权重范围']
+        index_否定提示词 = columns['否定提示词']
+        index_hash = columns['hash']
+        index_喜爱 = columns['喜爱']
+        index_修改时间 = columns['修改时间']
         
         # 获取ComfyUI路径列的索引（如果存在）
         if 'ComfyUI路径' in columns:
-            index_ComfyUI路径 = columns.index('ComfyUI路径')+1
+            index_ComfyUI路径 = columns['ComfyUI路径']
         
-        # 让每一个模型默认有一个图片路径
-        for row in ws.iter_rows(min_row=2):
-            文件名 = row[index_文件名 - 1].value
-            文件夹名 = row[index_文件夹名 - 1].value
-            # 原始文件夹路径
-            if 文件夹名:
-                folder = os.path.join(folder_path, sheet, 文件夹名)
-            else:
-                folder = os.path.join(folder_path, sheet)
-            image_path = os.path.join(folder, f"{文件名}.png")
-            row[index_图片路径-1].value = image_path
-            
         # 设置冻结窗格，固定第一行
         ws.freeze_panes = ws["A2"]
-        ws.row_dimensions[1].height = 14
-        for row in range(2, total_rows + 1):
-            ws.row_dimensions[row].height = 100
         ws.column_dimensions[get_column_letter(index_文件名)].width = 5
         ws.column_dimensions[get_column_letter(index_拓展名)].width = 5
         ws.column_dimensions[get_column_letter(index_原名)].width = 5
@@ -675,7 +905,19 @@ def format_excel(folder_path):
         ws.column_dimensions[get_column_letter(index_图片路径)].hidden = True
         ws.column_dimensions[get_column_letter(index_hash)].hidden = True
         ws.column_dimensions[get_column_letter(index_修改时间)].hidden = True
+        # 数据行只遍历一次：图片路径、超链接、触发词
         for row in ws.iter_rows(min_row=2):
+            # 让每一个模型默认有一个图片路径
+            文件名 = row[index_文件名 - 1].value
+            文件夹名 = row[index_文件夹名 - 1].value
+            # 原始文件夹路径
+            if 文件夹名:
+                folder = os.path.join(folder_path, sheet, 文件夹名)
+            else:
+                folder = os.path.join(folder_path, sheet)
+            image_path = os.path.join(folder, f"{文件名}.png")
+            row[index_图片路径-1].value = image_path
+            
             url_cell = row[index_url-1]
             if url_cell.hyperlink is None:
                 url = url_cell.value
@@ -689,18 +931,15 @@ def format_excel(folder_path):
                     url_cell.hyperlink = url  # 直接设置单元格的超链接
                     url_cell.style = "Hyperlink"  # 设置超链接样式
                     url_cell.value = '🌐🌐🌐'
-        
-        for row in ws.iter_rows(min_row=2):
+            
             触发词_cell = row[index_触发词-1]
             特指词_value = row[index_特指词-1].value
             主描述词_value = row[index_主描述词-1].value
             if bool(特指词_value) and bool(主描述词_value):
                 触发词_cell.value = ','.join([特指词_value,主描述词_value])
         
-        # 设置单元格自动换行
-        for row in ws.iter_rows(min_row=1):
-            for cell in row:
-                cell.alignment = Alignment(wrap_text=True, horizontal='left', vertical='center')
+        # 设置行高和单元格自动换行
+        apply_catalog_style(ws)
     
     sheet_names = ['Stable-diffusion','VAE']
     for sheet_name in sheet_names:
@@ -712,12 +951,15 @@ def format_excel(folder_path):
         ws.column_dimensions[get_column_letter(index_可选形象)].hidden = True
         ws.column_dimensions[get_column_letter(index_可选服装)].hidden = True
     
-    wb.save(excel_path)
+    if standalone:
+        wb.save(excel_path)
 
-def add_number_column(folder_path):
+def add_number_column(folder_path, wb=None):
     excel_name = "model_info.xlsx"
     excel_path = os.path.join(folder_path, excel_name)
-    wb = load_workbook(excel_path)
+    standalone = wb is None
+    if standalone:
+        wb = load_workbook(excel_path)
     
     # 只处理Lora和Stable-diffusion工作表
     target_sheets = [sheet for sheet in wb.sheetnames if sheet in ['Lora', 'Stable-diffusion']]
@@ -726,24 +968,29 @@ def add_number_column(folder_path):
         ws = wb[sheet]
         
         # 获取表头
-        headers = [cell.value for cell in list(ws.iter_rows(min_row=1, max_row=1))[0]]
+        columns = header_map(ws)
         
         # 检查是否已存在编号列，如果不存在则添加
-        if '编号' not in headers:
+        if '编号' not in columns:
             # 在文件夹名后面插入编号列
-            index_文件夹名 = headers.index('文件夹名') + 1
+            index_文件夹名 = columns['文件夹名']
             ws.insert_cols(index_文件夹名 + 1)
             
             # 更新表头
             ws.cell(row=1, column=index_文件夹名 + 1).value = '编号'
-            headers.insert(index_文件夹名, '编号')
+            columns = header_map(ws)
         
         # 获取编号列的索引
-        index_编号 = headers.index('编号') + 1
-        index_文件夹名 = headers.index('文件夹名') + 1
+        index_编号 = columns['编号']
+        index_文件夹名 = columns['文件夹名']
         
         # 用于跟踪每个文件夹名的编号计数
         folder_counters = {}
+        # 已使用的编号及次数，代替每次逐行扫描检查编号是否重复
+        used_numbers = {}
+        for (value,) in ws.iter_rows(min_row=2, min_col=index_编号, max_col=index_编号, values_only=True):
+            if value:
+                used_numbers[value] = used_numbers.get(value, 0) + 1
         
         # 遍历所有行，添加编号
         for row in ws.iter_rows(min_row=2):
@@ -772,48 +1019,46 @@ def add_number_column(folder_path):
                 # 生成编号（格式：文件夹名+三位数字，如SD_XL_角色001）
                 编号 = f"{文件夹名}{folder_counters[文件夹名]:03d}"
                 
-                # 检查编号是否已存在
-                编号_exists = False
-                for check_row in ws.iter_rows(min_row=2):
-                    if check_row[index_编号 - 1].value == 编号 and check_row != row:
-                        编号_exists = True
-                        break
-                
                 # 如果编号已存在，增加计数器并重新生成编号
-                while 编号_exists:
+                # （当前行的旧编号前缀与文件夹名不一致，不会与新编号相同）
+                while 编号 in used_numbers:
                     folder_counters[文件夹名] += 1
                     编号 = f"{文件夹名}{folder_counters[文件夹名]:03d}"
-                    编号_exists = False
-                    for check_row in ws.iter_rows(min_row=2):
-                        if check_row[index_编号 - 1].value == 编号 and check_row != row:
-                            编号_exists = True
-                            break
                 
                 # 设置编号并增加计数器
+                old_number = 编号_cell.value
+                if old_number:
+                    used_numbers[old_number] -= 1
+                    if not used_numbers[old_number]:
+                        del used_numbers[old_number]
+                used_numbers[编号] = used_numbers.get(编号, 0) + 1
                 编号_cell.value = 编号
                 folder_counters[文件夹名] += 1
     
     # 保存修改后的表格
-    wb.save(excel_path)
+    if standalone:
+        wb.save(excel_path)
 
-def check_comfyui_path(folder_path):
+def check_comfyui_path(folder_path, wb=None):
     excel_name = "model_info.xlsx"
     excel_path = os.path.join(folder_path, excel_name)
-    wb = load_workbook(excel_path)
+    standalone = wb is None
+    if standalone:
+        wb = load_workbook(excel_path)
     
-    sheets = wb.sheetnames
+    sheets = catalog_sheets(wb)
     for sheet in sheets:
         ws = wb[sheet]
         
         # 获取表头索引
-        columns = [cell.value for cell in list(ws.iter_rows(min_row=1, max_row=1))[0]]
+        columns = header_map(ws)
         if 'ComfyUI路径' not in columns:
             continue
             
-        index_文件名 = columns.index('文件名') + 1
-        index_拓展名 = columns.index('拓展名') + 1
-        index_文件夹名 = columns.index('文件夹名') + 1
-        index_ComfyUI路径 = columns.index('ComfyUI路径') + 1
+        index_文件名 = columns['文件名']
+        index_拓展名 = columns['拓展名']
+        index_文件夹名 = columns['文件夹名']
+        index_ComfyUI路径 = columns['ComfyUI路径']
         
         for row in ws.iter_rows(min_row=2):
             文件名 = row[index_文件名 - 1].value
@@ -833,9 +1078,10 @@ def check_comfyui_path(folder_path):
                 print(f"更新ComfyUI路径: {当前ComfyUI路径} -> {正确ComfyUI路径}")
     
     # 保存修改后的表格
-    wb.save(excel_path)
+    if standalone:
+        wb.save(excel_path)
     
-def reinsert_image(folder_path):
+def backup_excel(folder_path):
     excel_name = "model_info.xlsx"
     excel_path = os.path.join(folder_path, excel_name)
     
@@ -852,11 +1098,19 @@ def reinsert_image(folder_path):
     # 复制文件作为备份
     shutil.copy2(excel_path, backup_path)
     print(f"已创建备份文件: {backup_path}")
+    return backup_path
+
+def reinsert_image(folder_path, wb=None):
+    excel_name = "model_info.xlsx"
+    excel_path = os.path.join(folder_path, excel_name)
     
-    # 加载工作簿
-    wb = load_workbook(excel_path)
+    # 单独运行时先备份再加载工作簿，会话模式下备份在加载前已完成
+    standalone = wb is None
+    if standalone:
+        backup_excel(folder_path)
+        wb = load_workbook(excel_path)
     
-    sheets = wb.sheetnames
+    sheets = catalog_sheets(wb)
     # 先遍历所有工作表清空已有图片
     for sheet in sheets:
         ws = wb[sheet]
@@ -962,68 +1216,329 @@ def reinsert_image(folder_path):
                     ws.add_image(img, f"{colname}{rowindex}")
                     print(f'插入图片: {value} -> 单元格 {colname}{rowindex}')
     
-    wb.save(excel_path)
+    if standalone:
+        wb.save(excel_path)
 
-def check_comfyui_path(folder_path):
+def build_preview_gallery(folder_path, wb=None, snapshot=None):
+    """
+    reinsert_image的替代方式：生成静态HTML预览网页（#preview/index.html），
+    图片预览列只写入指向网页中对应模型的超链接，表格本身不嵌入图片
+    缩略图只在源图片变化时重新生成
+    """
     excel_name = "model_info.xlsx"
     excel_path = os.path.join(folder_path, excel_name)
-    wb = load_workbook(excel_path)
+    standalone = wb is None
+    if standalone:
+        wb = load_workbook(excel_path)
     
-    sheets = wb.sheetnames
-    for sheet in sheets:
+    gallery = PreviewGallery(folder_path)
+    items = []
+    for sheet in catalog_sheets(wb):
         ws = wb[sheet]
-        
-        # 获取表头索引
-        columns = [cell.value for cell in list(ws.iter_rows(min_row=1, max_row=1))[0]]
-        if 'ComfyUI路径' not in columns:
-            continue
-            
-        index_文件名 = columns.index('文件名') + 1
-        index_拓展名 = columns.index('拓展名') + 1
-        index_文件夹名 = columns.index('文件夹名') + 1
-        index_ComfyUI路径 = columns.index('ComfyUI路径') + 1
+        # 清空已嵌入的图片
+        ws._images.clear()
+        columns = header_map(ws)
+        index_文件名 = columns['文件名']
+        index_文件夹名 = columns['文件夹名']
+        index_图片路径 = columns['图片路径']
+        index_图片预览 = columns['图片预览']
+        index_url = columns['url']
+        index_触发词 = columns['触发词']
+        index_notes = columns['notes']
         
         for row in ws.iter_rows(min_row=2):
-            文件名 = row[index_文件名 - 1].value
-            拓展名 = row[index_拓展名 - 1].value
-            文件夹名 = row[index_文件夹名 - 1].value
-            当前ComfyUI路径 = row[index_ComfyUI路径 - 1].value
-            
-            if not 文件名 or not 拓展名:
+            file_name = row[index_文件名-1].value
+            if not file_name:
                 continue
-                
-            # 计算正确的ComfyUI路径
-            正确ComfyUI路径 = f"{文件夹名}\\{文件名}{拓展名}" if 文件夹名 else f"{文件名}{拓展名}"
+            # 图片路径列作为主图，其余列中的png路径（如测试图）作为附加图
+            images = []
+            main_image = row[index_图片路径-1].value
+            if isinstance(main_image, str) and main_image.lower().endswith('.png'):
+                images.append(main_image)
+            for cell in row:
+                value = cell.value
+                if isinstance(value, str) and value.lower().endswith('.png') and value not in images:
+                    images.append(value)
+            url_cell = row[index_url-1]
+            items.append({
+                "sheet": sheet,
+                "name": file_name,
+                "folder": row[index_文件夹名-1].value,
+                "images": images,
+                "url": url_cell.hyperlink.target if url_cell.hyperlink else url_cell.value,
+                "trigger_words": row[index_触发词-1].value,
+                "notes": row[index_notes-1].value,
+            })
             
-            # 如果当前路径与正确路径不一致，则更新
-            if 当前ComfyUI路径 != 正确ComfyUI路径:
-                row[index_ComfyUI路径 - 1].value = 正确ComfyUI路径
-                print(f"更新ComfyUI路径: {当前ComfyUI路径} -> {正确ComfyUI路径}")
+            preview_cell = row[index_图片预览-1]
+            link = gallery.link(sheet, file_name)
+            if preview_cell.hyperlink is None or preview_cell.hyperlink.target != link:
+                preview_cell.hyperlink = link
+                preview_cell.style = "Hyperlink"
+                preview_cell.value = '🖼'
     
-    # 保存修改后的表格
-    wb.save(excel_path)
+    def signature(path):
+        # 模型库中的图片直接使用快照中记录的大小和修改时间
+        if snapshot is not None and os.path.normcase(os.path.abspath(path)).startswith(os.path.normcase(snapshot.root)):
+            entry = snapshot.get(path)
+            return (entry[0], entry[1]) if entry else None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+    
+    start = time.perf_counter()
+    result = gallery.build(items, signature)
+    print(f"预览网页: {len(items)} 个模型，{result['images']} 张图片，重新生成缩略图 {result['generated']} 张，"
+          f"删除过期缩略图 {result['removed']} 张，耗时 {time.perf_counter() - start:.2f} 秒")
+    print(f"{'已更新' if result['html_changed'] else '内容未变化'}: {gallery.html_path}")
+    
+    if standalone:
+        wb.save(excel_path)
 
-folder_path = "E:\models"
-# JSON写入表格-OK
-json_to_execl(folder_path)
+def report_duplicates(folder_path, wb=None, snapshot=None):
+    """
+    查找模型库中内容完全相同的模型文件，结果写入"重复模型"工作表（每次重新生成）
+    先按大小分桶，再比较头尾块hash，只对候选文件计算完整hash
+    """
+    excel_name = "model_info.xlsx"
+    excel_path = os.path.join(folder_path, excel_name)
+    standalone = wb is None
+    if standalone:
+        wb = load_workbook(excel_path)
+    if snapshot is None:
+        snapshot = ModelSnapshot.scan(folder_path)
+    
+    # 表格中的模型路径 -> (工作表名, 文件名)，用于在报告中标注对应的行
+    catalog_paths = {}
+    for sheet in catalog_sheets(wb):
+        ws = wb[sheet]
+        columns = header_map(ws)
+        index_文件名 = columns['文件名']
+        index_拓展名 = columns['拓展名']
+        index_文件夹名 = columns['文件夹名']
+        for row in ws.iter_rows(min_row=2, values_only=True):
+            file_name = row[index_文件名-1]
+            if not file_name:
+                continue
+            model_folder = row[index_文件夹名-1] or ''
+            model_path = os.path.join(folder_path, sheet, model_folder, f'{file_name}{row[index_拓展名-1] or ""}')
+            catalog_paths[os.path.normcase(os.path.normpath(model_path))] = (sheet, file_name)
+    
+    service = HashService.for_library(folder_path)
+    files, known_hashes = snapshot_files(snapshot)
+    start = time.perf_counter()
+    try:
+        duplicates, stats = find_duplicates(files, service, known_hashes)
+    finally:
+        service.save()
+    total_reclaimable = sum(group["reclaimable"] for group in duplicates)
+    print(f"查重: {stats['files']} 个模型文件，同大小 {stats['size_candidates']} 个，"
+          f"头尾一致 {stats['partial_candidates']} 个，完整计算hash {stats['full_hashed']} 个，耗时 {time.perf_counter() - start:.2f} 秒")
+    print(f"重复 {len(duplicates)} 组，可释放 {total_reclaimable / 1024 ** 3:.2f} GB")
+    
+    # 重新生成报告工作表
+    if DUPLICATE_SHEET in wb.sheetnames:
+        wb.remove(wb[DUPLICATE_SHEET])
+    ws = wb.create_sheet(title=DUPLICATE_SHEET)
+    ws.append(["分组", "AutoV2", "大小(MB)", "可释放(MB)", "路径", "工作表", "文件名"])
+    for number, group in enumerate(duplicates, start=1):
+        for i, path in enumerate(group["paths"]):
+            sheet, file_name = catalog_paths.get(os.path.normcase(os.path.normpath(path)), ("", ""))
+            ws.append([
+                number,
+                group["sha256"][:10],
+                round(group["size"] / 1024 ** 2, 1),
+                round(group["reclaimable"] / 1024 ** 2, 1) if i == 0 else "",
+                os.path.relpath(path, folder_path),
+                sheet,
+                file_name,
+            ])
+    ws.append(["合计", "", "", round(total_reclaimable / 1024 ** 2, 1), "", "", ""])
+    ws.column_dimensions['E'].width = 80
+    
+    if standalone:
+        wb.save(excel_path)
 
-# 文件重命名-OK
-rename_filenames(folder_path)
+# 使用快照对比结果的步骤（会话传入changes），只有这些步骤执行过，会话结束时才保存快照
+# （否则下次运行时本次的变化会丢失）
+CHANGES_STAGES = {"json_to_execl"}
 
-# 移动文件-OK
-move_to_newfolder(folder_path)
+# 使用文件快照判断文件是否存在的步骤
+SNAPSHOT_STAGES = {"json_to_execl", "rename_filenames", "move_to_newfolder", "update_hash", "update_model_json",
+                   "build_preview_gallery", "report_duplicates"}
 
-# 检查并更新ComfyUI路径-OK
-check_comfyui_path(folder_path)
+# 耗时较长的步骤，只有在stages中明确指定时才执行
+OPTIONAL_STAGES = {"update_hash", "report_duplicates"}
 
-# 更新JSON文件-OK
-update_model_json(folder_path)
+# 预览方式：embed 在表格中嵌入图片，gallery 生成HTML预览网页（表格不含图片，加载和保存更快）
+PREVIEW_STAGES = {"embed": "reinsert_image", "gallery": "build_preview_gallery"}
 
-# 格式化表格样式-OK
-format_excel(folder_path)
+# 表格维护的全部步骤，按执行顺序排列：(步骤名, 说明, 函数)
+CATALOG_STAGES = [
+    ("json_to_execl", "JSON写入表格", json_to_execl),
+    ("rename_filenames", "文件重命名", rename_filenames),
+    ("move_to_newfolder", "移动文件", move_to_newfolder),
+    ("check_comfyui_path", "检查并更新ComfyUI路径", check_comfyui_path),
+    ("update_hash", "计算模型hash", update_hash),
+    ("update_model_json", "更新JSON文件", update_model_json),
+    ("format_excel", "格式化表格样式", format_excel),
+    ("add_number_column", "添加编号列", add_number_column),
+    ("reinsert_image", "重新插入图片", reinsert_image),
+    ("build_preview_gallery", "生成预览网页", build_preview_gallery),
+    ("report_duplicates", "查找重复模型", report_duplicates),
+]
 
-# 添加编号列-OK
-add_number_column(folder_path)
+def scan_library(folder_path):
+    """
+    一次遍历模型库生成文件快照，并与上次保存的快照对比，输出变化的文件
+    
+    Returns:
+        (当前快照, 变化字典)
+    """
+    previous = ModelSnapshot.load(folder_path)
+    snapshot = ModelSnapshot.scan(folder_path, previous=previous)
+    changes = snapshot.diff(previous)
+    if previous is None:
+        print(f"首次生成文件快照，共 {len(snapshot.entries)} 个文件")
+    else:
+        print(f"文件快照对比: 新增 {len(changes['added'])}，删除 {len(changes['removed'])}，"
+              f"重命名 {len(changes['renamed'])}，修改 {len(changes['modified'])}")
+        for old_path, new_path in changes["renamed"]:
+            print(f"  重命名: {old_path} -> {new_path}")
+        for path in changes["added"]:
+            print(f"  新增: {path}")
+        for path in changes["removed"]:
+            print(f"  删除: {path}")
+    return snapshot, changes
 
-# 重新插入图片-OK
-reinsert_image(folder_path)
\ No newline at end of file
+def run_catalog_session(folder_path, stages=None, use_snapshot=True, stage_options=None, preview="embed"):
+    """
+    表格维护会话：model_info.xlsx 只加载一次，所选步骤依次在内存中处理，最后只保存一次
+    
+    Args:
+        folder_path: 模型根目录
+        stages: 要执行的步骤名列表，None表示执行OPTIONAL_STAGES以外的全部步骤（执行顺序始终按CATALOG_STAGES）
+        use_snapshot: 是否使用文件快照代替逐个文件的存在性检查（会话结束后保存快照供下次对比）
+        stage_options: 传给各步骤的额外参数 {步骤名: {参数名: 值}}
+        preview: 未指定stages时使用的预览方式，"embed" 或 "gallery"（见PREVIEW_STAGES）
+    
+    Returns:
+        {步骤名: 耗时秒数}
+    """
+    excel_path = os.path.join(folder_path, "model_info.xlsx")
+    if stages is None:
+        skipped = OPTIONAL_STAGES | {name for mode, name in PREVIEW_STAGES.items() if mode != preview}
+        selected = [stage for stage in CATALOG_STAGES if stage[0] not in skipped]
+    else:
+        selected = [stage for stage in CATALOG_STAGES if stage[0] in stages]
+    stage_options = stage_options or {}
+    unknown = set(stages or []) - {stage[0] for stage in CATALOG_STAGES}
+    if unknown:
+        raise ValueError(f"未知的步骤: {', '.join(sorted(unknown))}")
+    
+    timings = {}
+    session_start = time.perf_counter()
+    
+    # 修改前先备份（原先在reinsert_image中备份）
+    if any(name == "reinsert_image" for name, _, _ in selected):
+        backup_excel(folder_path)
+    
+    snapshot = None
+    changes = None
+    if use_snapshot:
+        start = time.perf_counter()
+        snapshot, changes = scan_library(folder_path)
+        timings["扫描文件"] = time.perf_counter() - start
+        print(f"扫描文件: {timings['扫描文件']:.2f} 秒")
+    
+    start = time.perf_counter()
+    wb = load_workbook(excel_path)
+    timings["加载表格"] = time.perf_counter() - start
+    print(f"加载表格: {timings['加载表格']:.2f} 秒")
+    
+    for name, description, stage in selected:
+        start = time.perf_counter()
+        options = stage_options.get(name, {})
+        if name in CHANGES_STAGES:
+            options = dict(options, changes=changes)
+        if name in SNAPSHOT_STAGES:
+            stage(folder_path, wb=wb, snapshot=snapshot, **options)
+        else:
+            stage(folder_path, wb=wb, **options)
+        timings[description] = time.perf_counter() - start
+        print(f"{description}({name}): {timings[description]:.2f} 秒")
+    
+    start = time.perf_counter()
+    wb.save(excel_path)
+    timings["保存表格"] = time.perf_counter() - start
+    print(f"保存表格: {timings['保存表格']:.2f} 秒")
+    
+    # 快照已随重命名/移动同步更新，保存后下次运行只需对比变化；
+    # 没有执行使用对比结果的步骤时保留上一次的快照，变化留到下次处理
+    if snapshot is not None and any(name in CHANGES_STAGES for name, _, _ in selected):
+        snapshot.save()
+    print(f"总耗时: {time.perf_counter() - session_start:.2f} 秒")
+    return timings
+
+def recover_move_journal(folder_path, journal_path, mode):
+    """
+    处理中途中断的重命名/移动批次（日志在 #backup\\rename_journal_*.jsonl / move_journal_*.jsonl）
+    
+    Args:
+        mode: "replay" 按日志续做未完成的移动并把对应的行更新写回表格；
+              "rollback" 撤销日志中已完成的移动（表格在移动全部成功前不会被修改，无需改动）
+    
+    Returns:
+        成功返回True
+    """
+    plan, steps, status = read_journal(journal_path)
+    if plan is None:
+        print(f"日志中没有移动计划: {journal_path}")
+        return False
+    print(f"日志: {journal_path}，计划 {len(plan['ops'])} 个移动，已完成 {len(steps)} 步，状态: {status or '未结束'}")
+    
+    if mode == "rollback":
+        if status == "commit":
+            # 已提交的批次可能已经写回表格，撤销文件移动会使表格与文件不一致
+            print("该批次已全部完成（commit），不能回滚")
+            return False
+        print(f"已撤销 {rollback_journal(journal_path)} 次移动")
+        return True
+    
+    if status == "rollback":
+        print("该批次已回滚，不能续做")
+        return False
+    print(f"续做 {replay_journal(journal_path)} 次移动")
+    
+    # 中断时表格可能还没有写回，按日志重新写入（写入的是目标值，重复写入没有影响）
+    excel_path = os.path.join(folder_path, "model_info.xlsx")
+    backup_excel(folder_path)
+    wb = load_workbook(excel_path)
+    print(f"已更新表格 {apply_journal_to_workbook(wb, journal_path)} 行")
+    wb.save(excel_path)
+    return True
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="模型信息表格维护")
+    parser.add_argument("--folder", type=str, default="E:\\models", help="模型根目录")
+    parser.add_argument("--stages", nargs="+", choices=[stage[0] for stage in CATALOG_STAGES],
+                        help="只执行指定的步骤，默认执行除update_hash、report_duplicates和另一种预览方式外的全部步骤")
+    parser.add_argument("--no-snapshot", action="store_true", help="不使用文件快照，逐个检查文件是否存在")
+    parser.add_argument("--verify-hash", action="store_true", help="update_hash时同时校验表格中已有的hash")
+    parser.add_argument("--preview", choices=list(PREVIEW_STAGES), default="embed",
+                        help="预览方式：embed 在表格中嵌入图片，gallery 生成HTML预览网页")
+    parser.add_argument("--replay-journal", type=str, metavar="PATH",
+                        help="按日志续做中断的重命名/移动批次并更新表格，然后退出")
+    parser.add_argument("--rollback-journal", type=str, metavar="PATH",
+                        help="按日志撤销中断的重命名/移动批次中已完成的移动，然后退出")
+    args = parser.parse_args()
+    
+    if args.replay_journal or args.rollback_journal:
+        mode = "replay" if args.replay_journal else "rollback"
+        sys.exit(0 if recover_move_journal(args.folder, args.replay_journal or args.rollback_journal, mode) else 1)
+    
+    run_catalog_session(args.folder, args.stages, use_snapshot=not args.no_snapshot,
+                        stage_options={"update_hash": {"verify": args.verify_hash}}, preview=args.preview)
@@ -0,0 +1,113 @@
+"""
+format_excel 性能测试：生成合成的大表格（默认最多20000行），分别用原来逐个单元格创建样式的方式
+和现在的命名样式方式格式化，统计格式化耗时、保存耗时和文件大小。
+
+参考结果（python benchmark_format_excel.py --sizes 2000 20000，openpyxl 3.1.5）：
+      行数     方式       格式化(秒)      保存(秒)       文件大小(KB)
+    2000    原方式         1.46       0.64          235.6
+    2000    新方式         0.28       0.66          235.6
+   20000    原方式        19.98      11.02         2244.2
+   20000    新方式         4.27      10.60         2244.3
+格式化耗时降到原来的约1/5，保存耗时和文件大小基本不变。
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Alignment
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(CURRENT_DIR)
+from benchmark_json_to_execl import load_step2_module
+
+HEADERS = [
+    "文件名", "拓展名", "原名", "文件夹名", "ComfyUI路径", "新文件夹", "类型", "风格", "用途", "版本", "url", "图片路径", "图片预览",
+    "描述", "SD Link", "特指词", "主描述词", "触发词", "可选形象", "可选服装", "notes", "默认权重", "权重范围", "否定提示词",
+    "hash", "喜爱", "修改时间"
+]
+SHEETS = ["Lora", "Stable-diffusion", "VAE"]
+
+
+def build_workbook(excel_path, count):
+    """
+    生成合成表格，行数平均分配到各工作表
+    """
+    wb = Workbook()
+    wb.remove(wb.active)
+    for index, sheet in enumerate(SHEETS):
+        ws = wb.create_sheet(title=sheet)
+        ws.append(HEADERS)
+        for i in range(index, count, len(SHEETS)):
+            row = {header: "" for header in HEADERS}
+            row.update({
+                "文件名": f"model_{i:06d}",
+                "拓展名": ".safetensors",
+                "原名": f"model_{i:06d}",
+                "文件夹名": "SD_XL_角色",
+                "url": f"https://example.com/models/{i}",
+                "描述": f"synthetic model {i} " * 5,
+                "触发词": f"trigger_{i}",
+                "hash": f"{i:064x}",
+                "修改时间": 1734931371.0 + i,
+            })
+            ws.append([row[header] for header in HEADERS])
+    wb.save(excel_path)
+
+
+def legacy_apply_catalog_style(ws, header_height=14, row_height=100):
+    """
+    重放原来的方式：逐行设置行高，每个单元格新建一个Alignment对象
+    """
+    ws.row_dimensions[1].height = header_height
+    for row in range(2, ws.max_row + 1):
+        ws.row_dimensions[row].height = row_height
+    for row in ws.iter_rows(min_row=1):
+        for cell in row:
+            cell.alignment = Alignment(wrap_text=True, horizontal='left', vertical='center')
+
+
+def measure(step2, excel_path, folder_path):
+    wb = load_workbook(excel_path)
+    start = time.perf_counter()
+    step2.format_excel(folder_path, wb=wb)
+    format_time = time.perf_counter() - start
+    start = time.perf_counter()
+    wb.save(excel_path)
+    save_time = time.perf_counter() - start
+    return format_time, save_time, os.path.getsize(excel_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="format_excel 性能测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000], help="测试的行数")
+    args = parser.parse_args()
+
+    step2 = load_step2_module()
+    fast_style = step2.apply_catalog_style
+
+    print("\n===== format_excel 性能测试 =====")
+    print(f"{'行数':>8} {'方式':>6} {'格式化(秒)':>12} {'保存(秒)':>10} {'文件大小(KB)':>14}")
+    for size in args.sizes:
+        folder_path = tempfile.mkdtemp(prefix="format_excel_")
+        try:
+            source_path = os.path.join(folder_path, "source.xlsx")
+            excel_path = os.path.join(folder_path, "model_info.xlsx")
+            build_workbook(source_path, size)
+            for label, style_func in (("原方式", legacy_apply_catalog_style), ("新方式", fast_style)):
+                shutil.copyfile(source_path, excel_path)
+                step2.apply_catalog_style = style_func
+                format_time, save_time, file_size = measure(step2, excel_path, folder_path)
+                print(f"{size:>8} {label:>6} {format_time:>12.2f} {save_time:>10.2f} {file_size / 1024:>14.1f}")
+        finally:
+            step2.apply_catalog_style = fast_style
+            shutil.rmtree(folder_path, ignore_errors=True)
+    print("===== 性能测试完成 =====\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+json_to_execl 性能测试：生成合成的 model_info.json（默认最多20000条）和对应的空模型文件，
+分别统计首次导入（全部为新记录）和重复导入（全部为已存在记录）的耗时，观察随记录数的增长情况。
+可选 --legacy 对比原来逐行扫描去重的耗时（O(n²)，只在较小规模下运行）。
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import importlib.util
+import importlib.machinery
+from openpyxl import Workbook, load_workbook
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT_PATH = os.path.join(CURRENT_DIR, "Step2.Model_Info_to_Execl_V2.py")
+
+SHEETS = ["Lora", "Stable-diffusion", "VAE"]
+FOLDERS = ["", "SD_XL_角色", "SD_XL_风格", "FLUX_角色", "未分类"]
+
+
+def load_step2_module():
+    loader = importlib.machinery.SourceFileLoader("model_info_to_execl_v2", SCRIPT_PATH)
+    spec = importlib.util.spec_from_loader("model_info_to_execl_v2", loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+
+def build_dataset(folder_path, count):
+    """
+    生成合成数据：model_info.json、空的模型文件和空的model_info.xlsx
+    """
+    json_data = {}
+    for i in range(count):
+        sheet = SHEETS[i % len(SHEETS)]
+        folder = FOLDERS[i % len(FOLDERS)]
+        file_name = f"model_{i:06d}"
+        key = f"{sheet}\\{folder}\\{file_name}.safetensors" if folder else f"{sheet}\\{file_name}.safetensors"
+        json_data[key] = {
+            "name": file_name,
+            "type": "",
+            "url": f"https://example.com/models/{i}",
+            "description": f"synthetic model {i}",
+            "trigger_words": f"trigger_{i}",
+            "hash": f"{i:064x}",
+            "is_favorite": False,
+            "last_modified": 1734931371.0 + i,
+        }
+        model_dir = os.path.join(folder_path, sheet, folder) if folder else os.path.join(folder_path, sheet)
+        os.makedirs(model_dir, exist_ok=True)
+        open(os.path.join(model_dir, f"{file_name}.safetensors"), "wb").close()
+
+    with open(os.path.join(folder_path, "model_info.json"), "w", encoding="utf-8") as f:
+        json.dump(json_data, f, ensure_ascii=False)
+    Workbook().save(os.path.join(folder_path, "model_info.xlsx"))
+    return json_data
+
+
+def legacy_duplicate_scan(folder_path, json_data):
+    """
+    重放原来的去重方式：每条记录都逐行扫描工作表查找文件名
+    """
+    wb = load_workbook(os.path.join(folder_path, "model_info.xlsx"))
+    start = time.perf_counter()
+    for file_path in json_data:
+        sheet_name = file_path.split("\\")[0]
+        file_name = os.path.splitext(file_path.split("\\")[-1])[0]
+        ws = wb[sheet_name]
+        for row in ws.iter_rows(min_row=2):
+            if row[0].value == file_name:
+                break
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="json_to_execl 性能测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 10000, 20000], help="测试的记录数")
+    parser.add_argument("--legacy", action="store_true", help="同时统计原逐行扫描去重的耗时")
+    parser.add_argument("--legacy-max", type=int, default=5000, help="原方式只在不超过该记录数时运行")
+    args = parser.parse_args()
+
+    step2 = load_step2_module()
+
+    print("\n===== json_to_execl 性能测试 =====")
+    print(f"{'记录数':>8} {'首次导入(秒)':>14} {'重复导入(秒)':>14} {'每千条(毫秒)':>14} {'原方式去重(秒)':>16}")
+    for size in args.sizes:
+        folder_path = tempfile.mkdtemp(prefix="json_to_execl_")
+        try:
+            json_data = build_dataset(folder_path, size)
+
+            # 测试数据中的模型是空文件，不读取safetensors文件头（否则每条记录都会输出一条读取失败的警告）
+            start = time.perf_counter()
+            step2.json_to_execl(folder_path, read_safetensors=False)
+            first_time = time.perf_counter() - start
+
+            # 第二次导入时所有记录都已存在，只走去重路径
+            start = time.perf_counter()
+            step2.json_to_execl(folder_path, read_safetensors=False)
+            repeat_time = time.perf_counter() - start
+
+            legacy = "-"
+            if args.legacy and size <= args.legacy_max:
+                legacy = f"{legacy_duplicate_scan(folder_path, json_data):.2f}"
+
+            print(f"{size:>8} {first_time:>14.2f} {repeat_time:>14.2f} {first_time / size * 1000000:>14.1f} {legacy:>16}")
+        finally:
+            shutil.rmtree(folder_path, ignore_errors=True)
+    print("===== 性能测试完成 =====\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
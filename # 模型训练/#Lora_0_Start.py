@@ -5,18 +5,28 @@ from openpyxl import Workbook, load_workbook
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Alignment, Font, PatternFill
 import datetime
+import time
 import shutil
 import subprocess
 import importlib.util
 import importlib.machinery
 import inspect
 import yaml
+import json
 import pathlib
 
 # 定义训练集类型和地址
 CHARACTER_DIR = "E:\\Design\\Character"
 STYLES_DIR = "E:\\Design\\Styles"
 
+# 队列模式的检查点文件名（项目目录队列时保存在该目录下）
+QUEUE_STATE_NAME = "lora_queue_state.json"
+
+# 步骤脚本模块注册表：每个脚本在进程内只导入一次，之后直接复用
+_step_modules = {}
+# 各步骤的导入/执行耗时记录 {脚本描述: {"import": 秒, "run": 秒, "mode": 执行方式}}
+step_timings = {}
+
 def parse_arguments():
     """
     解析命令行参数
@@ -25,6 +35,8 @@ def parse_arguments():
     parser.add_argument("--project_path", type=str, help="项目路径，如果不提供，将自动检测")
     parser.add_argument("--bat_dir", action="store_true", help="使用bat文件所在目录作为项目路径")
     parser.add_argument("--use_yaml", action="store_true", help="使用yaml配置文件中的项目路径")
+    parser.add_argument("--isolated", action="store_true", help="每个步骤脚本在独立进程中运行（默认在当前进程内复用已导入的模块）")
+    parser.add_argument("--queue", type=str, help="队列模式：项目所在目录或队列文件(txt每行一个项目路径，yaml使用projects列表)，依次执行所有项目")
     return parser.parse_args()
 
 def detect_project_type_and_name(project_path=None):
@@ -207,6 +219,19 @@ def create_training_info_excel(project_type, project_name, project_path):
     for i in range(2, 21):  # 设置前20行的行高
         prompts_sheet.row_dimensions[i].height = 100
     
+    # 创建训练参数工作表：填写的参数会覆盖训练模板中的同名参数，生成项目自己的toml文件
+    params_sheet = wb.create_sheet(title="训练参数")
+    params_sheet.column_dimensions['A'].width = 30
+    params_sheet.column_dimensions['B'].width = 30
+    params_sheet.column_dimensions['C'].width = 40
+    params_sheet['A1'] = "参数名"
+    params_sheet['B1'] = "值"
+    params_sheet['C1'] = "说明"
+    for cell in params_sheet[1]:
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+    
     # 保存工作簿
     wb.save(excel_path)
     print(f"已创建训练信息Excel文件: {excel_path}")
@@ -364,97 +389,133 @@ def get_script_path(script_name):
     
     return script_path
 
-def run_script(script_name, args=None, script_description=None):
+def load_step_module(script_name):
+    """
+    从注册表获取步骤脚本模块，首次使用时导入并记录导入耗时
+    
+    Args:
+        script_name: 脚本文件名
+    
+    Returns:
+        (模块对象, 本次导入耗时秒数)，已缓存的模块导入耗时为0
+    """
+    if script_name in _step_modules:
+        return _step_modules[script_name], 0.0
+    
+    script_path = get_script_path(script_name)
+    module_name = script_name.replace("#", "").replace(".py", "")
+    start_time = time.perf_counter()
+    loader = importlib.machinery.SourceFileLoader(module_name, script_path)
+    spec = importlib.util.spec_from_loader(module_name, loader)
+    script_module = importlib.util.module_from_spec(spec)
+    loader.exec_module(script_module)
+    import_time = time.perf_counter() - start_time
+    
+    _step_modules[script_name] = script_module
+    print(f"已导入脚本模块 {module_name}，耗时 {import_time:.2f} 秒")
+    return script_module, import_time
+
+def run_script_subprocess(script_path, args=None):
+    """
+    在独立的Python进程中运行脚本
+    
+    Args:
+        script_path: 脚本路径
+        args: 传递给脚本的命令行参数列表
+    
+    Returns:
+        成功返回True，失败返回False
+    """
+    cmd = [sys.executable, script_path]
+    if args:
+        cmd.extend(args)
+    
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    print("脚本输出:")
+    print(result.stdout)
+    if result.stderr:
+        print("错误输出:")
+        print(result.stderr)
+    
+    return result.returncode == 0
+
+def run_script(script_name, project_path, script_description=None, cli_args=None, isolated=False, **opts):
     """
     通用脚本运行函数
+    - 默认在当前进程内运行：脚本模块只导入一次，调用其 run(project_path, **opts) 入口
+    - isolated=True 时使用独立进程运行，传递 cli_args 命令行参数
     
     Args:
         script_name: 脚本文件名
-        args: 传递给脚本的参数列表
+        project_path: 传递给脚本的路径参数
         script_description: 脚本描述，用于日志输出
+        cli_args: 独立进程运行时的命令行参数列表，默认为 [project_path]
+        isolated: 是否在独立进程中运行
+        **opts: 传递给脚本 run 入口的其他参数
     
     Returns:
         成功返回True，失败返回False
     """
+    # 如果没有提供描述，使用脚本名称
+    if not script_description:
+        script_description = script_name
+    if cli_args is None:
+        cli_args = [project_path]
+    
+    timing = {"import": 0.0, "run": 0.0, "mode": "subprocess" if isolated else "in-process"}
+    step_timings[script_description] = timing
+    
     try:
         # 获取脚本路径
         script_path = get_script_path(script_name)
         
-        # 如果没有提供描述，使用脚本名称
-        if not script_description:
-            script_description = script_name
-        
         print(f"\n===== 开始运行{script_description}脚本 =====")
         print(f"脚本路径: {script_path}")
-        if args:
-            print(f"传递参数: {args}")
+        print(f"传递参数: {project_path} {opts if opts else ''}")
         
-        # 优先使用importlib方式直接导入并执行模块
-        try:
-            print("使用importlib方法导入脚本...")
-            # 使用importlib动态导入模块
-            module_name = script_name.replace("#", "").replace(".py", "")
-            loader = importlib.machinery.SourceFileLoader(module_name, script_path)
-            spec = importlib.util.spec_from_loader(module_name, loader)
-            script_module = importlib.util.module_from_spec(spec)
-            loader.exec_module(script_module)
-            
-            # 保存当前sys.argv和标准输出
-            old_argv = sys.argv.copy()
-            
-            # 修改sys.argv以传递参数
-            sys.argv = [script_path]
-            if args:
-                if isinstance(args, list):
-                    sys.argv.extend(args)
-                else:
-                    sys.argv.append(args)
-                    
-            # 调用模块的main函数
-            if hasattr(script_module, 'main'):
-                script_module.main()
-                success = True
-            else:
-                print(f"警告: 脚本 {script_name} 没有main函数，尝试使用subprocess方法")
-                raise AttributeError(f"脚本 {script_name} 没有main函数")
-                
-            # 恢复原始sys.argv
-            sys.argv = old_argv
-            
-        except Exception as e:
-            print(f"使用importlib方法执行脚本时出错: {e}")
-            print("尝试使用subprocess方法执行脚本...")
+        if isolated:
+            print("使用独立进程执行脚本...")
+            start_time = time.perf_counter()
+            success = run_script_subprocess(script_path, cli_args)
+            timing["run"] = time.perf_counter() - start_time
+        else:
+            script_module, timing["import"] = load_step_module(script_name)
+            if not hasattr(script_module, 'run'):
+                raise AttributeError(f"脚本 {script_name} 没有run入口函数")
             
-            # 备选方法: 使用subprocess调用脚本
-            cmd = [sys.executable, script_path]
-            if args:
-                if isinstance(args, list):
-                    cmd.extend(args)
-                else:
-                    cmd.append(args)
-                    
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            print("脚本输出:")
-            print(result.stdout)
-            if result.stderr:
-                print("错误输出:")
-                print(result.stderr)
-                
-            success = result.returncode == 0
+            start_time = time.perf_counter()
+            try:
+                result = script_module.run(project_path, **opts)
+            finally:
+                timing["run"] = time.perf_counter() - start_time
+            success = result is not False
         
         print(f"{script_description}脚本执行{'成功' if success else '失败'}")
+        print(f"导入耗时: {timing['import']:.2f} 秒，执行耗时: {timing['run']:.2f} 秒 ({timing['mode']})")
         print(f"===== {script_description}脚本执行完成 =====\n")
         return success
     except Exception as e:
         print(f"运行{script_description}脚本时出错: {e}")
         return False
 
-def run_resize_script(resize_dir):
+def print_step_timings():
+    """
+    输出各步骤的导入/执行耗时统计
+    """
+    if not step_timings:
+        return
+    print("\n===== 步骤耗时统计 =====")
+    for script_description, timing in step_timings.items():
+        print(f"  - {script_description}: 导入 {timing['import']:.2f} 秒，执行 {timing['run']:.2f} 秒 ({timing['mode']})")
+    print("===== 步骤耗时统计完成 =====\n")
+
+def run_resize_script(resize_dir, isolated=False):
     """
     运行图片尺寸标准化脚本
     
     Args:
         resize_dir: resize文件夹路径
+        isolated: 是否在独立进程中运行
     
     Returns:
         成功返回True，失败返回False
@@ -468,14 +529,15 @@ def run_resize_script(resize_dir):
         print(f"创建目录: {resize_dir}")
         os.makedirs(resize_dir, exist_ok=True)
     
-    return run_script("#Lora_1_图片尺寸-ARB桶.py", resize_dir, "图片尺寸标准化")
+    return run_script("#Lora_1_图片尺寸-ARB桶.py", resize_dir, "图片尺寸标准化", isolated=isolated)
 
-def run_image_description_script(resize_dir):
+def run_image_description_script(resize_dir, isolated=False):
     """
     运行图片描述生成脚本
     
     Args:
         resize_dir: resize文件夹路径
+        isolated: 是否在独立进程中运行
     
     Returns:
         成功返回True，失败返回False
@@ -483,15 +545,16 @@ def run_image_description_script(resize_dir):
     # 确保resize_dir是绝对路径
     resize_dir = os.path.abspath(resize_dir)
     
-    return run_script("#Lora_2_画面描述-Gemini.py", resize_dir, "图片描述生成")
+    return run_script("#Lora_2_画面描述-Gemini.py", resize_dir, "图片描述生成", isolated=isolated)
 
-def run_description_optimization_script(project_path, ai_translation=False):
+def run_description_optimization_script(project_path, ai_translation=False, isolated=False):
     """
     运行图片描述优化脚本
     
     Args:
         project_path: 项目路径
         ai_translation: 是否执行AI翻译
+        isolated: 是否在独立进程中运行
     
     Returns:
         成功返回True，失败返回False
@@ -499,19 +562,21 @@ def run_description_optimization_script(project_path, ai_translation=False):
     # 确保project_path是绝对路径
     project_path = os.path.abspath(project_path)
     
-    # 如果需要执行AI翻译，传递额外参数
-    args = [project_path]
-    if ai_translation:
-        args.append("--translate")
+    # 如果需要执行AI翻译，使用优化模式2（中文优化并翻译）
+    optimization_mode = 2 if ai_translation else 1
     
-    return run_script("#Lora_3_画面描述优化-Gemini.py", args, "图片描述优化")
+    return run_script("#Lora_3_画面描述优化-Gemini.py", project_path, "图片描述优化",
+                      cli_args=[project_path, str(optimization_mode)], isolated=isolated,
+                      optimization_mode=optimization_mode)
 
-def run_model_training_script(project_path):
+def run_model_training_script(project_path, isolated=False, on_checkpoint=None):
     """
     运行模型Lora训练脚本
     
     Args:
         project_path: 项目路径
+        isolated: 是否在独立进程中运行
+        on_checkpoint: 每个检查点写入完成时的回调（仅进程内运行时有效）
     
     Returns:
         成功返回True，失败返回False
@@ -519,14 +584,17 @@ def run_model_training_script(project_path):
     # 确保project_path是绝对路径
     project_path = os.path.abspath(project_path)
     
-    return run_script("#Lora_4_模型训练.py", project_path, "模型Lora训练")
+    opts = {"on_checkpoint": on_checkpoint} if on_checkpoint and not isolated else {}
+    return run_script("#Lora_4_模型训练.py", project_path, "模型Lora训练", isolated=isolated, **opts)
 
-def run_model_test_script(project_path):
+def run_model_test_script(project_path, isolated=False, streamed=False):
     """
     运行模型Lora测试脚本
     
     Args:
         project_path: 项目路径
+        isolated: 是否在独立进程中运行
+        streamed: 保留边训练边测试生成的测试表格，只补充剩余的测试
     
     Returns:
         成功返回True，失败返回False
@@ -534,8 +602,27 @@ def run_model_test_script(project_path):
     # 确保project_path是绝对路径
     project_path = os.path.abspath(project_path)
     
-    # 使用命名参数格式传递项目路径
-    return run_script("#Lora_5_模型测试.py", ["--project_path", project_path], "模型Lora测试")
+    # 独立进程运行时使用命名参数格式传递项目路径
+    cli_args = ["--project_path", project_path] + (["--streamed"] if streamed else [])
+    return run_script("#Lora_5_模型测试.py", project_path, "模型Lora测试",
+                      cli_args=cli_args, isolated=isolated, streamed=streamed)
+
+def start_streaming_evaluation(project_path):
+    """
+    模型Lora测试的执行标志为2时，在训练开始前启动边训练边测试
+    
+    Returns:
+        StreamingEvaluator，启动失败返回None
+    """
+    try:
+        test_module, _ = load_step_module("#Lora_5_模型测试.py")
+        evaluator = test_module.start_streaming_evaluation(os.path.abspath(project_path))
+        if evaluator:
+            print("已启动边训练边测试，检查点写入完成后将立即生成测试图片")
+        return evaluator
+    except Exception as e:
+        print(f"启动边训练边测试失败，训练结束后再统一测试: {e}")
+        return None
 
 def run_description_insertion_script(project_path, excel_path):
     """
@@ -754,6 +841,453 @@ def shutdown_computer():
     except Exception as e:
         print(f"执行关机操作时出错: {e}")
 
+def run_project_pipeline(project_type, project_name, project_path, on_step_finished=None, isolated=False):
+    """
+    对单个项目执行训练流程：检查/创建训练信息Excel，按执行标志依次运行各步骤
+    
+    Args:
+        project_type: 项目类型
+        project_name: 项目名称
+        project_path: 项目路径
+        on_step_finished: 步骤执行完成后的回调，参数为(步骤名称, 是否成功)，队列模式用于记录检查点
+        isolated: 步骤脚本是否在独立进程中运行
+    
+    Returns:
+        (Excel文件路径, 执行标志字典)
+    """
+    # 检查训练信息Excel文件是否已存在
+    print("\n===== 检查训练信息Excel文件 =====")
+    excel_path = os.path.join(project_path, "训练信息.xlsx")
+    print(f"Excel文件路径: {excel_path}")
+    excel_exists = os.path.exists(excel_path)
+    
+    if excel_exists:
+        print(f"检测到训练信息Excel文件已存在: {excel_path}")
+        print("跳过初始化步骤，直接读取执行标志")
+        print("===== 训练信息Excel文件检查完成 =====\n")
+    else:
+        print("训练信息Excel文件不存在，需要创建")
+        print("===== 训练信息Excel文件检查完成 =====\n")
+        
+        # 创建目录结构
+        create_directory_structure(project_path)
+        
+        # 创建训练信息Excel文件
+        excel_path = create_training_info_excel(project_type, project_name, project_path)
+        
+        print("\n===== 项目初始化完成! =====")
+        print(f"请在 {excel_path} 中设置训练步骤的执行标志")
+        print("===== 初始化阶段结束 =====\n")
+    
+    # 读取执行标志
+    execution_flags = read_execution_flags(excel_path)
+    
+    print("\n===== 开始执行训练流程 =====")
+    print(f"共检测到 {len(execution_flags)} 个步骤")
+    
+    # 检查是否需要执行图片尺寸标准化
+    step_name = "图片尺寸标准化"
+    print(f"\n----- 步骤1: {step_name} -----")
+    if execution_flags.get(step_name) == 1 and not check_step_completed(excel_path, step_name):
+        print(f"执行标志为1，且步骤未完成，开始执行{step_name}...")
+        resize_dir = os.path.join(project_path, "resize")
+        print(f"resize目录: {resize_dir}")
+        success = run_resize_script(resize_dir, isolated=isolated)
+        # 更新Excel中的完成结果
+        update_step_result(excel_path, step_name, success)
+        if on_step_finished:
+            on_step_finished(step_name, success)
+        print(f"----- 步骤1: {step_name} {'完成' if success else '失败'} -----")
+    else:
+        skip_reason = "步骤已完成" if check_step_completed(excel_path, step_name) else "执行标志未设置为1"
+        print(f"跳过{step_name}步骤，原因: {skip_reason}")
+        print(f"----- 步骤1: {step_name} 已跳过 -----")
+    
+    # 检查是否需要执行图片描述生成
+    step_name = "图片描述生成"
+    print(f"\n----- 步骤2: {step_name} -----")
+    # 只有当前一步骤成功完成时，才执行当前步骤
+    if execution_flags.get(step_name) == 1 and check_step_completed(excel_path, "图片尺寸标准化") and not check_step_completed(excel_path, step_name):
+        print(f"执行标志为1，前置步骤已完成，且当前步骤未完成，开始执行{step_name}...")
+        resize_dir = os.path.join(project_path, "resize")
+        print(f"resize目录: {resize_dir}")
+        success = run_image_description_script(resize_dir, isolated=isolated)
+        # 更新Excel中的完成结果
+        update_step_result(excel_path, step_name, success)
+        if on_step_finished:
+            on_step_finished(step_name, success)
+        print(f"----- 步骤2: {step_name} {'完成' if success else '失败'} -----")
+    else:
+        skip_reason = "步骤已完成" if check_step_completed(excel_path, step_name) else \
+                    "前置步骤未完成" if not check_step_completed(excel_path, "图片尺寸标准化") else \
+                    "执行标志未设置为1"
+        print(f"跳过{step_name}步骤，原因: {skip_reason}")
+        print(f"----- 步骤2: {step_name} 已跳过 -----")
+    
+    # 检查是否需要执行图片描述优化
+    step_name = "图片描述优化"
+    print(f"\n----- 步骤3: {step_name} -----")
+    # 只有当前一步骤成功完成时，才执行当前步骤
+    if execution_flags.get(step_name) == 1 and check_step_completed(excel_path, "图片描述生成") and not check_step_completed(excel_path, step_name):
+        print(f"执行标志为1，前置步骤已完成，且当前步骤未完成，开始执行{step_name}...")
+        success = run_description_optimization_script(project_path, isolated=isolated)
+        # 更新Excel中的完成结果
+        update_step_result(excel_path, step_name, success)
+        if on_step_finished:
+            on_step_finished(step_name, success)
+        print(f"----- 步骤3: {step_name} {'完成' if success else '失败'} -----")
+    elif execution_flags.get(step_name) == 2 and check_step_completed(excel_path, "图片描述生成") and not check_step_completed(excel_path, step_name):
+        print(f"执行标志为2，前置步骤已完成，且当前步骤未完成，开始执行{step_name}(含AI翻译)...")
+        success = run_description_optimization_script(project_path, True, isolated=isolated)
+        # 更新Excel中的完成结果
+        update_step_result(excel_path, step_name, success)
+        if on_step_finished:
+            on_step_finished(step_name, success)
+        print(f"----- 步骤3: {step_name}(含AI翻译) {'完成' if success else '失败'} -----")
+    else:
+        skip_reason = "步骤已完成" if check_step_completed(excel_path, step_name) else \
+                    "前置步骤未完成" if not check_step_completed(excel_path, "图片描述生成") else \
+                    "执行标志未设置为1或2"
+        print(f"跳过{step_name}步骤，原因: {skip_reason}")
+        print(f"----- 步骤3: {step_name} 已跳过 -----")
+    
+    # 检查是否需要执行图片描述插入
+    step_name = "图片描述插入"
+    print(f"\n----- 步骤3.5: {step_name} -----")
+    # 只有当前一步骤成功完成时，才执行当前步骤
+    if execution_flags.get(step_name) == 1 and check_step_completed(excel_path, "图片描述优化") and not check_step_completed(excel_path, step_name):
+        print(f"执行标志为1，前置步骤已完成，且当前步骤未完成，开始执行{step_name}...")
+        success = run_description_insertion_script(project_path, excel_path)
+        # 更新Excel中的完成结果
+        update_step_result(excel_path, step_name, success)
+        if on_step_finished:
+            on_step_finished(step_name, success)
+        print(f"----- 步骤3.5: {step_name} {'完成' if success else '失败'} -----")
+    else:
+        skip_reason = "步骤已完成" if check_step_completed(excel_path, step_name) else \
+                    "前置步骤未完成" if not check_step_completed(excel_path, "图片描述优化") else \
+                    "执行标志未设置为1"
+        print(f"跳过{step_name}步骤，原因: {skip_reason}")
+        print(f"----- 步骤3.5: {step_name} 已跳过 -----")
+    
+    # 检查是否需要执行模型Lora训练
+    step_name = "模型Lora训练"
+    print(f"\n----- 步骤4: {step_name} -----")
+    # 只有当前一步骤成功完成时，才执行当前步骤
+    if execution_flags.get(step_name) == 1 and check_step_completed(excel_path, "图片描述优化") and not check_step_completed(excel_path, step_name):
+        print(f"执行标志为1，前置步骤已完成，且当前步骤未完成，开始执行{step_name}...")
+        # 模型Lora测试的执行标志为2时边训练边测试（需要在同一进程中接收检查点事件）
+        evaluator = None
+        if execution_flags.get("模型Lora测试") == 2 and not isolated:
+            evaluator = start_streaming_evaluation(project_path)
+        success = run_model_training_script(project_path, isolated=isolated,
+                                            on_checkpoint=evaluator.on_checkpoint if evaluator else None)
+        if evaluator:
+            print("等待已提交的检查点测试完成...")
+            evaluator.finish()
+        # 更新Excel中的完成结果
+        update_step_result(excel_path, step_name, success)
+        if on_step_finished:
+            on_step_finished(step_name, success)
+        print(f"----- 步骤4: {step_name} {'完成' if success else '失败'} -----")
+    else:
+        skip_reason = "步骤已完成" if check_step_completed(excel_path, step_name) else \
+                    "前置步骤未完成" if not check_step_completed(excel_path, "图片描述优化") else \
+                    "执行标志未设置为1"
+        print(f"跳过{step_name}步骤，原因: {skip_reason}")
+        print(f"----- 步骤4: {step_name} 已跳过 -----")
+    
+    # 检查是否需要执行模型Lora测试
+    step_name = "模型Lora测试"
+    print(f"\n----- 步骤5: {step_name} -----")
+    # 只有当前一步骤成功完成时，才执行当前步骤
+    if execution_flags.get(step_name) in (1, 2) and check_step_completed(excel_path, "模型Lora训练") and not check_step_completed(excel_path, step_name):
+        print(f"执行标志为{execution_flags.get(step_name)}，前置步骤已完成，且当前步骤未完成，开始执行{step_name}...")
+        success = run_model_test_script(project_path, isolated=isolated,
+                                        streamed=execution_flags.get(step_name) == 2)
+        # 更新Excel中的完成结果
+        update_step_result(excel_path, step_name, success)
+        if on_step_finished:
+            on_step_finished(step_name, success)
+        print(f"----- 步骤5: {step_name} {'完成' if success else '失败'} -----")
+    else:
+        skip_reason = "步骤已完成" if check_step_completed(excel_path, step_name) else \
+                    "前置步骤未完成" if not check_step_completed(excel_path, "模型Lora训练") else \
+                    "执行标志未设置为1或2"
+        print(f"跳过{step_name}步骤，原因: {skip_reason}")
+        print(f"----- 步骤5: {step_name} 已跳过 -----")
+    
+    print("\n===== 训练流程执行完成 =====")
+    # 统计已完成的步骤
+    completed_steps = [step for step in execution_flags.keys() 
+                    if check_step_completed(excel_path, step)]
+    print(f"已完成的步骤数: {len(completed_steps)}/{len(execution_flags)}")
+    if completed_steps:
+        print("已完成的步骤:")
+        for step in completed_steps:
+            print(f"  - {step}")
+    print("===== 流程执行统计完成 =====\n")
+    
+    return excel_path, execution_flags
+
+def should_shutdown(excel_path, execution_flags):
+    """
+    根据"是否关机"标志判断流程结束后是否需要关机
+    
+    Args:
+        excel_path: Excel文件路径
+        execution_flags: 执行标志字典
+    
+    Returns:
+        需要关机返回True，否则返回False
+    """
+    # 检查是否需要执行关机操作
+    print("\n===== 检查是否需要执行关机操作 =====")
+    shutdown_flag = execution_flags.get("是否关机", 0)
+    print(f"是否关机标志: {shutdown_flag}")
+    
+    if shutdown_flag == 1 and check_step_completed(excel_path, "模型Lora测试"):
+        print("是否关机标志为1，且模型Lora测试步骤已成功完成，将执行关机操作")
+        decision = True
+    elif shutdown_flag == 2:
+        print("是否关机标志为2，无论流程成功或失败，将执行关机操作")
+        decision = True
+    else:
+        print("不满足关机条件，跳过关机操作")
+        decision = False
+    print("===== 关机检查完成 =====\n")
+    return decision
+
+def load_project_queue(queue_path):
+    """
+    读取项目队列
+    
+    Args:
+        queue_path: 项目所在目录（取其下包含训练信息.xlsx的子目录）或队列文件
+            - .yaml/.yml文件: 读取projects列表
+            - 其他文件: 每行一个项目路径，#开头为注释
+    
+    Returns:
+        规范化后的项目路径列表（保持顺序，去重）
+    """
+    print("\n===== 开始读取项目队列 =====")
+    print(f"队列来源: {queue_path}")
+    
+    project_paths = []
+    if os.path.isdir(queue_path):
+        for name in sorted(os.listdir(queue_path)):
+            sub_path = os.path.join(queue_path, name)
+            if not os.path.isdir(sub_path):
+                continue
+            if os.path.exists(os.path.join(sub_path, "训练信息.xlsx")):
+                project_paths.append(sub_path)
+            else:
+                print(f"跳过未初始化的目录(缺少训练信息.xlsx): {sub_path}")
+    elif os.path.isfile(queue_path):
+        if queue_path.lower().endswith((".yaml", ".yml")):
+            with open(queue_path, 'r', encoding='utf-8') as f:
+                config = yaml.safe_load(f) or {}
+            project_paths = [p for p in config.get("projects", []) if p]
+        else:
+            with open(queue_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        project_paths.append(line)
+    else:
+        raise FileNotFoundError(f"队列路径不存在: {queue_path}")
+    
+    # 规范化路径并去重
+    queue = []
+    for project_path in project_paths:
+        project_path = os.path.normpath(project_path)
+        if project_path not in queue:
+            queue.append(project_path)
+    
+    print(f"队列中共有 {len(queue)} 个项目")
+    for i, project_path in enumerate(queue, 1):
+        print(f"  {i}. {project_path}")
+    print("===== 项目队列读取完成 =====\n")
+    return queue
+
+def get_queue_state_path(queue_path):
+    """
+    获取队列检查点文件路径：目录队列保存在目录下，文件队列保存在队列文件旁
+    """
+    if os.path.isdir(queue_path):
+        return os.path.join(queue_path, QUEUE_STATE_NAME)
+    return os.path.splitext(queue_path)[0] + "." + QUEUE_STATE_NAME
+
+def load_queue_state(state_path):
+    """
+    读取队列检查点，文件不存在或损坏时返回空状态
+    """
+    if os.path.exists(state_path):
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            print(f"已读取队列检查点: {state_path}")
+            return state
+        except Exception as e:
+            print(f"读取队列检查点时出错，将重新开始记录: {e}")
+    return {"projects": {}, "shutdown_requested": False}
+
+def save_queue_state(state_path, state):
+    """
+    保存队列检查点（先写临时文件再替换，避免中途断电导致文件损坏）
+    """
+    try:
+        tmp_path = state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, state_path)
+    except Exception as e:
+        print(f"保存队列检查点时出错: {e}")
+
+def prepare_queue_configs(queue, state):
+    """
+    为队列中尚未完成且已有训练信息Excel的项目提前生成toml配置文件
+    每个项目写入自己的toml，不再修改共用的训练模板，前一个项目训练时后面的项目配置已经准备好
+    """
+    try:
+        trainer_module, _ = load_step_module("#Lora_4_模型训练.py")
+    except Exception as e:
+        print(f"加载训练脚本失败，跳过提前生成配置: {e}")
+        return
+    for project_path in queue:
+        if state["projects"].get(project_path, {}).get("status") == "done":
+            continue
+        if not os.path.exists(os.path.join(project_path, "训练信息.xlsx")):
+            continue
+        try:
+            toml_path = trainer_module.prepare_config(project_path)
+            if toml_path:
+                print(f"已提前生成配置: {toml_path}")
+        except Exception as e:
+            print(f"提前生成 {project_path} 的配置失败，将在训练步骤中重试: {e}")
+
+def get_project_queue_status(excel_path, execution_flags, excel_created=False):
+    """
+    根据训练信息.xlsx判断队列中项目的状态（不根据本次是否有步骤失败判断：
+    被跳过的步骤同样没有完成，标记为done后下次运行会跳过整个项目）
+    
+    Args:
+        excel_path: Excel文件路径
+        execution_flags: 执行标志字典
+        excel_created: Excel文件是否是本次新创建的
+    
+    Returns:
+        (状态, 未完成的步骤列表)，状态为 "needs_setup"（需要设置执行标志）、"done" 或 "incomplete"
+    """
+    if excel_created:
+        return "needs_setup", []
+    enabled = [step for step, flag in execution_flags.items() if step != "是否关机" and flag in (1, 2)]
+    if not enabled:
+        return "needs_setup", []
+    pending = [step for step in enabled if not check_step_completed(excel_path, step)]
+    return ("incomplete" if pending else "done"), pending
+
+def run_project_queue(queue_path, isolated=False):
+    """
+    队列模式：依次执行队列中的所有项目
+    - ComfyUI连接、翻译器实例在进程内复用（utils.warm_resources），训练服务器在项目之间保持运行
+    - 每个步骤完成后写入检查点，重启后跳过已完成的项目，未完成项目中已成功的步骤由训练信息.xlsx跳过
+    - 只在最后一个项目完成后才根据各项目的"是否关机"标志决定是否关机
+    
+    Args:
+        queue_path: 项目所在目录或队列文件
+        isolated: 步骤脚本是否在独立进程中运行
+    
+    Returns:
+        所有项目都完成返回0，否则返回1
+    """
+    queue = load_project_queue(queue_path)
+    state_path = get_queue_state_path(queue_path)
+    state = load_queue_state(state_path)
+    state.setdefault("projects", {})
+    state.setdefault("shutdown_requested", False)
+    print(f"队列检查点文件: {state_path}")
+    
+    # 独立进程模式下不在主进程中导入训练脚本
+    if not isolated:
+        prepare_queue_configs(queue, state)
+    
+    for index, project_path in enumerate(queue, 1):
+        print("\n########################################")
+        print(f"  队列项目 [{index}/{len(queue)}]: {project_path}")
+        print("########################################\n")
+        
+        entry = state["projects"].setdefault(project_path, {"status": "pending", "steps": {}})
+        if entry.get("status") == "done":
+            print(f"检查点记录该项目已完成，跳过: {project_path}")
+            continue
+        
+        entry["status"] = "running"
+        entry["started"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        entry.setdefault("steps", {})
+        entry.pop("error", None)
+        save_queue_state(state_path, state)
+        
+        step_failed = []
+        
+        def on_step_finished(step_name, success):
+            # 每个步骤完成后立即写入检查点
+            entry["steps"][step_name] = "成功" if success else "失败"
+            entry["last_step"] = step_name
+            entry["updated"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            if not success:
+                step_failed.append(step_name)
+            save_queue_state(state_path, state)
+        
+        try:
+            project_type, project_name, project_path = detect_project_type_and_name(project_path)
+            excel_created = not os.path.exists(os.path.join(project_path, "训练信息.xlsx"))
+            excel_path, execution_flags = run_project_pipeline(project_type, project_name, project_path,
+                                                               on_step_finished, isolated)
+            print_step_timings()
+            step_timings.clear()
+            # 队列模式下不立即关机，只记录关机请求
+            if should_shutdown(excel_path, execution_flags):
+                state["shutdown_requested"] = True
+                print("已记录关机请求，将在队列全部完成后执行")
+            entry["status"], pending_steps = get_project_queue_status(excel_path, execution_flags, excel_created)
+            entry["pending_steps"] = pending_steps
+            if entry["status"] == "needs_setup":
+                print(f"项目尚未设置执行标志，请在 {excel_path} 中设置后重新运行队列")
+            elif pending_steps:
+                print(f"项目未完成的步骤: {', '.join(pending_steps)}"
+                      f"{'（失败: ' + ', '.join(step_failed) + '）' if step_failed else ''}")
+        except Exception as e:
+            print(f"执行项目 {project_path} 时出错: {e}")
+            entry["status"] = "failed"
+            entry["error"] = str(e)
+        
+        entry["updated"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        save_queue_state(state_path, state)
+    
+    # 释放共享资源
+    try:
+        from utils.warm_resources import close_all
+        close_all()
+    except Exception as e:
+        print(f"释放共享资源时出错: {e}")
+    
+    print("\n===== 队列执行统计 =====")
+    all_done = True
+    for project_path in queue:
+        status = state["projects"].get(project_path, {}).get("status", "pending")
+        all_done = all_done and status == "done"
+        print(f"  - {project_path}: {status}")
+    print("===== 队列执行统计完成 =====\n")
+    
+    if state["shutdown_requested"]:
+        print("队列全部执行完毕，存在关机请求，执行关机操作")
+        state["shutdown_requested"] = False
+        save_queue_state(state_path, state)
+        shutdown_computer()
+    
+    return 0 if all_done else 1
+
 def main():
     try:
         print("\n========================================")
@@ -765,6 +1299,10 @@ def main():
         print(f"解析到的参数: {args}")
         print("===== 命令行参数解析完成 =====\n")
         
+        # 队列模式：依次执行多个项目
+        if args.queue:
+            return run_project_queue(args.queue, args.isolated)
+        
         # 确定项目路径
         project_path = None
         
@@ -798,170 +1336,14 @@ def main():
         print(f"检测到项目类型: {project_type}, 项目名称: {project_name}")
         print(f"项目路径: {project_path}")
         
-        # 检查训练信息Excel文件是否已存在
-        print("\n===== 检查训练信息Excel文件 =====")
-        excel_path = os.path.join(project_path, "训练信息.xlsx")
-        print(f"Excel文件路径: {excel_path}")
-        excel_exists = os.path.exists(excel_path)
-        
-        if excel_exists:
-            print(f"检测到训练信息Excel文件已存在: {excel_path}")
-            print("跳过初始化步骤，直接读取执行标志")
-            print("===== 训练信息Excel文件检查完成 =====\n")
-        else:
-            print("训练信息Excel文件不存在，需要创建")
-            print("===== 训练信息Excel文件检查完成 =====\n")
-            
-            # 创建目录结构
-            create_directory_structure(project_path)
-            
-            # 创建训练信息Excel文件
-            excel_path = create_training_info_excel(project_type, project_name, project_path)
-            
-            print("\n===== 项目初始化完成! =====")
-            print(f"请在 {excel_path} 中设置训练步骤的执行标志")
-            print("===== 初始化阶段结束 =====\n")
-        
-        # 读取执行标志
-        execution_flags = read_execution_flags(excel_path)
-        
-        print("\n===== 开始执行训练流程 =====")
-        print(f"共检测到 {len(execution_flags)} 个步骤")
-        
-        # 检查是否需要执行图片尺寸标准化
-        step_name = "图片尺寸标准化"
-        print(f"\n----- 步骤1: {step_name} -----")
-        if execution_flags.get(step_name) == 1 and not check_step_completed(excel_path, step_name):
-            print(f"执行标志为1，且步骤未完成，开始执行{step_name}...")
-            resize_dir = os.path.join(project_path, "resize")
-            print(f"resize目录: {resize_dir}")
-            success = run_resize_script(resize_dir)
-            # 更新Excel中的完成结果
-            update_step_result(excel_path, step_name, success)
-            print(f"----- 步骤1: {step_name} {'完成' if success else '失败'} -----")
-        else:
-            skip_reason = "步骤已完成" if check_step_completed(excel_path, step_name) else "执行标志未设置为1"
-            print(f"跳过{step_name}步骤，原因: {skip_reason}")
-            print(f"----- 步骤1: {step_name} 已跳过 -----")
-        
-        # 检查是否需要执行图片描述生成
-        step_name = "图片描述生成"
-        print(f"\n----- 步骤2: {step_name} -----")
-        # 只有当前一步骤成功完成时，才执行当前步骤
-        if execution_flags.get(step_name) == 1 and check_step_completed(excel_path, "图片尺寸标准化") and not check_step_completed(excel_path, step_name):
-            print(f"执行标志为1，前置步骤已完成，且当前步骤未完成，开始执行{step_name}...")
-            resize_dir = os.path.join(project_path, "resize")
-            print(f"resize目录: {resize_dir}")
-            success = run_image_description_script(resize_dir)
-            # 更新Excel中的完成结果
-            update_step_result(excel_path, step_name, success)
-            print(f"----- 步骤2: {step_name} {'完成' if success else '失败'} -----")
-        else:
-            skip_reason = "步骤已完成" if check_step_completed(excel_path, step_name) else \
-                        "前置步骤未完成" if not check_step_completed(excel_path, "图片尺寸标准化") else \
-                        "执行标志未设置为1"
-            print(f"跳过{step_name}步骤，原因: {skip_reason}")
-            print(f"----- 步骤2: {step_name} 已跳过 -----")
-        
-        # 检查是否需要执行图片描述优化
-        step_name = "图片描述优化"
-        print(f"\n----- 步骤3: {step_name} -----")
-        # 只有当前一步骤成功完成时，才执行当前步骤
-        if execution_flags.get(step_name) == 1 and check_step_completed(excel_path, "图片描述生成") and not check_step_completed(excel_path, step_name):
-            print(f"执行标志为1，前置步骤已完成，且当前步骤未完成，开始执行{step_name}...")
-            success = run_description_optimization_script(project_path)
-            # 更新Excel中的完成结果
-            update_step_result(excel_path, step_name, success)
-            print(f"----- 步骤3: {step_name} {'完成' if success else '失败'} -----")
-        elif execution_flags.get(step_name) == 2 and check_step_completed(excel_path, "图片描述生成") and not check_step_completed(excel_path, step_name):
-            print(f"执行标志为2，前置步骤已完成，且当前步骤未完成，开始执行{step_name}(含AI翻译)...")
-            success = run_description_optimization_script(project_path, True)
-            # 更新Excel中的完成结果
-            update_step_result(excel_path, step_name, success)
-            print(f"----- 步骤3: {step_name}(含AI翻译) {'完成' if success else '失败'} -----")
-        else:
-            skip_reason = "步骤已完成" if check_step_completed(excel_path, step_name) else \
-                        "前置步骤未完成" if not check_step_completed(excel_path, "图片描述生成") else \
-                        "执行标志未设置为1或2"
-            print(f"跳过{step_name}步骤，原因: {skip_reason}")
-            print(f"----- 步骤3: {step_name} 已跳过 -----")
-        
-        # 检查是否需要执行图片描述插入
-        step_name = "图片描述插入"
-        print(f"\n----- 步骤3.5: {step_name} -----")
-        # 只有当前一步骤成功完成时，才执行当前步骤
-        if execution_flags.get(step_name) == 1 and check_step_completed(excel_path, "图片描述优化") and not check_step_completed(excel_path, step_name):
-            print(f"执行标志为1，前置步骤已完成，且当前步骤未完成，开始执行{step_name}...")
-            success = run_description_insertion_script(project_path, excel_path)
-            # 更新Excel中的完成结果
-            update_step_result(excel_path, step_name, success)
-            print(f"----- 步骤3.5: {step_name} {'完成' if success else '失败'} -----")
-        else:
-            skip_reason = "步骤已完成" if check_step_completed(excel_path, step_name) else \
-                        "前置步骤未完成" if not check_step_completed(excel_path, "图片描述优化") else \
-                        "执行标志未设置为1"
-            print(f"跳过{step_name}步骤，原因: {skip_reason}")
-            print(f"----- 步骤3.5: {step_name} 已跳过 -----")
-        
-        # 检查是否需要执行模型Lora训练
-        step_name = "模型Lora训练"
-        print(f"\n----- 步骤4: {step_name} -----")
-        # 只有当前一步骤成功完成时，才执行当前步骤
-        if execution_flags.get(step_name) == 1 and check_step_completed(excel_path, "图片描述优化") and not check_step_completed(excel_path, step_name):
-            print(f"执行标志为1，前置步骤已完成，且当前步骤未完成，开始执行{step_name}...")
-            success = run_model_training_script(project_path)
-            # 更新Excel中的完成结果
-            update_step_result(excel_path, step_name, success)
-            print(f"----- 步骤4: {step_name} {'完成' if success else '失败'} -----")
-        else:
-            skip_reason = "步骤已完成" if check_step_completed(excel_path, step_name) else \
-                        "前置步骤未完成" if not check_step_completed(excel_path, "图片描述优化") else \
-                        "执行标志未设置为1"
-            print(f"跳过{step_name}步骤，原因: {skip_reason}")
-            print(f"----- 步骤4: {step_name} 已跳过 -----")
-        
-        # 检查是否需要执行模型Lora测试
-        step_name = "模型Lora测试"
-        print(f"\n----- 步骤5: {step_name} -----")
-        # 只有当前一步骤成功完成时，才执行当前步骤
-        if execution_flags.get(step_name) == 1 and check_step_completed(excel_path, "模型Lora训练") and not check_step_completed(excel_path, step_name):
-            print(f"执行标志为1，前置步骤已完成，且当前步骤未完成，开始执行{step_name}...")
-            success = run_model_test_script(project_path)
-            # 更新Excel中的完成结果
-            update_step_result(excel_path, step_name, success)
-            print(f"----- 步骤5: {step_name} {'完成' if success else '失败'} -----")
-        else:
-            skip_reason = "步骤已完成" if check_step_completed(excel_path, step_name) else \
-                        "前置步骤未完成" if not check_step_completed(excel_path, "模型Lora训练") else \
-                        "执行标志未设置为1"
-            print(f"跳过{step_name}步骤，原因: {skip_reason}")
-            print(f"----- 步骤5: {step_name} 已跳过 -----")
-        
-        print("\n===== 训练流程执行完成 =====")
-        # 统计已完成的步骤
-        completed_steps = [step for step in execution_flags.keys() 
-                        if check_step_completed(excel_path, step)]
-        print(f"已完成的步骤数: {len(completed_steps)}/{len(execution_flags)}")
-        if completed_steps:
-            print("已完成的步骤:")
-            for step in completed_steps:
-                print(f"  - {step}")
-        print("===== 流程执行统计完成 =====\n")
+        # 执行训练流程
+        excel_path, execution_flags = run_project_pipeline(project_type, project_name, project_path,
+                                                           isolated=args.isolated)
+        print_step_timings()
         
         # 检查是否需要执行关机操作
-        print("\n===== 检查是否需要执行关机操作 =====")
-        shutdown_flag = execution_flags.get("是否关机", 0)
-        print(f"是否关机标志: {shutdown_flag}")
-        
-        if shutdown_flag == 1 and check_step_completed(excel_path, "模型Lora测试"):
-            print("是否关机标志为1，且模型Lora测试步骤已成功完成，将执行关机操作")
+        if should_shutdown(excel_path, execution_flags):
             shutdown_computer()
-        elif shutdown_flag == 2:
-            print("是否关机标志为2，无论流程成功或失败，将执行关机操作")
-            shutdown_computer()
-        else:
-            print("不满足关机条件，跳过关机操作")
-        print("===== 关机检查完成 =====\n")
         
     except Exception as e:
         print(f"\n===== 执行过程中发生错误 =====")
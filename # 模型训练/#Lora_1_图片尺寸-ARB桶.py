@@ -239,6 +239,19 @@ def process_images(root_dir: str, delete_original: bool = True, multiple: int =
     return True
 
 
+def run(project_path, **opts):
+    """
+    流程入口，供#Lora_0_Start.py在进程内直接调用
+    
+    Args:
+        project_path: resize文件夹路径
+    
+    Returns:
+        处理成功返回True，否则返回False
+    """
+    return process_images(project_path)
+
+
 def main():
     """
     主函数入口
@@ -257,7 +270,7 @@ def main():
         print(f"使用默认目录: {root_dir}")
     
     # 处理图片
-    result = process_images(root_dir)
+    result = run(root_dir)
     
     print("\n===== 图片尺寸处理程序结束 =====\n")
     return result
@@ -1,10 +1,8 @@
 import os
 import sys
-import json
 import time
 import shutil
 import openpyxl
-from PIL import Image
 import importlib.util
 import traceback
 from pathlib import Path
@@ -12,23 +10,14 @@ from io import BytesIO
 
 # 导入自定义工具包
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.comfy_websocket_wrapper import ComfyWebSocketClient
+from utils.warm_resources import get_comfy_client, get_translation_memory
 from utils.comfy_workflow_wrapper import ComfyWorkflowWrapper
 
-# 尝试导入翻译模块
+# 尝试导入翻译模块（翻译器实例由warm_resources共享，队列模式下跨项目复用）
 try:
-    # 动态导入模块
+    from utils.warm_resources import get_baidu_translator, get_tencent_translator
     translate_baidu_spec = importlib.util.find_spec('utils.translate_baidu_request')
     translate_tencent_spec = importlib.util.find_spec('utils.translate_tencent_request')
-    
-    if translate_baidu_spec:
-        translate_baidu = importlib.util.module_from_spec(translate_baidu_spec)
-        translate_baidu_spec.loader.exec_module(translate_baidu)
-    
-    if translate_tencent_spec:
-        translate_tencent = importlib.util.module_from_spec(translate_tencent_spec)
-        translate_tencent_spec.loader.exec_module(translate_tencent)
-    
     has_translate_modules = translate_baidu_spec is not None or translate_tencent_spec is not None
 except ImportError:
     has_translate_modules = False
@@ -40,7 +29,7 @@ class ImageDescriptionGenerator:
         self.resize_folder_path = resize_folder_path
         self.gemini_folder_path = None
         self.server_address = "127.0.0.1:8191"
-        self.client = ComfyWebSocketClient(self.server_address)
+        self.client = get_comfy_client(self.server_address)
         self.workflow_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 
                                         "workflow", "#9 单次图片提示词生成.json")
         self.workflow = ComfyWorkflowWrapper(self.workflow_path)
@@ -327,45 +316,42 @@ No ambiguous description is needed, brackets are not used to note the uncertain
     
     def translate_text(self, text, to_lang="zh"):
         """翻译文本"""
+        return self.translate_batch([text], to_lang)[0]
+    
+    def translate_batch(self, texts, to_lang="zh"):
+        """
+        批量翻译文本：先查询翻译记忆（跨项目共享，按句子缓存），
+        只有未缓存过的句子才交给百度翻译，失败的再交给腾讯翻译
+        
+        Returns:
+            与texts等长的翻译结果列表，失败的条目为空字符串
+        """
         if not has_translate_modules:
             # 如果没有翻译模块，直接返回空字符串
             print("警告: 翻译模块未找到，无法进行翻译")
-            return ""
-        else:
-            # 使用翻译模块
-            try:
-                # 先尝试百度翻译
-                if translate_baidu_spec:
-                    try:
-                        # 创建百度翻译器实例（从配置文件加载API密钥）
-                        baidu_translator = translate_baidu.BaiduTranslator()
-                        result = baidu_translator.translate(text, 'auto', to_lang)
-                        if result:
-                            return result
-                    except Exception as e:
-                        print(f"警告: 百度翻译失败，尝试腾讯翻译: {str(e)}")
-                
-                # 如果百度翻译失败，尝试腾讯翻译
-                if translate_tencent_spec:
-                    try:
-                        # 创建腾讯翻译器实例（从配置文件加载API密钥）
-                        tencent_translator = translate_tencent.TencentTranslator(source='auto', target=to_lang)
-                        response = tencent_translator.translate(text)
-                        json_response = json.loads(response)
-                        if 'Response' in json_response and 'TargetText' in json_response['Response']:
-                            return json_response['Response']['TargetText']
-                    except Exception as e:
-                        print(f"警告: 腾讯翻译失败: {str(e)}")
-                
-                # 如果两个都失败，返回空字符串
-                print("警告: 所有翻译方式均失败，无法进行翻译")
-                return ""
-            except Exception as e:
-                print(f"错误: 翻译时出现异常: {str(e)}")
-                return ""
+            return ["" for _ in texts]
+        
+        providers = []
+        if translate_baidu_spec:
+            # 获取共享的百度翻译器实例（从配置文件加载API密钥）
+            providers.append(("baidu", lambda batch: get_baidu_translator().translate_batch(batch, 'auto', to_lang)))
+        if translate_tencent_spec:
+            # 获取共享的腾讯翻译器实例（从配置文件加载API密钥）
+            providers.append(("tencent", lambda batch: get_tencent_translator(source='auto', target=to_lang).translate_batch(batch)))
+        
+        try:
+            results = get_translation_memory().translate_many(texts, 'auto', to_lang, providers)
+        except Exception as e:
+            print(f"错误: 翻译时出现异常: {str(e)}")
+            return ["" for _ in texts]
+        if any(result is None for result in results):
+            print("警告: 所有翻译方式均失败，部分文本无法翻译")
+        return [result or "" for result in results]
     
     def resize_image_for_excel(self, image_path, max_size=256):
         """调整图片大小用于Excel"""
+        from PIL import Image
+        
         try:
             img = Image.open(image_path)
             # 计算原始图片的宽高比
@@ -418,6 +404,9 @@ No ambiguous description is needed, brackets are not used to note the uncertain
             # 批量添加数据
             print(f"开始批量添加{len(successful_images)}个图片的提示词和信息")
             
+            # 一次性翻译所有提示词（重复的句子直接使用翻译记忆）
+            chinese_prompts = self.translate_batch([image_info["prompt"] for image_info in successful_images])
+            
             for i, image_info in enumerate(successful_images):
                 current_row = start_row + i
                 image_path = image_info["image_path"]
@@ -429,7 +418,7 @@ No ambiguous description is needed, brackets are not used to note the uncertain
                 ws.cell(row=current_row, column=1, value=prompt)  # 英文提示词
                 
                 # 翻译成中文
-                chinese_prompt = self.translate_text(prompt)
+                chinese_prompt = chinese_prompts[i]
                 if chinese_prompt:
                     print(f"    * 翻译成功")
                 else:
@@ -611,6 +600,22 @@ No ambiguous description is needed, brackets are not used to note the uncertain
             traceback.print_exc()
 
 
+def run(project_path, **opts):
+    """
+    流程入口，供#Lora_0_Start.py在进程内直接调用，异常直接抛出由调用方处理
+    
+    Args:
+        project_path: resize文件夹路径
+    
+    Returns:
+        处理完成返回True
+    """
+    generator = ImageDescriptionGenerator(project_path)
+    generator.process_images()
+    get_translation_memory().save()
+    return True
+
+
 def main():
     print("\n========================================")
     print("   Lora训练 - 图片描述生成工具 (Gemini)   ")
@@ -636,8 +641,7 @@ def main():
     try:
         # 创建图片描述生成器并处理图片
         print("初始化图片描述生成器...")
-        generator = ImageDescriptionGenerator(resize_folder_path)
-        generator.process_images()
+        run(resize_folder_path)
         
         # 计算总耗时
         elapsed_time = time.time() - start_time
@@ -4,30 +4,21 @@ import json
 import time
 import shutil
 import openpyxl
-from PIL import Image
 import importlib.util
 import traceback
 from pathlib import Path
 
 # 导入自定义工具包
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.comfy_websocket_wrapper import ComfyWebSocketClient
-from utils.comfy_workflow_wrapper import ComfyWorkflowWrapper
 
-# 尝试导入翻译模块
+# 翻译记忆（跨项目共享，按句子缓存译文）
+from utils.warm_resources import get_translation_memory
+
+# 尝试导入翻译模块（翻译器实例由warm_resources共享，队列模式下跨项目复用）
 try:
-    # 动态导入模块
+    from utils.warm_resources import get_baidu_translator, get_tencent_translator
     translate_baidu_spec = importlib.util.find_spec('utils.translate_baidu_request')
     translate_tencent_spec = importlib.util.find_spec('utils.translate_tencent_request')
-    
-    if translate_baidu_spec:
-        translate_baidu = importlib.util.module_from_spec(translate_baidu_spec)
-        translate_baidu_spec.loader.exec_module(translate_baidu)
-    
-    if translate_tencent_spec:
-        translate_tencent = importlib.util.module_from_spec(translate_tencent_spec)
-        translate_tencent_spec.loader.exec_module(translate_tencent)
-    
     has_translate_modules = translate_baidu_spec is not None or translate_tencent_spec is not None
 except ImportError:
     has_translate_modules = False
@@ -49,6 +40,7 @@ class DescriptionOptimizer:
         self.excel_path = os.path.join(project_dir, "训练信息.xlsx")
         self.updated_files = []  # 记录已更新的文件
         self.failed_files = []   # 记录失败的文件
+        self.translations = {}   # 批量预翻译的结果 {原文: 译文}
         
         # 检查必要的文件和文件夹
         if not os.path.exists(self.excel_path):
@@ -69,87 +61,95 @@ class DescriptionOptimizer:
             翻译后的文本，如果失败则返回空字符串
         """
         print(f"      * 开始翻译文本，长度: {len(text)} 字符，目标语言: {to_lang}")
+        result = self.translate_batch([text], to_lang)[0]
+        if result:
+            print(f"      * 翻译成功，结果长度: {len(result)} 字符")
+        else:
+            print(f"      * 所有翻译方法都失败")
+        return result
+    
+    def translate_gemini(self, text, to_lang="en"):
+        """
+        使用Gemini翻译文本（没有翻译模块时使用）
         
-        if not has_translate_modules:
-            # 如果没有翻译模块，使用Gemini进行翻译
-            print(f"      * 未找到翻译模块，使用Gemini进行翻译")
-            try:
-                import google.generativeai as genai
-                
-                # 尝试从环境变量或配置文件获取API密钥
-                print(f"      * 尝试获取Gemini API密钥...")
-                api_key = os.environ.get("GEMINI_API_KEY", "")
-                if not api_key:
-                    config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gemini_config.json")
-                    print(f"      * 尝试从配置文件获取API密钥: {config_path}")
-                    if os.path.exists(config_path):
-                        with open(config_path, "r") as f:
-                            config = json.load(f)
-                            api_key = config.get("GEMINI_API_KEY", "")
-                
-                if not api_key:
-                    print("      * 错误: 未找到Gemini API密钥，无法进行翻译")
-                    return ""
-                else:
-                    print("      * 成功获取API密钥")
-                
-                print("      * 配置Gemini API并创建模型...")
-                genai.configure(api_key=api_key)
-                model = genai.GenerativeModel('gemini-pro')
-                
-                # 根据目标语言设置提示词
-                if to_lang.lower() == "en":
-                    prompt = f"Translate the following Chinese text to English. Only provide the translation without any additional text or explanation:\n\n{text}"
-                else:
-                    prompt = f"Translate the following English text to Chinese. Only provide the translation without any additional text or explanation:\n\n{text}"
-                
-                print("      * 发送翻译请求到Gemini API...")
-                response = model.generate_content(prompt)
-                
-                result = response.text.strip()
-                print(f"      * 翻译成功，结果长度: {len(result)} 字符")
-                return result
-            except Exception as e:
-                print(f"      * 错误: 使用Gemini翻译时出现异常: {str(e)}")
-                traceback.print_exc()
+        Returns:
+            翻译后的文本，如果失败则返回空字符串
+        """
+        try:
+            import google.generativeai as genai
+            
+            # 尝试从环境变量或配置文件获取API密钥
+            print(f"      * 尝试获取Gemini API密钥...")
+            api_key = os.environ.get("GEMINI_API_KEY", "")
+            if not api_key:
+                config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gemini_config.json")
+                print(f"      * 尝试从配置文件获取API密钥: {config_path}")
+                if os.path.exists(config_path):
+                    with open(config_path, "r") as f:
+                        config = json.load(f)
+                        api_key = config.get("GEMINI_API_KEY", "")
+            
+            if not api_key:
+                print("      * 错误: 未找到Gemini API密钥，无法进行翻译")
                 return ""
+            else:
+                print("      * 成功获取API密钥")
+            
+            print("      * 配置Gemini API并创建模型...")
+            genai.configure(api_key=api_key)
+            model = genai.GenerativeModel('gemini-pro')
+            
+            # 根据目标语言设置提示词
+            if to_lang.lower() == "en":
+                prompt = f"Translate the following Chinese text to English. Only provide the translation without any additional text or explanation:\n\n{text}"
+            else:
+                prompt = f"Translate the following English text to Chinese. Only provide the translation without any additional text or explanation:\n\n{text}"
+            
+            print("      * 发送翻译请求到Gemini API...")
+            response = model.generate_content(prompt)
+            
+            result = response.text.strip()
+            print(f"      * 翻译成功，结果长度: {len(result)} 字符")
+            return result
+        except Exception as e:
+            print(f"      * 错误: 使用Gemini翻译时出现异常: {str(e)}")
+            traceback.print_exc()
+            return ""
+    
+    def translation_providers(self, to_lang):
+        """
+        按优先顺序返回翻译服务 [(名称, 批量翻译函数), ...]：
+        有翻译模块时先百度、再腾讯，否则使用Gemini
+        """
+        providers = []
+        if has_translate_modules:
+            if translate_baidu_spec:
+                providers.append(("baidu", lambda texts: get_baidu_translator().translate_batch(texts, 'auto', to_lang)))
+            if translate_tencent_spec:
+                providers.append(("tencent", lambda texts: get_tencent_translator(source='auto', target=to_lang).translate_batch(texts)))
         else:
-            # 使用翻译模块
-            print(f"      * 使用翻译模块进行翻译")
-            try:
-                # 先尝试百度翻译
-                if translate_baidu_spec:
-                    print(f"      * 尝试使用百度翻译...")
-                    try:
-                        result = translate_baidu.translate_text(text, to_lang)
-                        if result:
-                            print(f"      * 百度翻译成功，结果长度: {len(result)} 字符")
-                            return result
-                        else:
-                            print(f"      * 百度翻译返回空结果")
-                    except Exception as e:
-                        print(f"      * 警告: 百度翻译失败，尝试腾讯翻译: {str(e)}")
-                
-                # 如果百度翻译失败，尝试腾讯翻译
-                if translate_tencent_spec:
-                    print(f"      * 尝试使用腾讯翻译...")
-                    try:
-                        result = translate_tencent.translate_text(text, to_lang)
-                        if result:
-                            print(f"      * 腾讯翻译成功，结果长度: {len(result)} 字符")
-                            return result
-                        else:
-                            print(f"      * 腾讯翻译返回空结果")
-                    except Exception as e:
-                        print(f"      * 警告: 腾讯翻译失败: {str(e)}")
-                
-                # 如果两个都失败，返回空字符串
-                print(f"      * 所有翻译方法都失败")
-                return ""
-            except Exception as e:
-                print(f"      * 错误: 翻译时出现异常: {str(e)}")
-                traceback.print_exc()
-                return ""
+            print(f"      * 未找到翻译模块，使用Gemini进行翻译")
+            providers.append(("gemini", lambda texts: [self.translate_gemini(text, to_lang) for text in texts]))
+        return providers
+    
+    def translate_batch(self, texts, to_lang="en"):
+        """
+        批量翻译：先查询翻译记忆，只有未缓存过的句子才按优先顺序交给百度/腾讯的批量接口（或Gemini）翻译
+        
+        Args:
+            texts: 要翻译的文本列表
+            to_lang: 目标语言，默认为英文
+            
+        Returns:
+            与texts等长的翻译结果列表，失败的条目为空字符串
+        """
+        memory = get_translation_memory()
+        results = memory.translate_many(texts, 'auto', to_lang, self.translation_providers(to_lang))
+        stats = memory.stats()
+        if stats["hit_rate"] is not None:
+            print(f"    * 翻译记忆: {stats['entries']} 条，命中率 {stats['hit_rate']:.1%}，"
+                  f"远程翻译 {stats['remote_sentences']} 句")
+        return [result or "" for result in results]
     
     def process_descriptions(self):
         """
@@ -197,6 +197,13 @@ class DescriptionOptimizer:
             
             print(f"成功收集 {len(image_data)} 条图片数据")
             
+            # 中文优化模式下先批量翻译所有中文提示词，避免每张图片单独请求一次
+            if self.optimization_mode == 2:
+                texts = list(dict.fromkeys(data["chinese_prompt"] for data in image_data if data["chinese_prompt"]))
+                if texts:
+                    print(f"\n批量翻译 {len(texts)} 条中文提示词...")
+                    self.translations = dict(zip(texts, self.translate_batch(texts, "en")))
+            
             # 处理每个图片的描述
             print("\n[3/4] 开始处理图片描述...")
             total_count = len(image_data)
@@ -207,7 +214,7 @@ class DescriptionOptimizer:
                 processed_count += 1
                 image_name = os.path.basename(data["image_path"])
                 print(f"\n处理图片 [{processed_count}/{total_count}]: {image_name}")
-                result = self.process_single_description(data)
+                result = self.process_single_description(data, ws)
                 if result == "skipped":
                     skipped_count += 1
             
@@ -215,6 +222,7 @@ class DescriptionOptimizer:
             print("\n[4/4] 正在保存Excel文件...")
             wb.save(self.excel_path)
             print(f"Excel文件已保存: {self.excel_path}")
+            get_translation_memory().save()
             
             # 更新步骤工作表的完成结果
             self.update_step_status()
@@ -233,12 +241,13 @@ class DescriptionOptimizer:
             traceback.print_exc()
             return False
     
-    def process_single_description(self, data):
+    def process_single_description(self, data, ws=None):
         """
         处理单个图片描述
         
         Args:
             data: 包含图片数据的字典
+            ws: 已打开的"提示词"工作表，提供时只修改单元格，由调用方统一保存
             
         Returns:
             处理结果: "updated", "skipped", "failed"
@@ -303,7 +312,9 @@ class DescriptionOptimizer:
                 
                 # 翻译成英文
                 print(f"  - 开始翻译中文提示词...")
-                english_prompt = self.translate_text(data["chinese_prompt"], "en")
+                english_prompt = self.translations.get(data["chinese_prompt"])
+                if english_prompt is None:
+                    english_prompt = self.translate_text(data["chinese_prompt"], "en")
                 if english_prompt:
                     print(f"  - 翻译成功，长度: {len(english_prompt)} 字符")
                     # 更新txt文件
@@ -314,11 +325,13 @@ class DescriptionOptimizer:
                     
                     # 更新Excel中的英文提示词
                     print(f"  - 更新Excel中的英文提示词...")
-                    wb = openpyxl.load_workbook(self.excel_path)
-                    ws = wb["提示词"]
-                    ws.cell(row=data["row"], column=1, value=english_prompt)
-                    wb.save(self.excel_path)
-                    print(f"  - Excel文件已更新")
+                    if ws is not None:
+                        ws.cell(row=data["row"], column=1, value=english_prompt)
+                    else:
+                        wb = openpyxl.load_workbook(self.excel_path)
+                        wb["提示词"].cell(row=data["row"], column=1, value=english_prompt)
+                        wb.save(self.excel_path)
+                        print(f"  - Excel文件已更新")
                     return "updated"
                 else:
                     print(f"  - 警告: 翻译失败: {os.path.basename(txt_path)}")
@@ -395,6 +408,21 @@ class DescriptionOptimizer:
             traceback.print_exc()
 
 
+def run(project_path, optimization_mode=1, **opts):
+    """
+    流程入口，供#Lora_0_Start.py在进程内直接调用
+    
+    Args:
+        project_path: 项目根目录
+        optimization_mode: 优化模式，1=英文优化，2=中文优化并翻译
+    
+    Returns:
+        处理成功返回True，否则返回False
+    """
+    optimizer = DescriptionOptimizer(project_path, optimization_mode)
+    return optimizer.process_descriptions()
+
+
 def main():
     print("\n========================================")
     print("   Lora模型训练 - 图片描述优化工具   ")
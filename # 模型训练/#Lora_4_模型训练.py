@@ -1,52 +1,85 @@
 import os
 import sys
 import time
-import socket
 import shutil
 import openpyxl
 import subprocess
 import importlib.util
-import pynvml
-import pygetwindow as gw
-import pyautogui
-import pyperclip
 import psutil
 import datetime
 import traceback
 
-# 导入自定义工具包
+# 导入自定义工具包（ChromeManager依赖selenium，在init_chrome_manager中按需导入）
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.ChromeManager import ChromeManager
+
+from utils.toml_config import build_config, write_toml
+from utils.gpu_monitor import GpuSampler, NvmlSource, StallDetector
+from utils.training_progress import EventLogSource, ProgressTracker
+from utils.checkpoint_watcher import CheckpointWatcher, is_complete_safetensors
+from utils.readiness import port_open, wait_for_http, wait_until
+from utils.trainer_client import TrainerClient, TrainerApiError, TASK_FINISHED_STATES
 
 # 定义训练集类型和地址
 CHARACTER_DIR = "E:\\Design\\Character"
 STYLES_DIR = "E:\\Design\\Styles"
 
+# 训练信息Excel中覆盖模板参数的工作表
+TRAINING_PARAM_SHEET = "训练参数"
+
+# GPU采样间隔（秒）
+GPU_SAMPLE_INTERVAL = 1.0
+
+# 训练程序目录，toml中相对路径的logging_dir相对于该目录
+TRAINER_DIR = "F:\\LoraTrain"
+# 训练服务器端口和训练页面
+TRAINER_PORT = 28000
+TRAINER_URL = f"http://127.0.0.1:{TRAINER_PORT}/lora/flux.html"
+# 启动训练服务器的最长等待时间（秒）
+SERVER_START_TIMEOUT = 120
+# 训练页面上的按钮
+IMPORT_BUTTON_SELECTOR = "#app > div > div.example-container > div.right-container > div:nth-child(4) > div:nth-child(2) > button"
+START_BUTTON_SELECTOR = "#app > div > div.example-container > div.right-container > div:nth-child(6) > div:nth-child(1) > button"
+# 训练日志中step超过该秒数没有增加时判断为卡住
+LOG_STALL_TIMEOUT = 180
+# 检查输出目录中新检查点的间隔（秒）
+CHECKPOINT_POLL_INTERVAL = 5.0
+# 训练日志显示完成后，等待最终模型保存完成的最长时间（秒）
+FINAL_SAVE_TIMEOUT = 600
+
 
 class LoraTrainer:
-    def __init__(self, project_path):
+    def __init__(self, project_path, on_checkpoint=None):
+        """
+        Args:
+            project_path: 项目路径
+            on_checkpoint: 每个检查点写入完成时调用 on_checkpoint(事件字典)，可以在训练过程中开始测试
+        """
         self.project_path = project_path
         self.project_type = None
         self.project_name = None
         self.excel_path = None
         self.toml_template = None
         self.toml_path = None
+        self.chrome_pool = None
         self.chrome_manager = None
         self.driver = None
         self.wait = None
         self.training_start_time = None
         self.training_end_time = None
         self.training_result = "失败"  # 默认为失败，成功时会更新
-        
-        # 初始化NVML
-        pynvml.nvmlInit()
-    
-    def __del__(self):
-        # 关闭NVML
-        try:
-            pynvml.nvmlShutdown()
-        except:
-            pass
+        # GPU采样线程，监控训练时启动
+        self.gpu_sampler = None
+        # 生成的项目训练配置
+        self.training_config = None
+        # 各阶段实际等待的秒数
+        self.wait_times = {}
+        # 通过HTTP接口提交训练时的客户端和任务id
+        self.trainer_client = None
+        self.trainer_task_id = None
+        # 训练输出目录和检查点监视线程
+        self.output_dir = None
+        self.checkpoint_watcher = None
+        self.on_checkpoint = on_checkpoint
     
     def detect_project_info(self):
         """检测项目类型和名称"""
@@ -102,25 +135,27 @@ class LoraTrainer:
             self.training_result = "失败" 
             return None
     
-    def modify_toml_file(self):
-        """修改toml配置文件"""
+    def read_training_overrides(self):
+        """
+        读取训练信息Excel中"训练参数"工作表的覆盖参数（A列参数名，B列值），没有该工作表时返回空字典
+        """
+        overrides = {}
+        wb = openpyxl.load_workbook(self.excel_path, read_only=True, data_only=True)
+        try:
+            if TRAINING_PARAM_SHEET not in wb.sheetnames:
+                return overrides
+            for row in wb[TRAINING_PARAM_SHEET].iter_rows(min_row=2, max_col=2, values_only=True):
+                name, value = (tuple(row) + (None, None))[:2]
+                if name and value is not None and value != "":
+                    overrides[str(name).strip()] = value
+        finally:
+            wb.close()
+        return overrides
+    
+    def write_project_toml(self):
+        """以训练模板为基础生成项目自己的toml配置文件，模板文件保持不变"""
         try:
-            # 读取原始toml文件内容
-            with open(self.toml_template, "r", encoding="utf-8") as f:
-                toml_content = f.read()
-            
-            # 直接使用原始模板文件路径
-            self.toml_path = self.toml_template
-            
-            # 修改参数
-            # 修改train_data_dir
             train_data_dir = f"E:/Design/{self.project_type}/{self.project_name}/gemini"
-            toml_content = self.replace_toml_param(toml_content, "train_data_dir", train_data_dir)
-            
-            # 修改output_name
-            toml_content = self.replace_toml_param(toml_content, "output_name", self.project_name)
-            
-            # 修改output_dir
             output_dir = f"E:/Design/loras/{self.project_name}"
             
             # 检查输出目录是否存在，如果不存在则创建
@@ -134,63 +169,54 @@ class LoraTrainer:
                     traceback.print_exc()
             else:
                 print(f"输出目录已存在: {output_dir_windows_path}")
-                
-            toml_content = self.replace_toml_param(toml_content, "output_dir", output_dir)
-            
-            # 修改log_prefix
-            toml_content = self.replace_toml_param(toml_content, "log_prefix", self.project_name)
             
-            # 修改log_tracker_name
-            toml_content = self.replace_toml_param(toml_content, "log_tracker_name", self.project_name)
-            
-            # 直接保存到原始toml文件
-            with open(self.toml_path, "w", encoding="utf-8") as f:
-                f.write(toml_content)
-            
-            print(f"已修改并保存toml配置文件: {self.toml_path}")
+            overrides = {
+                "train_data_dir": train_data_dir,
+                "output_name": self.project_name,
+                "output_dir": output_dir,
+                "log_prefix": self.project_name,
+                "log_tracker_name": self.project_name,
+            }
+            # 训练参数工作表中的参数优先
+            extra = self.read_training_overrides()
+            if extra:
+                print(f"训练参数覆盖: {extra}")
+            overrides.update(extra)
+            
+            config = build_config(self.toml_template, overrides)
+            self.training_config = config
+            self.output_dir = config.get("output_dir", output_dir)
+            self.toml_path = write_toml(os.path.join(self.project_path, f"{self.project_name}.toml"), config)
+            print(f"已生成项目toml配置文件: {self.toml_path}")
             return True
         except Exception as e:
-            print(f"修改toml文件时出错: {str(e)}")
+            print(f"生成toml文件时出错: {str(e)}")
             traceback.print_exc()
             return False
     
-    def replace_toml_param(self, content, param_name, new_value):
-        """替换toml文件中的参数值"""
-        import re
-        pattern = fr"({param_name}\s*=\s*)([\"'].*?[\"']|[^\"'\n]+)"
-        # 处理new_value中的反斜杠，确保它们被正确转义
-        escaped_value = new_value.replace('\\', '\\\\')
-        replacement = f"\\g<1>\"{escaped_value}\""
-        return re.sub(pattern, replacement, content)
+    def record_wait(self, stage, ready, waited):
+        """记录并输出某个阶段实际等待的时间"""
+        self.wait_times[stage] = waited
+        print(f"{stage}: {'就绪' if ready else '超时'}，等待 {waited:.1f} 秒")
+        return ready
     
     def check_training_server(self):
         """检查训练服务器是否运行"""
         try:
             # 检查端口是否开放
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(2)
-            result = sock.connect_ex(("127.0.0.1", 28000))
-            sock.close()
-            
-            if result == 0:
+            if port_open("127.0.0.1", TRAINER_PORT):
                 print("训练服务器已运行")
                 return True
             else:
                 print("训练服务器未运行，尝试启动...")
                 # 使用os.startfile直接打开批处理文件
-                os.startfile("F:\\LoraTrain\\A启动脚本.bat")
+                os.startfile(os.path.join(TRAINER_DIR, "A启动脚本.bat"))
                 
-                # 等待服务器启动
-                start_time = time.time()
-                while time.time() - start_time < 120:  # 最多等待2分钟
-                    time.sleep(10)
-                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    sock.settimeout(2)
-                    result = sock.connect_ex(("127.0.0.1", 28000))
-                    sock.close()
-                    if result == 0:
-                        print("训练服务器已成功启动")
-                        return True
+                # 等待训练页面可以访问（指数退避，最多等待2分钟）
+                ready, waited = wait_for_http(TRAINER_URL, timeout=SERVER_START_TIMEOUT, max_delay=10)
+                if self.record_wait("启动训练服务器", ready, waited):
+                    print("训练服务器已成功启动")
+                    return True
                 
                 print("训练服务器启动超时")
                 return False
@@ -199,25 +225,60 @@ class LoraTrainer:
             traceback.print_exc()
             return False
     
+    def submit_training_api(self):
+        """
+        通过训练服务器的HTTP接口提交项目配置并开始训练，不需要启动浏览器
+        
+        Returns:
+            提交成功返回True，接口不可用或提交失败返回False（之后改用浏览器自动化）
+        """
+        try:
+            client = TrainerClient(f"http://127.0.0.1:{TRAINER_PORT}")
+            if not client.available():
+                print("训练服务器的HTTP接口不可用")
+                return False
+            self.trainer_task_id = client.submit(self.training_config)
+            self.trainer_client = client
+            self.training_start_time = datetime.datetime.now()
+            print(f"已通过HTTP接口提交训练，任务: {self.trainer_task_id}")
+            return True
+        except TrainerApiError as e:
+            print(f"通过HTTP接口提交训练失败: {e}")
+            return False
+    
+    def training_task_status(self):
+        """通过HTTP接口查询训练任务状态，未使用接口提交或查询失败时返回None"""
+        if self.trainer_client is None or self.trainer_task_id is None:
+            return None
+        try:
+            return self.trainer_client.task_status(self.trainer_task_id)
+        except TrainerApiError as e:
+            print(f"查询训练任务状态失败: {e}")
+            return None
+    
     def kill_chrome_processes(self):
         """结束所有Chrome进程"""
         try:
+            killed = []
             for proc in psutil.process_iter(['pid', 'name']):
                 if proc.info['name'] and 'chrome.exe' in proc.info['name'].lower():
                     try:
                         proc.kill()
+                        killed.append(proc)
                     except:
                         pass
-            time.sleep(2)  # 等待进程结束
+            # 等待进程结束（最多2秒），不再固定等待
+            start_time = time.monotonic()
+            _, alive = psutil.wait_procs(killed, timeout=2)
+            self.record_wait("结束Chrome进程", not alive, time.monotonic() - start_time)
             print("已结束所有Chrome进程")
         except Exception as e:
             print(f"结束Chrome进程时出错: {str(e)}")
     
     def init_chrome_manager(self):
-        """初始化Chrome管理器"""
+        """从共享的Chrome会话池借出浏览器（队列模式下复用上一个项目的浏览器）并打开训练页面"""
         try:
-            # 结束所有Chrome进程
-            self.kill_chrome_processes()
+            from utils.warm_resources import get_chrome_pool
             
             # 配置Chrome管理器
             config = {
@@ -230,17 +291,32 @@ class LoraTrainer:
                 'enable_images': True
             }
             
-            self.chrome_manager = ChromeManager(config)
-            self.driver, self.wait = self.chrome_manager.open_url("http://127.0.0.1:28000/lora/flux.html")
-            time.sleep(5)
+            pool = self.chrome_pool = get_chrome_pool(config)
+            # 没有可复用的浏览器时，先结束残留的Chrome进程（它们会占用用户数据目录）
+            if not pool.idle_count():
+                self.kill_chrome_processes()
+            self.chrome_manager = pool.acquire(timeout=60)
+            if self.chrome_manager is None:
+                raise Exception("无法启动Chrome")
+            self.driver, self.wait = self.chrome_manager.open_url(TRAINER_URL)
             if not self.driver:
                 raise Exception("无法打开训练页面")
             
-            print("已成功打开训练页面")
+            # 等待页面加载完成并渲染出导入配置按钮
+            from selenium.webdriver.common.by import By
+            ready, waited = wait_until(
+                lambda: self.driver.execute_script("return document.readyState") == "complete"
+                and self.driver.find_elements(By.CSS_SELECTOR, IMPORT_BUTTON_SELECTOR),
+                timeout=30)
+            if not self.record_wait("加载训练页面", ready, waited):
+                raise Exception("训练页面加载超时")
+            
+            print(f"已成功打开训练页面，Chrome会话池: {pool.stats()}")
             return True
         except Exception as e:
             print(f"初始化Chrome管理器时出错: {str(e)}")
             traceback.print_exc()
+            self.release_chrome_manager()
             return False
     
     def start_training(self):
@@ -248,25 +324,36 @@ class LoraTrainer:
         try:
             from selenium.webdriver.common.by import By
             from selenium.webdriver.support import expected_conditions as EC
-            import time
+            import pyautogui
+            import pyperclip
+            import pygetwindow as gw
             
+            def active_title():
+                window = gw.getActiveWindow()
+                return window.title if window else ""
             
             # 点击导入配置文件按钮 - 使用CSS选择器
-            import_button = self.driver.find_element(By.CSS_SELECTOR, "#app > div > div.example-container > div.right-container > div:nth-child(4) > div:nth-child(2) > button")
+            browser_title = active_title()
+            import_button = self.driver.find_element(By.CSS_SELECTOR, IMPORT_BUTTON_SELECTOR)
             import_button.click()
-            time.sleep(5)
+            
+            # 等待文件选择对话框获得焦点（活动窗口不再是浏览器），超时仍继续尝试粘贴
+            ready, waited = wait_until(lambda: active_title() != browser_title, timeout=10)
+            self.record_wait("打开文件选择对话框", ready, waited)
             
             # 将toml文件路径复制到剪贴板
             pyperclip.copy(self.toml_path)
             
             # 模拟键盘操作粘贴路径并回车
             pyautogui.hotkey('ctrl', 'v')
-            time.sleep(1)
             pyautogui.press('enter')
-            time.sleep(3)
+            
+            # 等待对话框关闭、开始训练按钮可以点击
+            ready, waited = wait_until(lambda: active_title() == browser_title, timeout=10)
+            self.record_wait("导入配置文件", ready, waited)
             
             # 点击开始训练按钮 - 使用CSS选择器
-            start_button = self.driver.find_element(By.CSS_SELECTOR, "#app > div > div.example-container > div.right-container > div:nth-child(6) > div:nth-child(1) > button")
+            start_button = self.wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, START_BUTTON_SELECTOR)))
             start_button.click()
             
             print("已点击开始训练按钮")
@@ -278,26 +365,87 @@ class LoraTrainer:
             traceback.print_exc()
             return False
     
-    def get_gpu_utilization(self):
-        """获取GPU使用率"""
-        try:
-            handle = pynvml.nvmlDeviceGetHandleByIndex(0)
-            utilization = pynvml.nvmlDeviceGetUtilizationRates(handle).gpu
-            return utilization
-        except pynvml.NVMLError as e:
-            print(f"获取GPU使用率时出错: {e}")
-            return None
+    def release_chrome_manager(self):
+        """训练开始后归还浏览器，保留进程供下一个项目使用"""
+        if self.chrome_manager is not None:
+            self.chrome_pool.release(self.chrome_manager)
+            self.chrome_manager = None
+            self.driver = None
+            self.wait = None
     
-    def get_gpu_memory_usage(self):
-        """获取GPU内存使用量(GB)"""
-        try:
-            handle = pynvml.nvmlDeviceGetHandleByIndex(0)
-            memory_info = pynvml.nvmlDeviceGetMemoryInfo(handle)
-            used_memory = memory_info.used / (1024 ** 3)
-            return used_memory
-        except pynvml.NVMLError as e:
-            print(f"获取GPU内存使用量时出错: {e}")
-            return None
+    def start_gpu_sampler(self):
+        """启动GPU采样线程（NVML只初始化一次，设备句柄缓存在采样来源中）"""
+        if self.gpu_sampler is None:
+            self.gpu_sampler = GpuSampler(NvmlSource(0), interval=GPU_SAMPLE_INTERVAL).start()
+        return self.gpu_sampler
+    
+    def stop_gpu_sampler(self):
+        if self.gpu_sampler is not None:
+            self.gpu_sampler.stop()
+            self.gpu_sampler = None
+    
+    def start_checkpoint_watcher(self):
+        """监视训练输出目录，启动前已存在且未被重新写入的文件不会触发事件"""
+        if self.checkpoint_watcher is None:
+            output_dir = self.output_dir or f"E:/Design/loras/{self.project_name}"
+            self.checkpoint_watcher = CheckpointWatcher(
+                output_dir, callback=self.handle_checkpoint, poll_interval=CHECKPOINT_POLL_INTERVAL).start()
+        return self.checkpoint_watcher
+    
+    def stop_checkpoint_watcher(self):
+        if self.checkpoint_watcher is not None:
+            self.checkpoint_watcher.stop()
+    
+    def handle_checkpoint(self, event):
+        """检查点写入完成"""
+        kind = "最终模型" if event["final"] else f"检查点 {event['number']}"
+        print(f"{kind}已保存: {event['name']} ({event['size'] / 1024 / 1024:.1f}MB)")
+        if self.on_checkpoint:
+            self.on_checkpoint(event)
+    
+    def wait_for_final_model(self, timeout=FINAL_SAVE_TIMEOUT):
+        """
+        训练日志记录最后一步时最终模型还没有保存，继续等待直到最终模型写入完成或训练任务结束
+        
+        Returns:
+            最终模型写入完成或训练任务正常结束返回True，超时或任务被终止返回False
+        """
+        output_dir = self.output_dir or f"E:/Design/loras/{self.project_name}"
+        safetensors_path = f"{output_dir}/{self.project_name}.safetensors"
+        
+        def final_saved():
+            if self.checkpoint_watcher.final_checkpoint() or is_complete_safetensors(safetensors_path):
+                return True
+            return self.training_task_status() in TASK_FINISHED_STATES
+        
+        print("等待最终模型保存完成...")
+        ready, waited = wait_until(final_saved, timeout=timeout, name="最终模型",
+                                   initial=1.0, max_delay=CHECKPOINT_POLL_INTERVAL)
+        self.record_wait("final_model", ready, waited)
+        if not ready:
+            print(f"训练日志显示已完成，但 {waited:.0f} 秒内最终模型没有保存完成")
+            return False
+        if self.checkpoint_watcher.final_checkpoint() or is_complete_safetensors(safetensors_path):
+            return True
+        task_status = self.training_task_status()
+        print(f"训练任务已结束: {task_status}")
+        return task_status == "FINISHED"
+    
+    def wait_for_training_start(self, detector, timeout=180):
+        """等待训练开始运行，超时返回False"""
+        start_time = time.time()
+        last_print = 0
+        while time.time() - start_time < timeout:
+            sample = self.gpu_sampler.latest()
+            if detector.is_started(sample):
+                print("训练已开始运行")
+                return True
+            # 每10秒输出一次状态
+            if sample and time.time() - last_print >= 10:
+                print(f"GPU使用率: {sample['utilization']:.0f}%, 内存使用量: {sample['memory_gb']:.2f}GB")
+                last_print = time.time()
+            time.sleep(GPU_SAMPLE_INTERVAL)
+        return False
     
     def find_bat_window(self):
         """尝试查找批处理窗口，支持多种窗口标题匹配方式
@@ -309,6 +457,8 @@ class LoraTrainer:
             "C:\\WINDOWS\\system32\\cmd.exe"  # 使用cmd.exe作为标题（批处理脚本运行时的实际窗口标题）
         ]
         
+        import pygetwindow as gw
+        
         # 尝试每一种可能的标题
         for title in possible_titles:
             windows = gw.getWindowsWithTitle(title)
@@ -325,6 +475,7 @@ class LoraTrainer:
             # 尝试查找批处理窗口
             window = self.find_bat_window()
             if window:
+                import pyautogui
                 window.activate()
                 pyautogui.press('enter')
                 print(f"已激活批处理窗口 '{window.title}' 并按回车")
@@ -333,109 +484,131 @@ class LoraTrainer:
         except Exception as e:
             print(f"激活窗口时出错: {e}")
     
+    def create_progress_tracker(self):
+        """
+        根据toml中的logging_dir和log_prefix创建训练日志进度跟踪器，未使用tensorboard日志时返回None
+        """
+        config = self.training_config or {}
+        if config.get("log_with", "tensorboard") != "tensorboard":
+            return None
+        logging_dir = config.get("logging_dir", "./logs")
+        if not os.path.isabs(logging_dir):
+            logging_dir = os.path.normpath(os.path.join(TRAINER_DIR, logging_dir))
+        since = self.training_start_time.timestamp() if self.training_start_time else time.time()
+        source = EventLogSource(logging_dir, config.get("log_prefix", self.project_name), since=since)
+        print(f"训练日志目录: {logging_dir}")
+        return ProgressTracker(source, total_epochs=config.get("max_train_epochs"))
+    
     def monitor_training(self):
         """监控训练过程"""
         try:
             # 首先检查是否开始运行
             print("开始监控训练过程...")
-            start_time = time.time()
-            training_started = False
-            
-            # 检查是否开始运行
-            while time.time() - start_time < 180:  # 最多等待3分钟
-                utilization = self.get_gpu_utilization()
-                memory_usage = self.get_gpu_memory_usage()
-                
-                print(f"GPU使用率: {utilization}%, 内存使用量: {memory_usage:.2f}GB")
-                
-                if utilization > 50 or (memory_usage and memory_usage > 15):
-                    training_started = True
-                    print("训练已开始运行")
-                    break
-                
-                time.sleep(10)
+            self.start_checkpoint_watcher()
+            self.start_gpu_sampler()
+            detector = StallDetector()
             
+            training_started = self.wait_for_training_start(detector)
             if not training_started:
                 print("训练未开始运行，尝试重启...")
                 self.activate_bat_window_and_press_enter()
                 
                 # 再次等待训练开始
-                start_time = time.time()
-                while time.time() - start_time < 180:  # 最多等待3分钟
-                    utilization = self.get_gpu_utilization()
-                    memory_usage = self.get_gpu_memory_usage()
-                    
-                    print(f"GPU使用率: {utilization}%, 内存使用量: {memory_usage:.2f}GB")
-                    
-                    if utilization > 50 or (memory_usage and memory_usage > 15):
-                        training_started = True
-                        print("训练已开始运行")
-                        break
-                    
-                    time.sleep(10)
+                training_started = self.wait_for_training_start(detector)
             
             if not training_started:
                 print("训练无法启动，退出监控")
                 return False
             
-            # 持续监控训练过程
-            inactive_count = 0
+            tracker = self.create_progress_tracker()
+            
+            # 持续监控训练过程：每个检测窗口（30秒）检查一次训练日志和采样线程记录的数据
             while True:
-                utilization_records = []
-                memory_records = []
+                time.sleep(detector.window)
+                # 最终模型写入完成即训练结束，不需要等GPU空闲
+                final = self.checkpoint_watcher.final_checkpoint()
+                if final:
+                    print(f"最终模型已写入完成: {final['path']}")
+                    return True
                 
-                # 收集30秒内的数据
-                for _ in range(6):  # 每5秒一次，共30秒
-                    utilization = self.get_gpu_utilization()
-                    memory_usage = self.get_gpu_memory_usage()
-                    
-                    if utilization is not None:
-                        utilization_records.append(utilization)
-                    if memory_usage is not None:
-                        memory_records.append(memory_usage)
-                    
-                    time.sleep(5)
+                # 通过HTTP接口提交的训练可以直接查询任务是否结束
+                task_status = self.training_task_status()
+                if task_status in TASK_FINISHED_STATES:
+                    print(f"训练任务已结束: {task_status}")
+                    return task_status == "FINISHED"
                 
-                # 计算平均值
-                avg_utilization = sum(utilization_records) / len(utilization_records) if utilization_records else 0
-                avg_memory = sum(memory_records) / len(memory_records) if memory_records else 0
+                status, stats = detector.check(self.gpu_sampler.buffer)
+                if status == "no_data":
+                    print("未获取到GPU数据")
+                    continue
                 
-                print(f"平均GPU使用率: {avg_utilization:.2f}%, 平均内存使用量: {avg_memory:.2f}GB")
+                power = f", 平均功耗: {stats['power_w']['avg']:.0f}W" if stats["power_w"] else ""
+                temperature = f", 最高温度: {stats['temperature_c']['max']:.0f}°C" if stats["temperature_c"] else ""
+                print(f"平均GPU使用率: {stats['utilization']['avg']:.2f}%, "
+                      f"平均内存使用量: {stats['memory_gb']['avg']:.2f}GB{power}{temperature}")
                 
-                # 检查是否需要重启
-                # GPU使用率<50%且内存>15GB：认为训练卡住，需要重启
-                if all(util < 30 for util in utilization_records) and any(mem > 15 for mem in memory_records):
-                    inactive_count += 1
-                    print(f"检测到训练可能卡住，计数: {inactive_count}/6")
-                    if inactive_count >= 6:  # 连续6次检测到异常（约3分钟）才重启
-                        print("确认训练卡住，尝试重启...")
+                # 有训练日志时以日志中的step为准，GPU数据只用于区分卡住和进程已退出
+                if tracker is not None:
+                    try:
+                        tracker.poll()
+                    except Exception as e:
+                        print(f"读取训练日志出错: {e}")
+                if tracker is not None and tracker.has_progress():
+                    print(f"训练进度: {tracker.summary()}")
+                    if tracker.finished():
+                        print("训练日志显示已完成全部步数")
+                        return self.wait_for_final_model()
+                    if tracker.stalled(LOG_STALL_TIMEOUT):
+                        if stats["memory_gb"]["max"] < detector.stopped_memory:
+                            print("训练日志停止更新且显存已释放，训练已停止，退出监控")
+                            return False
+                        print(f"训练日志超过{LOG_STALL_TIMEOUT}秒没有新的step，尝试重启...")
                         self.activate_bat_window_and_press_enter()
-                        inactive_count = 0  # 重置计数器
-                # GPU使用率<10%且内存<3GB：可能已停止，连续3分钟后确认
-                elif all(util < 20 for util in utilization_records) and all(mem < 3 for mem in memory_records):
-                    inactive_count += 1
-                    print(f"检测到训练可能已停止，计数: {inactive_count}/10")
-                    if inactive_count >= 10:  # 连续10次检测到低活动（约5分钟）
-                        print("训练已停止，退出监控")
-                        return False
-                else:
-                    inactive_count = 0  # 重置计数器
+                        tracker.reset_stall()
+                    continue
+                
+                # 检查是否需要重启
+                # GPU使用率<30%且内存>15GB：认为训练卡住，需要重启
+                if status == "suspect_stuck":
+                    print(f"检测到训练可能卡住，计数: {detector.inactive_count}/{detector.stuck_checks}")
+                elif status == "restart":
+                    # 连续6次检测到异常（约3分钟）才重启
+                    print("确认训练卡住，尝试重启...")
+                    self.activate_bat_window_and_press_enter()
+                # GPU使用率<20%且内存<3GB：可能已停止
+                elif status == "suspect_stopped":
+                    print(f"检测到训练可能已停止，计数: {detector.inactive_count}/{detector.stopped_checks}")
+                elif status == "stopped":
+                    # 连续10次检测到低活动（约5分钟）
+                    print("训练已停止，退出监控")
+                    return False
         
         except Exception as e:
             print(f"监控训练过程时出错: {str(e)}")
             traceback.print_exc()
             return False
+        finally:
+            self.stop_gpu_sampler()
+            self.stop_checkpoint_watcher()
             
     def check_training_completion(self):
         """检查训练是否真正完成"""
         try:
             # 检查是否存在训练完成的模型文件
-            safetensors_path = f"E:/Design/loras/{self.project_name}/{self.project_name}.safetensors"
-            if os.path.exists(safetensors_path):
+            output_dir = self.output_dir or f"E:/Design/loras/{self.project_name}"
+            safetensors_path = f"{output_dir}/{self.project_name}.safetensors"
+            final = self.checkpoint_watcher.final_checkpoint() if self.checkpoint_watcher else None
+            if final or is_complete_safetensors(safetensors_path):
                 print(f"发现训练完成的模型文件: {safetensors_path}")
-                self.training_end_time = datetime.datetime.now()
+                # 以最终模型写入完成的时间为训练结束时间
+                self.training_end_time = (datetime.datetime.fromtimestamp(final["time"]) if final
+                                          else datetime.datetime.now())
                 self.training_result = "成功"
                 return True
+            elif os.path.exists(safetensors_path):
+                print(f"模型文件不完整（可能仍在写入或训练中断）: {safetensors_path}")
+                self.training_result = "失败"
+                return False
             else:
                 print(f"未找到训练完成的模型文件: {safetensors_path}")
                 self.training_result = "失败"
@@ -491,9 +664,9 @@ class LoraTrainer:
                 self.update_excel()  # 更新失败结果
                 return False
             
-            # 修改toml文件
-            if not self.modify_toml_file():
-                print("无法修改toml文件，退出")
+            # 生成项目toml文件
+            if not self.write_project_toml():
+                print("无法生成toml文件，退出")
                 # 修复：确保在退出前设置训练结果为失败
                 self.training_result = "失败"
                 self.update_excel()  # 更新失败结果
@@ -506,18 +679,24 @@ class LoraTrainer:
                 self.update_excel()  # 更新失败结果
                 return False
             
-            # 初始化Chrome管理器
-            if not self.init_chrome_manager():
-                print("无法初始化Chrome管理器，退出")
-                self.training_result = "失败"  # 确保设置为失败
-                self.update_excel()  # 更新失败结果
-                return False
-            
-            # 开始训练
-            if not self.start_training():
-                print("无法开始训练，退出")
-                self.update_excel()  # 更新失败结果
-                return False
+            # 优先通过HTTP接口提交训练，失败时再用浏览器自动化点击开始训练
+            if not self.submit_training_api():
+                print("改用浏览器自动化开始训练")
+                
+                # 初始化Chrome管理器
+                if not self.init_chrome_manager():
+                    print("无法初始化Chrome管理器，退出")
+                    self.training_result = "失败"  # 确保设置为失败
+                    self.update_excel()  # 更新失败结果
+                    return False
+                
+                # 开始训练
+                started = self.start_training()
+                self.release_chrome_manager()
+                if not started:
+                    print("无法开始训练，退出")
+                    self.update_excel()  # 更新失败结果
+                    return False
             
             # 监控训练过程
             monitor_result = self.monitor_training()
@@ -538,6 +717,35 @@ class LoraTrainer:
             return False
 
 
+def prepare_config(project_path):
+    """
+    只生成项目的toml配置文件，不启动训练（队列模式下可以在其他项目训练时提前准备）
+    
+    Returns:
+        toml文件路径，失败返回None
+    """
+    trainer = LoraTrainer(project_path)
+    trainer.detect_project_info()
+    if not trainer.read_training_template() or not trainer.write_project_toml():
+        return None
+    return trainer.toml_path
+
+
+def run(project_path, **opts):
+    """
+    流程入口，供#Lora_0_Start.py在进程内直接调用
+    
+    Args:
+        project_path: 项目路径
+        on_checkpoint: 可选，每个检查点写入完成时的回调
+    
+    Returns:
+        训练成功返回True，否则返回False
+    """
+    trainer = LoraTrainer(project_path, on_checkpoint=opts.get("on_checkpoint"))
+    return trainer.run()
+
+
 def main():
     # 检查命令行参数
     if len(sys.argv) < 2:
@@ -550,8 +758,7 @@ def main():
         return 1
     
     # 创建训练器并运行
-    trainer = LoraTrainer(project_path)
-    success = trainer.run()
+    success = run(project_path)
     
     if success:
         print("训练成功完成")
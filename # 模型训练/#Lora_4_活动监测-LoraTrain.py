@@ -1,29 +1,19 @@
+import os
+import sys
 import time
-import pynvml
-import psutil
-import pygetwindow as gw
-import pyautogui
+import argparse
 
-
-def get_gpu_utilization():
-    try:
-        handle = pynvml.nvmlDeviceGetHandleByIndex(0)
-        utilization = pynvml.nvmlDeviceGetUtilizationRates(handle).gpu
-        return utilization
-    except pynvml.NVMLError as e:
-        print(f"NVML error: {e}")
-        return None
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.gpu_monitor import GpuSampler, NvmlSource, StallDetector, replay_trace
+from utils.training_progress import EventLogSource, TextLogSource, ProgressTracker
 
 
-def get_gpu_memory_usage():
-    try:
-        handle = pynvml.nvmlDeviceGetHandleByIndex(0)
-        memory_info = pynvml.nvmlDeviceGetMemoryInfo(handle)
-        used_memory = memory_info.used / (1024 ** 3)
-        return used_memory
-    except pynvml.NVMLError as e:
-        print(f"NVML error: {e}")
-        return None
+def create_detector():
+    """
+    检测规则：每60秒检查一次，使用率都<50%且显存曾>15GB时重启，使用率都<10%且显存都<3GB时关机
+    """
+    return StallDetector(window=60, stuck_utilization=50, stuck_memory=15, stuck_checks=1,
+                         stopped_utilization=10, stopped_memory=3, stopped_checks=1)
 
 
 def find_bat_window():
@@ -36,6 +26,8 @@ def find_bat_window():
         "C:\\WINDOWS\\system32\\cmd.exe"  # 使用cmd.exe作为标题（批处理脚本运行时的实际窗口标题）
     ]
     
+    import pygetwindow as gw
+    
     # 尝试每一种可能的标题
     for title in possible_titles:
         windows = gw.getWindowsWithTitle(title)
@@ -52,6 +44,7 @@ def activate_bat_window_and_press_enter():
         # 尝试查找批处理窗口
         window = find_bat_window()
         if window:
+            import pyautogui
             window.activate()
             pyautogui.press('enter')
             print(f"已激活批处理窗口 '{window.title}' 并按回车")
@@ -67,27 +60,44 @@ def shutdown_computer():
 
 
 if __name__ == "__main__":
-    pynvml.nvmlInit()
+    parser = argparse.ArgumentParser(description="Lora训练活动监测")
+    parser.add_argument("--interval", type=float, default=1.0, help="GPU采样间隔（秒）")
+    parser.add_argument("--record", type=str, help="把采样记录保存到文件（JSON Lines），供--trace回放")
+    parser.add_argument("--trace", type=str, help="回放采样记录，只输出检测结果，不重启、不关机")
+    parser.add_argument("--progress", type=str, help="读取训练日志（文本日志文件或tensorboard日志目录）并输出当前进度")
+    parser.add_argument("--epochs", type=int, help="总epoch数，用于估计剩余时间")
+    args = parser.parse_args()
+    
+    if args.progress:
+        if os.path.isdir(args.progress):
+            source = EventLogSource(args.progress, "", since=0)
+        else:
+            source = TextLogSource(args.progress)
+        tracker = ProgressTracker(source, total_epochs=args.epochs)
+        print(f"读取 {tracker.poll()} 条记录")
+        print(f"训练进度: {tracker.summary()}")
+        sys.exit(0)
+    
+    detector = create_detector()
+    if args.trace:
+        for timestamp, status, stats in replay_trace(args.trace, detector):
+            utilization = stats["utilization"]["avg"] if stats["utilization"] else float("nan")
+            memory = stats["memory_gb"]["max"] if stats["memory_gb"] else float("nan")
+            print(f"{time.strftime('%H:%M:%S', time.localtime(timestamp))} {status} "
+                  f"平均使用率: {utilization:.1f}% 最大显存: {memory:.2f}GB")
+        sys.exit(0)
+    
+    sampler = GpuSampler(NvmlSource(0), interval=args.interval, trace_path=args.record).start()
     try:
         while True:
-            utilization_records = []
-            memory_records = []
-            for _ in range(12):
-                utilization = get_gpu_utilization()
-                memory_usage = get_gpu_memory_usage()
-                if utilization is not None:
-                    utilization_records.append(utilization)
-                if memory_usage is not None:
-                    memory_records.append(memory_usage)
-                time.sleep(5)
-
-            if all(util < 50 for util in utilization_records) and any(mem > 15 for mem in memory_records):
+            time.sleep(detector.window)
+            status, stats = detector.check(sampler.buffer)
+            if status == "restart":
                 activate_bat_window_and_press_enter()
-            if all(util < 10 for util in utilization_records) and all(mem < 3 for mem in memory_records):
+            elif status == "stopped":
                 shutdown_computer()
 
     except KeyboardInterrupt:
         print("监测已停止。")
     finally:
-        pynvml.nvmlShutdown()
-    
\ No newline at end of file
+        sampler.stop()
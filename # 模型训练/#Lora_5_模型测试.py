@@ -1,22 +1,37 @@
 import os
 import sys
 import time
+import queue
+import threading
+import importlib.util
 import openpyxl
 from openpyxl import Workbook, load_workbook
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Alignment, Font, PatternFill
-from PIL import Image
 import io
 import traceback
 
 # 导入自定义工具包
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from utils.checkpoint_watcher import list_checkpoints
+
 # 定义训练集类型和地址
 CHARACTER_DIR = "E:\\Design\\Character"
 STYLES_DIR = "E:\\Design\\Styles"
 PROMPT_TEMPLATE_PATH = "E:\\Design\\提示词模板.xlsx"
 
+# LoRA输出根目录，测试表格中的值为去掉该前缀后的相对路径
+LORA_ROOT = "E:/Design/loras/"
+# 测试表格文件名（保存在项目gemini目录下）
+TEST_EXCEL_NAME = "测试.xlsx"
+
+# 生成测试图片使用的ComfyUI服务器和模型信息表格（与batch_model_test.py默认值一致）
+COMFY_HOST = "127.0.0.1:8191"
+MODEL_INFO_PATH = "E:\\models\\model_info.xlsx"
+BATCH_TEST_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 "# 模型测试", "batch_model_test.py")
+
 class LoraModelTester:
     def __init__(self, project_path):
         self.project_path = project_path
@@ -25,9 +40,11 @@ class LoraModelTester:
         self.excel_path = None
         self.prompt_id = None
         self.trigger_word = None
-        self.test_excel_path = None
+        self.test_excel_path = os.path.join(project_path, "gemini", TEST_EXCEL_NAME)
         self.prompts = []
         self.version = None
+        # 生成测试图片的BatchModelTester，首次使用时创建
+        self.batch_tester = None
         
     def detect_project_info(self):
         """检测项目类型和名称"""
@@ -111,15 +128,19 @@ class LoraModelTester:
             traceback.print_exc()
             return False
     
-    def create_test_excel(self):
-        """创建测试Excel文件"""
+    def create_test_excel(self, lora_files=None):
+        """
+        创建测试Excel文件
+        
+        Args:
+            lora_files: 写入Lora-1工作簿的模型文件名列表，None表示列出输出目录中已写入完成的文件
+        """
         try:
             # 创建gemini目录（如果不存在）
-            gemini_dir = os.path.join(self.project_path, "gemini")
+            gemini_dir = os.path.dirname(self.test_excel_path)
             os.makedirs(gemini_dir, exist_ok=True)
             
             # 创建测试Excel文件
-            self.test_excel_path = os.path.join(gemini_dir, "测试.xlsx")
             wb = Workbook()
             
             # 创建参数工作簿
@@ -213,45 +234,11 @@ class LoraModelTester:
                 cell.alignment = Alignment(horizontal="center", vertical="center")
             
             # 查找项目目录下的safetensors文件
-            lora_dir = f"E:/Design/loras/{self.project_name}"
-            if os.path.exists(lora_dir):
-                row = 2
-                # 按文件名排序，没有后缀的排最后
-                lora_files = []
-                for file in os.listdir(lora_dir):
-                    if file.endswith(".safetensors"):
-                        lora_files.append(file)
-                
-                # 排序文件，没有后缀的排最后
-                def get_suffix(filename):
-                    parts = filename.split("-")
-                    if len(parts) > 1 and parts[-1].split(".")[0].isdigit():
-                        return int(parts[-1].split(".")[0])
-                    return float('inf')  # 没有后缀的排最后
-                
-                lora_files.sort(key=get_suffix)
-                
-                for file in lora_files:
-                    file_path = os.path.join(lora_dir, file)
-                    # 从路径中提取值（去掉E:/Design/loras/前缀）
-                    value = file_path.replace("E:/Design/loras/", "")
-                    
-                    # 提取编号（项目名称-版本号-文件名后缀取最后三位数）
-                    suffix = "last"
-                    parts = file.split("-")
-                    if len(parts) > 1 and parts[-1].split(".")[0].isdigit():
-                        suffix = parts[-1].split(".")[0]
-                    
-                    # 将版本号插入到model_id的中间
-                    model_id = f"{self.project_name}-{self.version}-{suffix}"
-                    
-                    lora_sheet.cell(row=row, column=1, value=value)
-                    lora_sheet.cell(row=row, column=2, value="Load LoRA-1")
-                    lora_sheet.cell(row=row, column=3, value=1)
-                    lora_sheet.cell(row=row, column=4, value=1)
-                    lora_sheet.cell(row=row, column=5, value=model_id)
-                    lora_sheet.cell(row=row, column=6, value=self.trigger_word)
-                    row += 1
+            if lora_files is None:
+                # 只列出已写入完成的文件，按编号排序，没有后缀的排最后
+                lora_files = [file for file, _ in list_checkpoints(self.lora_dir())]
+            for file in lora_files:
+                lora_sheet.append(self.lora_row(file))
             
             # 保存工作簿
             wb.save(self.test_excel_path)
@@ -262,8 +249,68 @@ class LoraModelTester:
             traceback.print_exc()
             return False
 
+    def lora_dir(self):
+        return f"{LORA_ROOT}{self.project_name}"
+    
+    def lora_row(self, file):
+        """Lora-1工作簿中一个模型文件对应的行：值、节点名称、lora强度、clip强度、编号、触发词"""
+        file_path = os.path.join(self.lora_dir(), file)
+        # 从路径中提取值（去掉E:/Design/loras/前缀）
+        value = file_path.replace(LORA_ROOT, "")
+        
+        # 提取编号（项目名称-版本号-文件名后缀取最后三位数）
+        suffix = "last"
+        parts = file.split("-")
+        if len(parts) > 1 and parts[-1].split(".")[0].isdigit():
+            suffix = parts[-1].split(".")[0]
+        
+        # 将版本号插入到model_id的中间
+        model_id = f"{self.project_name}-{self.version}-{suffix}"
+        return [value, "Load LoRA-1", 1, 1, model_id, self.trigger_word]
+    
+    def append_lora_rows(self, lora_files):
+        """
+        把测试表格中还没有的模型文件追加到Lora-1工作簿，已生成的图片路径保持不变
+        
+        Returns:
+            追加的行数
+        """
+        wb = load_workbook(self.test_excel_path)
+        try:
+            lora_sheet = wb["Lora-1"]
+            existing = {row[0] for row in lora_sheet.iter_rows(min_row=2, max_col=1, values_only=True) if row[0]}
+            added = 0
+            for file in lora_files:
+                row = self.lora_row(file)
+                if row[0] not in existing:
+                    lora_sheet.append(row)
+                    existing.add(row[0])
+                    added += 1
+            if added:
+                wb.save(self.test_excel_path)
+            return added
+        finally:
+            wb.close()
+    
+    def render_tests(self, comfy_host=COMFY_HOST):
+        """
+        使用batch_model_test.py为测试表格中还没有图片的行生成测试图片（已有图片的行会跳过）
+        """
+        if self.batch_tester is None:
+            spec = importlib.util.spec_from_file_location("batch_model_test", BATCH_TEST_SCRIPT)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            self.batch_tester = module.BatchModelTester(MODEL_INFO_PATH, comfy_host)
+            if os.path.exists(MODEL_INFO_PATH):
+                self.batch_tester.load_model_info()
+            else:
+                print(f"警告: 模型信息表格不存在，底模编号将使用文件名: {MODEL_INFO_PATH}")
+        self.batch_tester.process_test_file(self.test_excel_path)
+    
     def check_test_completion(self):
         """检查测试是否真正完成并成功"""
+        from PIL import Image
+        
         try:
             # 检查测试Excel文件是否存在
             if not os.path.exists(self.test_excel_path):
@@ -271,12 +318,8 @@ class LoraModelTester:
                 return False
             
             # 获取E:\Design\loras\项目名称目录下的safetensors文件数量
-            expected_models_count = 0
-            lora_dir = f"E:/Design/loras/{self.project_name}"
-            if os.path.exists(lora_dir):
-                for file in os.listdir(lora_dir):
-                    if file.endswith(".safetensors"):
-                        expected_models_count += 1
+            lora_dir = self.lora_dir()
+            expected_models_count = len(list_checkpoints(lora_dir))
             
             if expected_models_count == 0:
                 print(f"警告: 在 {lora_dir} 目录下没有找到任何safetensors文件")
@@ -381,8 +424,14 @@ class LoraModelTester:
             traceback.print_exc()
             return False
     
-    def run(self):
-        """运行测试流程"""
+    def run(self, streamed=False):
+        """
+        运行测试流程
+        
+        Args:
+            streamed: 训练过程中已经边训练边测试时为True，保留已有的测试表格，
+                      只追加缺少的模型并生成剩余的测试图片（通常只剩最终模型）
+        """
         try:
             # 检测项目信息
             self.detect_project_info()
@@ -397,11 +446,17 @@ class LoraModelTester:
                 self.update_excel_status("失败：无法读取提示词模板")
                 return False
             
+            if streamed and os.path.exists(self.test_excel_path):
+                added = self.append_lora_rows([file for file, _ in list_checkpoints(self.lora_dir())])
+                print(f"测试表格已存在，追加 {added} 个模型")
             # 创建测试Excel文件
-            if not self.create_test_excel():
+            elif not self.create_test_excel():
                 self.update_excel_status("失败：无法创建测试Excel文件")
                 return False
             
+            if streamed:
+                self.render_tests()
+            
             # 检查测试是否真正完成并成功
             test_completion_result = self.check_test_completion()
             if not test_completion_result:
@@ -418,19 +473,103 @@ class LoraModelTester:
             return False
 
 
+class StreamingEvaluator:
+    """
+    边训练边测试：每个检查点写入完成后追加到测试表格的Lora-1工作簿，并在后台线程中提交到ComfyUI生成测试图片，
+    训练结束时大部分测试图片已经生成
+    """
+    
+    def __init__(self, tester, comfy_host=COMFY_HOST):
+        self.tester = tester
+        self.comfy_host = comfy_host
+        self.queue = queue.Queue()
+        self._thread = None
+    
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="StreamingEvaluator", daemon=True)
+        self._thread.start()
+        return self
+    
+    def on_checkpoint(self, event):
+        """CheckpointWatcher的回调（在监视线程中调用），只放入队列，不阻塞监视"""
+        self.queue.put(event["name"])
+    
+    def _run(self):
+        finished = False
+        while not finished:
+            names = [self.queue.get()]
+            # 生成图片期间到达的检查点合并为一批处理
+            while True:
+                try:
+                    names.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in names:
+                finished = True
+                names = [name for name in names if name is not None]
+            if not names:
+                continue
+            try:
+                added = self.tester.append_lora_rows(names)
+                print(f"边训练边测试: 追加 {added} 个检查点 {names}")
+                self.tester.render_tests(self.comfy_host)
+            except Exception as e:
+                print(f"边训练边测试出错: {str(e)}")
+                traceback.print_exc()
+    
+    def finish(self, timeout=None):
+        """等待队列中的检查点全部测试完成"""
+        if self._thread is None:
+            return
+        self.queue.put(None)
+        self._thread.join(timeout)
+
+
+def start_streaming_evaluation(project_path, comfy_host=COMFY_HOST):
+    """
+    训练开始前创建空的测试表格并启动边训练边测试
+    
+    Returns:
+        StreamingEvaluator，无法读取提示词信息或创建表格时返回None
+    """
+    tester = LoraModelTester(project_path)
+    tester.detect_project_info()
+    if not tester.read_prompt_info() or not tester.read_prompt_template():
+        return None
+    # 输出目录中的旧文件可能会被本次训练覆盖，不预先写入
+    if not tester.create_test_excel(lora_files=[]):
+        return None
+    return StreamingEvaluator(tester, comfy_host).start()
+
+
+def run(project_path, **opts):
+    """
+    流程入口，供#Lora_0_Start.py在进程内直接调用
+    
+    Args:
+        project_path: 项目路径
+        streamed: 可选，训练时已经边训练边测试
+    
+    Returns:
+        测试成功返回True，否则返回False
+    """
+    tester = LoraModelTester(project_path)
+    return tester.run(streamed=opts.get("streamed", False))
+
+
 def main():
     # 解析命令行参数
     import argparse
     parser = argparse.ArgumentParser(description="Lora模型测试脚本")
     parser.add_argument("--project_path", type=str, help="项目路径")
+    parser.add_argument("--streamed", action="store_true", help="保留已有的测试表格，追加缺少的模型并生成剩余的测试图片")
     args = parser.parse_args()
     
     # 如果没有提供项目路径，使用当前工作目录
     project_path = args.project_path if args.project_path else os.getcwd()
     
     # 创建测试实例并运行
-    tester = LoraModelTester(project_path)
-    tester.run()
+    run(project_path, streamed=args.streamed)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,208 @@
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import subprocess
+
+# 仓库根目录（utils包所在目录）
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 需要统计启动时间的入口：(名称, 类型, 目标)
+# 类型为 "script" 时按文件路径导入（不执行main），为 "module" 时按模块名导入
+ENTRY_POINTS = [
+    ("Lora_0_Start", "script", os.path.join(CURRENT_DIR, "#Lora_0_Start.py")),
+    ("Lora_1_图片尺寸", "script", os.path.join(CURRENT_DIR, "#Lora_1_图片尺寸-ARB桶.py")),
+    ("Lora_2_画面描述", "script", os.path.join(CURRENT_DIR, "#Lora_2_画面描述-Gemini.py")),
+    ("Lora_3_画面描述优化", "script", os.path.join(CURRENT_DIR, "#Lora_3_画面描述优化-Gemini.py")),
+    ("Lora_4_模型训练", "script", os.path.join(CURRENT_DIR, "#Lora_4_模型训练.py")),
+    ("Lora_5_模型测试", "script", os.path.join(CURRENT_DIR, "#Lora_5_模型测试.py")),
+    ("batch_model_test", "script", os.path.join(ROOT_DIR, "# 模型测试", "batch_model_test.py")),
+    ("utils", "module", "utils"),
+]
+
+# 历史记录文件，用于对比每次优化前后的启动时间（保存在仓库根目录下不纳入版本管理的cache文件夹）
+# 注意：openpyxl在各步骤脚本中保持顶层导入——每个脚本的主流程第一步就会打开训练信息.xlsx，
+# 延迟导入只会把同样的耗时挪到运行时，统计结果中的openpyxl耗时属于预期
+DEFAULT_HISTORY_PATH = os.path.join(ROOT_DIR, "cache", "startup_benchmark.json")
+
+
+def build_import_code(kind, target):
+    """
+    生成在子进程中执行的导入代码
+
+    Args:
+        kind: 入口类型，"script" 或 "module"
+        target: 脚本路径或模块名
+
+    Returns:
+        传递给 python -c 的代码字符串
+    """
+    lines = [
+        "import sys",
+        f"sys.path.insert(0, {ROOT_DIR!r})",
+    ]
+    if kind == "script":
+        lines += [
+            "import importlib.machinery, importlib.util",
+            f"loader = importlib.machinery.SourceFileLoader('startup_entry', {target!r})",
+            "spec = importlib.util.spec_from_loader('startup_entry', loader)",
+            "loader.exec_module(importlib.util.module_from_spec(spec))",
+        ]
+    else:
+        lines.append(f"import {target}")
+    return "\n".join(lines)
+
+
+def parse_importtime(stderr):
+    """
+    解析 -X importtime 的输出
+
+    Args:
+        stderr: 子进程的标准错误输出
+
+    Returns:
+        (顶层导入总耗时微秒, [(模块名, 自身耗时微秒, 累计耗时微秒), ...] 仅包含顶层导入)
+    """
+    total_us = 0
+    top_level = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0])
+            cumulative_us = int(parts[1])
+        except ValueError:
+            # 表头行
+            continue
+        name = parts[2][1:]
+        # 顶层导入没有缩进，嵌套导入每层缩进两个空格
+        if name.startswith(" "):
+            continue
+        total_us += cumulative_us
+        top_level.append((name, self_us, cumulative_us))
+    return total_us, top_level
+
+
+def measure_entry_point(kind, target):
+    """
+    在全新的解释器中导入一次入口，统计启动耗时
+
+    Args:
+        kind: 入口类型
+        target: 脚本路径或模块名
+
+    Returns:
+        结果字典，包含 ok, wall_ms, import_ms, top_level, error
+    """
+    cmd = [sys.executable, "-X", "importtime", "-c", build_import_code(kind, target)]
+    start_time = time.perf_counter()
+    result = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8", errors="replace")
+    wall_ms = (time.perf_counter() - start_time) * 1000
+
+    total_us, top_level = parse_importtime(result.stderr)
+    error = None
+    if result.returncode != 0:
+        # 只保留最后一行异常信息
+        error_lines = [line for line in result.stderr.splitlines() if line and not line.startswith("import time:")]
+        error = error_lines[-1] if error_lines else f"返回码 {result.returncode}"
+
+    return {
+        "ok": result.returncode == 0,
+        "wall_ms": wall_ms,
+        "import_ms": total_us / 1000,
+        "top_level": top_level,
+        "error": error,
+    }
+
+
+def load_history(history_path):
+    """读取历史记录，文件不存在或损坏时返回空列表"""
+    if os.path.exists(history_path):
+        try:
+            with open(history_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"读取历史记录时出错: {e}")
+    return []
+
+
+def save_history(history_path, history):
+    """保存历史记录"""
+    os.makedirs(os.path.dirname(os.path.abspath(history_path)), exist_ok=True)
+    with open(history_path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, ensure_ascii=False, indent=4)
+
+
+def find_previous(history, name):
+    """查找某个入口最近一次成功的记录"""
+    for record in reversed(history):
+        entry = record.get("entries", {}).get(name)
+        if entry and entry.get("ok"):
+            return entry
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="统计各入口脚本的冷启动时间（基于 python -X importtime）")
+    parser.add_argument("--repeat", type=int, default=3, help="每个入口的测量次数，第一次视为冷启动")
+    parser.add_argument("--top", type=int, default=8, help="显示耗时最多的顶层导入数量")
+    parser.add_argument("--entry", action="append", help="只测量指定名称的入口，可重复指定")
+    parser.add_argument("--history", type=str, default=DEFAULT_HISTORY_PATH, help="历史记录文件路径")
+    parser.add_argument("--no-save", action="store_true", help="不写入历史记录")
+    args = parser.parse_args()
+
+    entries = [e for e in ENTRY_POINTS if not args.entry or e[0] in args.entry]
+    history = load_history(args.history)
+    record = {
+        "time": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": sys.version.split()[0],
+        "entries": {},
+    }
+
+    print("\n===== 入口脚本启动时间统计 =====")
+    print(f"Python: {sys.executable}")
+    print(f"测量次数: {args.repeat}\n")
+
+    for name, kind, target in entries:
+        runs = [measure_entry_point(kind, target) for _ in range(max(args.repeat, 1))]
+        cold = runs[0]
+        if not cold["ok"]:
+            print(f"[{name}] 导入失败: {cold['error']}")
+            record["entries"][name] = {"ok": False, "error": cold["error"]}
+            continue
+
+        best = min(runs, key=lambda r: r["wall_ms"])
+        entry = {
+            "ok": True,
+            "cold_ms": round(cold["wall_ms"], 1),
+            "best_ms": round(best["wall_ms"], 1),
+            "import_ms": round(best["import_ms"], 1),
+            "top": [[module, round(cumulative_us / 1000, 1)]
+                    for module, _, cumulative_us in sorted(best["top_level"], key=lambda t: t[2], reverse=True)[:args.top]],
+        }
+        record["entries"][name] = entry
+
+        previous = find_previous(history, name)
+        delta = ""
+        if previous:
+            delta = f" (上次 {previous['best_ms']:.1f} ms，变化 {entry['best_ms'] - previous['best_ms']:+.1f} ms)"
+        print(f"[{name}] 冷启动 {entry['cold_ms']:.1f} ms，最快 {entry['best_ms']:.1f} ms，导入 {entry['import_ms']:.1f} ms{delta}")
+        for module, cumulative_ms in entry["top"]:
+            print(f"    {cumulative_ms:>9.1f} ms  {module}")
+
+    if not args.no_save:
+        history.append(record)
+        save_history(args.history, history)
+        print(f"\n已写入历史记录: {args.history}")
+    print("===== 入口脚本启动时间统计完成 =====\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 仓库根目录（utils包所在目录）
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from utils.trainer_client import TrainerClient, TrainerApiError, TASK_FINISHED_STATES
+
+
+class StubTrainer:
+    """
+    模拟训练服务器的任务管理：提交后任务为RUNNING，duration秒后变为FINISHED，同一时间只允许一个任务运行
+    """
+
+    def __init__(self, duration=5.0):
+        self.duration = duration
+        self.tasks = []
+        self.configs = []
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        now = time.time()
+        for task in self.tasks:
+            if task["status"] == "RUNNING" and now - task["started"] >= self.duration:
+                task["status"] = "FINISHED"
+
+    def run(self, config):
+        with self._lock:
+            self._refresh()
+            if any(task["status"] == "RUNNING" for task in self.tasks):
+                return {"status": "fail", "message": "已有正在运行的训练任务"}
+            if "model_train_type" not in config:
+                return {"status": "fail", "message": "缺少model_train_type"}
+            task = {"id": f"stub-{len(self.tasks) + 1}", "status": "RUNNING", "started": time.time()}
+            self.tasks.append(task)
+            self.configs.append(config)
+            return {"status": "success", "message": "Training started."}
+
+    def dump(self):
+        with self._lock:
+            self._refresh()
+            return {"status": "success",
+                    "data": {"tasks": [{"id": task["id"], "status": task["status"]} for task in self.tasks]}}
+
+    def terminate(self, task_id):
+        with self._lock:
+            for task in self.tasks:
+                if task["id"] == task_id and task["status"] == "RUNNING":
+                    task["status"] = "TERMINATED"
+            return {"status": "success"}
+
+
+def make_handler(trainer):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, body, code=200):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/api/tasks":
+                self._send(trainer.dump())
+            elif self.path.startswith("/api/tasks/terminate/"):
+                self._send(trainer.terminate(self.path.rsplit("/", 1)[-1]))
+            elif self.path == "/lora/flux.html":
+                self._send({"status": "success"})
+            else:
+                self._send({"status": "fail", "message": "not found"}, 404)
+
+        def do_POST(self):
+            if self.path != "/api/run":
+                self._send({"status": "fail", "message": "not found"}, 404)
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                config = json.loads(self.rfile.read(length).decode("utf-8"))
+            except ValueError:
+                self._send({"status": "fail", "message": "invalid json"}, 400)
+                return
+            self._send(trainer.run(config))
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_stub_server(port=0, duration=5.0):
+    """
+    在后台线程中启动模拟服务器
+
+    Returns:
+        (server, StubTrainer)，地址为 http://127.0.0.1:server.server_port
+    """
+    trainer = StubTrainer(duration)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(trainer))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, trainer
+
+
+def self_check(duration):
+    """用模拟服务器检查TrainerClient：提交、重复提交被拒绝、轮询到任务结束、终止任务"""
+    server, trainer = start_stub_server(duration=duration)
+    client = TrainerClient(f"http://127.0.0.1:{server.server_port}")
+    try:
+        assert client.available(), "接口不可用"
+        config = {"model_train_type": "flux-lora", "output_name": "stub", "max_train_epochs": 1}
+        task_id = client.submit(config)
+        print(f"已提交训练，任务: {task_id}")
+        assert task_id and client.task_status(task_id) == "RUNNING"
+        assert trainer.configs[-1] == config, "服务器收到的配置与提交的不一致"
+
+        try:
+            client.submit(config)
+            raise AssertionError("任务运行中时重复提交应当失败")
+        except TrainerApiError as e:
+            print(f"重复提交被拒绝: {e}")
+
+        start = time.time()
+        while client.task_status(task_id) not in TASK_FINISHED_STATES:
+            time.sleep(0.2)
+        print(f"任务已结束: {client.task_status(task_id)}，用时 {time.time() - start:.1f} 秒")
+
+        second = client.submit(config)
+        client.terminate(second)
+        assert client.task_status(second) == "TERMINATED"
+        print(f"任务 {second} 已终止")
+        print("检查通过")
+        return 0
+    finally:
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟训练服务器的HTTP接口（/api/run、/api/tasks），用于测试不启动浏览器的训练提交")
+    parser.add_argument("--port", type=int, default=28000, help="监听端口，默认与训练服务器相同")
+    parser.add_argument("--duration", type=float, default=30.0, help="模拟训练时长（秒）")
+    parser.add_argument("--check", action="store_true", help="在随机端口启动模拟服务器并检查TrainerClient后退出")
+    args = parser.parse_args()
+
+    if args.check:
+        return self_check(min(args.duration, 2.0))
+
+    server, _ = start_stub_server(args.port, args.duration)
+    print(f"模拟训练服务器已启动: http://127.0.0.1:{server.server_port}，按Ctrl+C退出")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,19 @@
 import subprocess
 import time
+import socket
+import threading
+import contextlib
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 import random
 
+from .readiness import backoff_delays, http_ok, wait_for_http
+
+# 等待Chrome调试端口就绪的最长时间（秒）
+CHROME_START_TIMEOUT = 15
+
 class ChromeManager:
     def __init__(self, config):
         self.chrome_path = config['chrome_path']
@@ -19,6 +27,8 @@ class ChromeManager:
         self.process = None
         self.driver = None
         self.wait = None
+        # 每次启动Chrome到调试端口就绪的耗时（秒）
+        self.launch_times = []
     
     def get_chrome_command(self):
         command = [
@@ -45,13 +55,36 @@ class ChromeManager:
         
         try:
             self.process = subprocess.Popen(self.get_chrome_command())
-            time.sleep(3)  # 减少等待时间
-            print(f"Chrome 已启动于端口 {self.port}")
+            # 调试端口的 /json/version 能访问时才能连接，不再固定等待
+            ready, waited = wait_for_http(self.version_url(), timeout=CHROME_START_TIMEOUT)
+            if not ready:
+                print(f"Chrome 调试端口 {self.port} 在 {waited:.1f} 秒内未就绪")
+                self.process.terminate()
+                self.process = None
+                return False
+            self.launch_times.append(waited)
+            print(f"Chrome 已启动于端口 {self.port}，等待 {waited:.1f} 秒")
             return True
         except Exception as e:
             print(f"启动 Chrome 失败: {e}")
             return False
     
+    def version_url(self):
+        return f"http://127.0.0.1:{self.port}/json/version"
+    
+    def is_healthy(self):
+        """Chrome进程仍在运行、调试端口有响应，且已连接的driver仍可用"""
+        if not self.process or self.process.poll() is not None:
+            return False
+        if not http_ok(self.version_url()):
+            return False
+        if self.driver:
+            try:
+                self.driver.current_window_handle
+            except Exception:
+                return False
+        return True
+    
     def get_driver(self):
         if self.driver and self.driver.service.is_connectable():
             return self.driver, self.wait
@@ -70,6 +103,7 @@ class ChromeManager:
             return None, None
     
     def open_url(self, url, max_retries=3):
+        delays = backoff_delays(initial=1.0)
         for attempt in range(max_retries):
             if not self.start_chrome():
                 continue
@@ -84,8 +118,10 @@ class ChromeManager:
                 return driver, wait
             except Exception as e:
                 print(f"尝试 {attempt + 1}/{max_retries} 打开 {url} 失败: {e}")
-                self.cleanup()
-                time.sleep(2)
+                # 浏览器本身正常时（如页面加载超时）直接重试，只有浏览器异常时才重启
+                if not self.is_healthy():
+                    self.cleanup()
+                time.sleep(next(delays))
         
         print(f"经过 {max_retries} 次尝试仍无法打开 {url}")
         return None, None
@@ -104,6 +140,125 @@ class ChromeManager:
     def __del__(self):
         self.cleanup()
 
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ChromePool:
+    """
+    预热的浏览器会话池：每个会话是一个独立端口、独立用户数据目录的ChromeManager，
+    借出（acquire/lease）后归还（release）继续复用，借出前检查会话是否健康，异常的会话会被重启
+    """
+    
+    def __init__(self, config, size=1, prewarm=False):
+        """
+        Args:
+            config: ChromeManager配置，第2个及以后的会话使用 "user_data_dir-序号" 作为用户数据目录
+                    （同一个用户数据目录不能同时被多个Chrome进程使用）
+            size: 会话数量上限
+            prewarm: 是否立即启动全部会话
+        """
+        self.config = config
+        self.size = size
+        self._idle = []
+        self._all = []
+        self._cond = threading.Condition()
+        # 统计：启动次数和耗时、借出次数、复用次数、健康检查失败次数
+        self.leases = 0
+        self.reuses = 0
+        self.health_failures = 0
+        if prewarm:
+            for _ in range(size):
+                manager = self._create()
+                if manager.start_chrome():
+                    self._idle.append(manager)
+    
+    def _create(self):
+        config = dict(self.config)
+        if self._all:
+            config['user_data_dir'] = f"{self.config['user_data_dir']}-{len(self._all)}"
+            config['remote_debugging_port'] = _free_port()
+        else:
+            config.setdefault('remote_debugging_port', _free_port())
+        manager = ChromeManager(config)
+        self._all.append(manager)
+        return manager
+    
+    def idle_count(self):
+        with self._cond:
+            return len(self._idle)
+    
+    def acquire(self, timeout=None):
+        """
+        借出一个健康的会话（Chrome已启动），没有空闲会话且已达到上限时等待归还
+        
+        Returns:
+            ChromeManager，超时或启动失败返回None
+        """
+        with self._cond:
+            if not self._idle and len(self._all) >= self.size:
+                self._cond.wait_for(lambda: self._idle, timeout)
+            if self._idle:
+                manager = self._idle.pop()
+                reused = True
+            elif len(self._all) < self.size:
+                manager = self._create()
+                reused = False
+            else:
+                return None
+        if reused and not manager.is_healthy():
+            print(f"Chrome 会话 (端口 {manager.port}) 健康检查失败，重新启动")
+            self.health_failures += 1
+            manager.cleanup()
+            reused = False
+        if not manager.start_chrome():
+            self.release(manager)
+            return None
+        with self._cond:
+            self.leases += 1
+            self.reuses += reused
+        return manager
+    
+    def release(self, manager):
+        """归还会话，保留浏览器进程供下次使用"""
+        with self._cond:
+            if manager not in self._idle:
+                self._idle.append(manager)
+            self._cond.notify()
+    
+    @contextlib.contextmanager
+    def lease(self, timeout=None):
+        manager = self.acquire(timeout)
+        try:
+            yield manager
+        finally:
+            if manager is not None:
+                self.release(manager)
+    
+    def stats(self):
+        """启动耗时和复用率统计"""
+        launch_times = [t for manager in self._all for t in manager.launch_times]
+        return {
+            "sessions": len(self._all),
+            "launches": len(launch_times),
+            "launch_avg_s": sum(launch_times) / len(launch_times) if launch_times else None,
+            "launch_max_s": max(launch_times) if launch_times else None,
+            "leases": self.leases,
+            "reuses": self.reuses,
+            "reuse_rate": self.reuses / self.leases if self.leases else None,
+            "health_failures": self.health_failures,
+        }
+    
+    def close(self):
+        with self._cond:
+            for manager in self._all:
+                manager.cleanup()
+            self._all.clear()
+            self._idle.clear()
+
+
 # 使用示例
 if __name__ == "__main__":
     config = {
@@ -1,7 +1,41 @@
-from .comfy_api_wrapper import ComfyApiWrapper
-from .comfy_workflow_wrapper import ComfyWorkflowWrapper
-from .comfy_websocket_wrapper import ComfyWebSocketClient
-from .ChromeManager import ChromeManager
-from .translate_baidu_request import BaiduTranslator
-from .translate_tencent_request import TencentTranslator
+import importlib
 
+# 按需导入：只有访问到对应属性时才导入子模块，
+# 避免只用到 ComfyWorkflowWrapper 的脚本也要加载 selenium、requests 等依赖
+_lazy_attrs = {
+    "ComfyApiWrapper": ".comfy_api_wrapper",
+    "ComfyWorkflowWrapper": ".comfy_workflow_wrapper",
+    "ComfyWebSocketClient": ".comfy_websocket_wrapper",
+    "ChromeManager": ".ChromeManager",
+    "BaiduTranslator": ".translate_baidu_request",
+    "TencentTranslator": ".translate_tencent_request",
+    "ModelCatalog": ".model_catalog",
+    "load_model_catalog": ".model_catalog",
+    "ModelSnapshot": ".model_snapshot",
+    "MovePlanner": ".move_planner",
+    "HashService": ".model_hash",
+    "read_header": ".safetensors_header",
+    "find_duplicates": ".model_dedupe",
+    "PreviewGallery": ".preview_gallery",
+    "build_config": ".toml_config",
+    "GpuSampler": ".gpu_monitor",
+    "ProgressTracker": ".training_progress",
+    "CheckpointWatcher": ".checkpoint_watcher",
+    "TrainerClient": ".trainer_client",
+    "TranslationMemory": ".translation_memory",
+}
+
+__all__ = list(_lazy_attrs)
+
+
+def __getattr__(name):
+    module_name = _lazy_attrs.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
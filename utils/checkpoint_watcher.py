@@ -0,0 +1,196 @@
+import os
+import re
+import json
+import time
+import queue
+import struct
+import logging
+import threading
+
+from .safetensors_header import MAX_HEADER_SIZE, read_header
+
+_log = logging.getLogger(__name__)
+
+# 中间检查点文件名后缀，如 name-000004.safetensors、name-step00001000.safetensors
+CHECKPOINT_PATTERN = re.compile(r"-(?:step)?(\d+)\.safetensors$", re.IGNORECASE)
+
+
+def checkpoint_number(filename):
+    """返回检查点文件名中的编号，最终模型（没有编号）返回None"""
+    match = CHECKPOINT_PATTERN.search(filename)
+    return int(match.group(1)) if match else None
+
+
+def is_complete_safetensors(path):
+    """
+    判断safetensors文件是否已完整写入：头部能解析，且张量数据的结束位置正好是文件末尾
+    （safetensors的数据区没有空洞，写入中的文件长度会小于这个位置）
+    """
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < 8:
+                return False
+            (header_size,) = struct.unpack("<Q", f.read(8))
+            if header_size > MAX_HEADER_SIZE or 8 + header_size > size:
+                return False
+            header = json.loads(f.read(header_size))
+        data_end = max((info["data_offsets"][1] for name, info in header.items() if name != "__metadata__"),
+                       default=0)
+    except (OSError, ValueError, KeyError, TypeError, IndexError):
+        return False
+    return 8 + header_size + data_end == size
+
+
+def list_checkpoints(directory, complete_only=True):
+    """
+    列出目录下的模型文件，按编号排序，最终模型（没有编号）排最后
+
+    Returns:
+        [(文件名, 编号或None), ...]
+    """
+    if not os.path.isdir(directory):
+        return []
+    files = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if not entry.is_file() or not entry.name.lower().endswith(".safetensors"):
+                continue
+            if complete_only and not is_complete_safetensors(entry.path):
+                continue
+            files.append((entry.name, checkpoint_number(entry.name)))
+    files.sort(key=lambda item: (item[1] is None, item[1] or 0, item[0]))
+    return files
+
+
+class CheckpointWatcher:
+    """
+    监视训练输出目录，每个检查点写入完成时发出一次事件
+    写入完成的判断：文件结构完整（头部+张量数据长度与文件大小一致），
+    或大小和修改时间在连续 stable_polls 次检查中保持不变且头部可以解析
+    """
+
+    def __init__(self, directory, callback=None, poll_interval=5.0, stable_polls=2, include_existing=False):
+        """
+        Args:
+            directory: 训练输出目录
+            callback: 检查点完成时调用 callback(事件字典)
+            poll_interval: 检查间隔（秒）
+            stable_polls: 大小不变判断的次数
+            include_existing: 启动时已存在的文件是否也发出事件，否则只在它们被重新写入（大小或修改时间变化）后发出
+        """
+        self.directory = directory
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self.stable_polls = stable_polls
+        self.events = queue.Queue()
+        self.completed = []
+        self._pending = {}
+        self._done = set()
+        self._stop = threading.Event()
+        self._thread = None
+        # 启动时已存在的文件 {文件名: (大小, 修改时间ns)}，重新训练覆盖同名文件时仍会发出事件
+        self._existing = {} if include_existing else self._scan_signatures()
+
+    def _scan_signatures(self):
+        if not os.path.isdir(self.directory):
+            return {}
+        signatures = {}
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.lower().endswith(".safetensors"):
+                    stat = entry.stat()
+                    signatures[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        return signatures
+
+    def poll(self):
+        """
+        检查一次目录
+
+        Returns:
+            本次新完成的事件列表
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        finished = []
+        seen = set()
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                name = entry.name
+                if name in self._done or not name.lower().endswith(".safetensors") or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if self._existing.get(name) == signature:
+                    continue
+                self._existing.pop(name, None)
+                seen.add(name)
+                previous, count = self._pending.get(name, (None, 0))
+                count = count + 1 if signature == previous else 1
+                self._pending[name] = (signature, count)
+                if is_complete_safetensors(entry.path):
+                    finished.append((name, entry.path, stat.st_size))
+                elif count > self.stable_polls and self._header_readable(entry.path):
+                    # 大小长时间不变且头部可以解析，按写入完成处理（例如数据区末尾有填充）
+                    _log.warning(f"检查点长度与头部记录不一致，按大小稳定视为写入完成: {entry.path}")
+                    finished.append((name, entry.path, stat.st_size))
+        # 写入中途被删除的文件不再跟踪
+        for name in list(self._pending):
+            if name not in seen:
+                del self._pending[name]
+
+        events = []
+        for name, path, size in sorted(finished, key=lambda item: (checkpoint_number(item[0]) is None, checkpoint_number(item[0]) or 0)):
+            self._done.add(name)
+            self._pending.pop(name, None)
+            event = {
+                "name": name,
+                "path": path,
+                "number": checkpoint_number(name),
+                "final": checkpoint_number(name) is None,
+                "size": size,
+                "time": time.time(),
+            }
+            events.append(event)
+            self.completed.append(event)
+            self.events.put(event)
+            if self.callback:
+                try:
+                    self.callback(event)
+                except Exception as e:
+                    _log.warning(f"检查点回调出错 {name}: {e}")
+        return events
+
+    @staticmethod
+    def _header_readable(path):
+        try:
+            read_header(path)
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except OSError as e:
+                _log.warning(f"检查输出目录失败 {self.directory}: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="CheckpointWatcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll_interval + 1)
+
+    def final_checkpoint(self):
+        """最终模型的事件，尚未完成时返回None"""
+        for event in self.completed:
+            if event["final"]:
+                return event
+        return None
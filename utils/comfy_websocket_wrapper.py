@@ -6,25 +6,39 @@ import urllib.parse
 from io import BytesIO
 from PIL import Image
 
+from .readiness import wait_until
+
 
 class ComfyWebSocketClient:
-    def __init__(self, server_address, client_id: str = None):
+    def __init__(self, server_address, client_id: str = None, connect_timeout: float = 30):
         """
         初始化类，设置服务器地址，并生成客户端ID。
         
         :param server_address: 服务器地址，格式如 "127.0.0.1:8188"
+        :param connect_timeout: 服务器尚未启动时以指数退避重试连接的总时限（秒）
         """
         self.server_address = server_address
         self.client_id = client_id or str(uuid.uuid4())
+        self.connect_timeout = connect_timeout
         self.ws = None
         self.connect()
 
     def connect(self):
         """
-        建立与服务器的WebSocket连接。
+        建立与服务器的WebSocket连接，连接失败时以指数退避重试直到超时。
         """
-        self.ws = websocket.WebSocket()
-        self.ws.connect(f"ws://{self.server_address}/ws?clientId={self.client_id}")
+        url = f"ws://{self.server_address}/ws?clientId={self.client_id}"
+
+        def try_connect():
+            ws = websocket.WebSocket()
+            ws.connect(url, timeout=5)
+            ws.settimeout(None)
+            self.ws = ws
+            return True
+
+        ready, waited = wait_until(try_connect, timeout=self.connect_timeout, name=f"ComfyUI {self.server_address}")
+        if not ready:
+            raise ConnectionError(f"无法连接到ComfyUI服务器 {self.server_address}（已等待 {waited:.1f} 秒）")
 
     def queue_prompt(self, prompt):
         """
@@ -0,0 +1,308 @@
+import math
+import json
+import time
+import array
+import logging
+import threading
+
+_log = logging.getLogger(__name__)
+
+# 每个采样点记录的字段
+FIELDS = ("time", "utilization", "memory_gb", "power_w", "temperature_c")
+
+
+class RingBuffer:
+    """
+    固定容量的采样环形缓冲区，每个字段使用一个 array('d')，写满后覆盖最早的数据
+    """
+
+    def __init__(self, capacity=3600):
+        self.capacity = capacity
+        self._data = {field: array.array("d", [math.nan]) * capacity for field in FIELDS}
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def append(self, sample):
+        """添加采样点 {字段: 值}，缺失的字段记为nan"""
+        with self._lock:
+            for field in FIELDS:
+                value = sample.get(field)
+                self._data[field][self._next] = math.nan if value is None else float(value)
+            self._next = (self._next + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def latest(self):
+        """返回最新的采样点，没有数据时返回None"""
+        with self._lock:
+            if not self._count:
+                return None
+            index = (self._next - 1) % self.capacity
+            return {field: self._data[field][index] for field in FIELDS}
+
+    def window(self, seconds, now=None):
+        """
+        返回最近seconds秒内的采样点（按时间顺序）
+
+        Args:
+            seconds: 时间窗口长度
+            now: 窗口结束时间，默认使用最新采样点的时间（回放记录时使用记录中的时间）
+
+        Returns:
+            {字段: [值, ...]}
+        """
+        with self._lock:
+            result = {field: [] for field in FIELDS}
+            if not self._count:
+                return result
+            times = self._data["time"]
+            if now is None:
+                now = times[(self._next - 1) % self.capacity]
+            # 从最新的采样点往前找，直到超出时间窗口
+            indexes = []
+            for offset in range(1, self._count + 1):
+                index = (self._next - offset) % self.capacity
+                if times[index] <= now - seconds:
+                    break
+                if times[index] <= now:
+                    indexes.append(index)
+            for index in reversed(indexes):
+                for field in FIELDS:
+                    result[field].append(self._data[field][index])
+            return result
+
+    def stats(self, seconds, now=None):
+        """
+        时间窗口内各字段的统计值
+
+        Returns:
+            {"count": 采样数, 字段: {"avg", "min", "max"}}，无有效值的字段为None
+        """
+        samples = self.window(seconds, now)
+        result = {"count": len(samples["time"])}
+        for field in FIELDS[1:]:
+            values = [value for value in samples[field] if not math.isnan(value)]
+            result[field] = {
+                "avg": sum(values) / len(values),
+                "min": min(values),
+                "max": max(values),
+            } if values else None
+        return result
+
+
+class NvmlSource:
+    """
+    通过NVML读取显卡状态，只初始化一次并缓存设备句柄，不再每次采样都调用nvmlDeviceGetHandleByIndex
+    """
+
+    def __init__(self, device_index=0):
+        import pynvml
+
+        self._nvml = pynvml
+        pynvml.nvmlInit()
+        self.handle = pynvml.nvmlDeviceGetHandleByIndex(device_index)
+        # 部分显卡不支持功耗或温度查询，失败一次后不再查询
+        self._power_supported = True
+        self._temperature_supported = True
+
+    def read(self):
+        nvml = self._nvml
+        sample = {"time": time.time()}
+        try:
+            sample["utilization"] = nvml.nvmlDeviceGetUtilizationRates(self.handle).gpu
+            sample["memory_gb"] = nvml.nvmlDeviceGetMemoryInfo(self.handle).used / (1024 ** 3)
+        except nvml.NVMLError as e:
+            _log.warning(f"读取GPU状态出错: {e}")
+        if self._power_supported:
+            try:
+                sample["power_w"] = nvml.nvmlDeviceGetPowerUsage(self.handle) / 1000
+            except nvml.NVMLError:
+                self._power_supported = False
+        if self._temperature_supported:
+            try:
+                sample["temperature_c"] = nvml.nvmlDeviceGetTemperature(self.handle, nvml.NVML_TEMPERATURE_GPU)
+            except nvml.NVMLError:
+                self._temperature_supported = False
+        return sample
+
+    def close(self):
+        try:
+            self._nvml.nvmlShutdown()
+        except Exception:
+            pass
+
+
+class TraceSource:
+    """
+    从记录文件（JSON Lines，每行一个采样点）读取采样，用于在没有显卡的环境下回放和测试
+    """
+
+    def __init__(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            self.samples = [json.loads(line) for line in f if line.strip()]
+        self._position = 0
+
+    def read(self):
+        """返回下一个采样点，读完后返回None"""
+        if self._position >= len(self.samples):
+            return None
+        sample = self.samples[self._position]
+        self._position += 1
+        return sample
+
+    def close(self):
+        pass
+
+
+class GpuSampler:
+    """
+    后台采样线程：按固定间隔读取显卡状态写入环形缓冲区，可同时把采样记录到文件供回放
+    """
+
+    def __init__(self, source, interval=1.0, capacity=3600, trace_path=None):
+        """
+        Args:
+            source: 采样来源（NvmlSource 或 TraceSource）
+            interval: 采样间隔（秒）
+            capacity: 缓冲区容量（采样点数）
+            trace_path: 记录采样的文件路径，None表示不记录
+        """
+        self.source = source
+        self.interval = interval
+        self.buffer = RingBuffer(capacity)
+        self.trace_path = trace_path
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample_once(self):
+        """采样一次并写入缓冲区，来源没有数据时返回None"""
+        sample = self.source.read()
+        if sample is not None:
+            self.buffer.append(sample)
+        return sample
+
+    def _run(self):
+        trace = open(self.trace_path, "a", encoding="utf-8") if self.trace_path else None
+        try:
+            while not self._stop.is_set():
+                started = time.perf_counter()
+                sample = self.sample_once()
+                if sample is None:
+                    break
+                if trace:
+                    trace.write(json.dumps(sample) + "\n")
+                    trace.flush()
+                self._stop.wait(max(self.interval - (time.perf_counter() - started), 0))
+        finally:
+            if trace:
+                trace.close()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="GpuSampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 1)
+        self.source.close()
+
+    def latest(self):
+        return self.buffer.latest()
+
+    def stats(self, seconds, now=None):
+        return self.buffer.stats(seconds, now)
+
+
+class StallDetector:
+    """
+    根据缓冲区中的窗口统计判断训练状态，阈值与原来的监测逻辑一致：
+    - 开始运行：使用率>50% 或 显存>15GB
+    - 卡住：窗口内使用率都<30% 且 显存曾>15GB，连续 stuck_checks 次后需要重启
+    - 停止：窗口内使用率都<20% 且 显存都<3GB，连续 stopped_checks 次后确认停止
+    """
+
+    def __init__(self, window=30, start_utilization=50, start_memory=15,
+                 stuck_utilization=30, stuck_memory=15, stuck_checks=6,
+                 stopped_utilization=20, stopped_memory=3, stopped_checks=10):
+        self.window = window
+        self.start_utilization = start_utilization
+        self.start_memory = start_memory
+        self.stuck_utilization = stuck_utilization
+        self.stuck_memory = stuck_memory
+        self.stuck_checks = stuck_checks
+        self.stopped_utilization = stopped_utilization
+        self.stopped_memory = stopped_memory
+        self.stopped_checks = stopped_checks
+        self.inactive_count = 0
+
+    def is_started(self, sample):
+        """单个采样点是否表示训练已开始"""
+        if not sample:
+            return False
+        utilization = sample.get("utilization")
+        memory = sample.get("memory_gb")
+        return ((utilization is not None and utilization > self.start_utilization)
+                or (memory is not None and memory > self.start_memory))
+
+    def check(self, buffer, now=None):
+        """
+        检查一次最近窗口内的状态
+
+        Returns:
+            (状态, 窗口统计)，状态为 "running" / "suspect_stuck" / "restart" / "suspect_stopped" / "stopped" / "no_data"
+        """
+        stats = buffer.stats(self.window, now)
+        utilization = stats["utilization"]
+        memory = stats["memory_gb"]
+        if utilization is None or memory is None:
+            return "no_data", stats
+        if utilization["max"] < self.stuck_utilization and memory["max"] > self.stuck_memory:
+            self.inactive_count += 1
+            if self.inactive_count >= self.stuck_checks:
+                self.inactive_count = 0
+                return "restart", stats
+            return "suspect_stuck", stats
+        if utilization["max"] < self.stopped_utilization and memory["max"] < self.stopped_memory:
+            self.inactive_count += 1
+            if self.inactive_count >= self.stopped_checks:
+                return "stopped", stats
+            return "suspect_stopped", stats
+        self.inactive_count = 0
+        return "running", stats
+
+
+def replay_trace(path, detector=None, interval=None, capacity=3600):
+    """
+    按记录的时间回放采样记录，每隔一个检测窗口运行一次检测（不等待真实时间）
+
+    Args:
+        path: 记录文件路径
+        detector: StallDetector，默认使用默认阈值
+        interval: 检测间隔（秒），默认等于检测窗口
+
+    Returns:
+        [(时间, 状态, 窗口统计), ...]
+    """
+    detector = detector or StallDetector()
+    interval = interval or detector.window
+    sampler = GpuSampler(TraceSource(path), capacity=capacity)
+    results = []
+    next_check = None
+    while True:
+        sample = sampler.sample_once()
+        if sample is None:
+            break
+        now = sample["time"]
+        if next_check is None:
+            next_check = now + interval
+        if now >= next_check:
+            status, stats = detector.check(sampler.buffer, now)
+            results.append((now, status, stats))
+            next_check = now + interval
+    return results
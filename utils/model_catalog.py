@@ -0,0 +1,271 @@
+import os
+import pickle
+import logging
+import threading
+
+_log = logging.getLogger(__name__)
+
+# 缓存格式版本，修改ModelCatalog结构时递增，使旧的磁盘缓存失效
+CATALOG_CACHE_VERSION = 3
+
+# 默认读取的工作簿
+DEFAULT_SHEETS = ("Stable-diffusion", "Lora")
+
+# 各工作簿子串匹配兜底的方向，与原来逐行匹配的规则一致：
+# "both" 查询值与表格中的文件名任一方向包含即可（原底模规则），
+# "contained" 只匹配表格中的文件名包含在查询值中的模型（原Lora规则）
+SUBSTRING_RULES = {"Stable-diffusion": "both", "Lora": "contained"}
+
+# 进程内缓存 {绝对路径: ((mtime_ns, size), ModelCatalog)}
+_lock = threading.Lock()
+_memory_cache = {}
+
+
+class ModelCatalog:
+    """
+    模型信息表格（model_info.xlsx）的只读目录
+    每个工作簿保存为行字典列表（只保留非空单元格），查找模型时使用按需建立的ModelIndex
+    """
+
+    def __init__(self, source_path, sheets):
+        """
+        Args:
+            source_path: 来源Excel文件路径
+            sheets: {工作簿名: (表头列表, 行字典列表)}
+        """
+        self.source_path = source_path
+        self.headers = {name: headers for name, (headers, _) in sheets.items()}
+        self.sheets = {name: rows for name, (_, rows) in sheets.items()}
+        self._indexes = {}
+
+    def rows(self, sheet_name):
+        """返回指定工作簿的行字典列表，工作簿不存在时返回空列表"""
+        return self.sheets.get(sheet_name, [])
+
+    def has_sheet(self, sheet_name):
+        return sheet_name in self.sheets
+
+    def index(self, sheet_name):
+        """返回指定工作簿的ModelIndex，首次调用时建立，之后复用"""
+        if sheet_name not in self._indexes:
+            self._indexes[sheet_name] = ModelIndex(self.rows(sheet_name), SUBSTRING_RULES.get(sheet_name, "contained"))
+        return self._indexes[sheet_name]
+
+
+def _split_path(path):
+    """
+    将路径规范化为小写的路径片段列表，同时兼容 \\ 和 / 分隔符
+    """
+    path = os.path.normcase(str(path)).replace("\\", "/")
+    return [part for part in path.split("/") if part and part != "."]
+
+
+def _new_trie_node():
+    return {"children": {}, "model": None, "first": None}
+
+
+class ModelIndex:
+    """
+    模型查找索引，替代逐行遍历目录做子串匹配
+    查找顺序：完整路径精确匹配 -> 文件名(不含后缀)精确匹配 -> 反向路径字典树后缀匹配 -> 子串匹配兜底
+    """
+
+    def __init__(self, models, substring="contained"):
+        """
+        Args:
+            models: 模型行字典列表（需包含"文件名"，可选"拓展名"、"ComfyUI路径"）
+            substring: 匹配方向，"contained" 只匹配路径包含在查询值中的模型，
+                       "both" 还匹配查询值包含在路径中的模型（见SUBSTRING_RULES）
+        """
+        self.models = models
+        self.substring = substring
+        self._by_path = {}
+        self._by_stem = {}
+        # 以路径片段倒序建立的字典树，用于按路径后缀查找
+        self._trie = _new_trie_node()
+        # 查找结果缓存（包括未命中），同一个值在测试表中通常重复出现多次
+        self._cache = {}
+
+        for model in models:
+            filename = str(model.get("文件名"))
+            paths = [filename + str(model.get("拓展名") or "")]
+            if model.get("ComfyUI路径"):
+                paths.append(model.get("ComfyUI路径"))
+            for path in paths:
+                parts = _split_path(path)
+                if parts:
+                    self._by_path.setdefault("/".join(parts), model)
+                    self._insert(parts, model)
+            self._by_stem.setdefault(os.path.normcase(filename), model)
+
+    def _insert(self, parts, model):
+        node = self._trie
+        for part in reversed(parts):
+            node = node["children"].setdefault(part, _new_trie_node())
+            if node["first"] is None:
+                node["first"] = model
+        if node["model"] is None:
+            node["model"] = model
+
+    def _find_suffix(self, parts):
+        """
+        在字典树中查找：优先返回路径是查询值后缀的最长匹配，
+        匹配方向为"both"时，若查询值本身是某个路径的后缀，则返回该分支下的第一个模型
+        """
+        node = self._trie
+        best = None
+        for part in reversed(parts):
+            node = node["children"].get(part)
+            if node is None:
+                return best
+            if node["model"] is not None:
+                best = node["model"]
+        if best is None and self.substring == "both":
+            return node["first"]
+        return best
+
+    def _find_substring(self, query):
+        # 兜底：与原来的逐行子串匹配规则一致（方向见SUBSTRING_RULES）
+        normalized = "/".join(_split_path(query))
+        for model in self.models:
+            path = "/".join(_split_path(model.get("文件名")))
+            if path and (path in normalized or (self.substring == "both" and normalized in path)):
+                return model
+        return None
+
+    def find(self, query):
+        """
+        查找模型
+
+        Args:
+            query: 测试表中的模型值（路径或文件名），为列表时取第一个元素
+
+        Returns:
+            行字典，未找到返回None
+        """
+        if isinstance(query, list):
+            query = query[0] if query else None
+        if not query:
+            return None
+        query = str(query)
+        if query in self._cache:
+            return self._cache[query]
+
+        model = None
+        parts = _split_path(query)
+        if parts:
+            model = self._by_path.get("/".join(parts))
+            if model is None:
+                model = self._by_stem.get(parts[-1]) or self._by_stem.get(os.path.splitext(parts[-1])[0])
+            if model is None:
+                model = self._find_suffix(parts)
+            if model is None:
+                model = self._find_substring(query)
+
+        self._cache[query] = model
+        return model
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _read_sheets(path, sheet_names):
+    """
+    以只读流式模式读取工作簿：不加载图片、样式等内容，只取单元格值
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheets = {}
+        for sheet_name in sheet_names:
+            if sheet_name not in wb.sheetnames:
+                _log.warning(f"模型信息表格中没有{sheet_name}工作簿")
+                continue
+            rows_iter = wb[sheet_name].iter_rows(values_only=True)
+            headers = list(next(rows_iter, ()))
+            rows = []
+            for values in rows_iter:
+                row = {header: value for header, value in zip(headers, values)
+                       if header is not None and value is not None}
+                if row.get("文件名"):
+                    rows.append(row)
+            sheets[sheet_name] = (headers, rows)
+        return sheets
+    finally:
+        # 只读模式下需要显式关闭以释放文件句柄
+        wb.close()
+
+
+def _disk_cache_path(path):
+    return path + ".catalog.pkl"
+
+
+def _load_disk_cache(path, signature, sheet_names):
+    cache_path = _disk_cache_path(path)
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, "rb") as f:
+            cached = pickle.load(f)
+        if (cached.get("version") == CATALOG_CACHE_VERSION and cached.get("signature") == signature
+                and cached.get("sheet_names") == tuple(sheet_names)):
+            return cached["catalog"]
+    except Exception as e:
+        _log.warning(f"读取模型目录缓存失败，将重新解析: {e}")
+    return None
+
+
+def _save_disk_cache(path, signature, sheet_names, catalog):
+    cache_path = _disk_cache_path(path)
+    tmp_path = cache_path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump({
+                "version": CATALOG_CACHE_VERSION,
+                "signature": signature,
+                "sheet_names": tuple(sheet_names),
+                "catalog": catalog,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        _log.warning(f"保存模型目录缓存失败: {e}")
+
+
+def load_model_catalog(path, sheet_names=DEFAULT_SHEETS, use_disk_cache=True):
+    """
+    读取模型信息表格，按文件修改时间缓存解析结果
+    文件未变化时直接返回缓存（进程内缓存优先，其次是表格旁的 .catalog.pkl 文件）
+
+    Args:
+        path: model_info.xlsx 路径
+        sheet_names: 需要读取的工作簿名
+        use_disk_cache: 是否使用磁盘缓存
+
+    Returns:
+        ModelCatalog 实例
+    """
+    path = os.path.abspath(path)
+    sheet_names = tuple(sheet_names)
+    signature = _file_signature(path)
+    key = (path, sheet_names)
+
+    with _lock:
+        cached = _memory_cache.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+    catalog = _load_disk_cache(path, signature, sheet_names) if use_disk_cache else None
+    if catalog is not None:
+        _log.info(f"使用模型目录缓存: {_disk_cache_path(path)}")
+    else:
+        _log.info(f"解析模型信息表格: {path}")
+        catalog = ModelCatalog(path, _read_sheets(path, sheet_names))
+        if use_disk_cache:
+            _save_disk_cache(path, signature, sheet_names, catalog)
+
+    with _lock:
+        _memory_cache[key] = (signature, catalog)
+    return catalog
@@ -0,0 +1,141 @@
+import os
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+_log = logging.getLogger(__name__)
+
+# 参与查重的模型文件后缀
+MODEL_EXTS = (".safetensors", ".ckpt", ".pt", ".pth", ".bin")
+
+# 头尾各读取的字节数
+PARTIAL_CHUNK_SIZE = 1024 * 1024
+
+# 小于该大小的文件不参与查重（空文件、占位文件）
+MIN_SIZE = 1024
+
+
+def partial_hash(path, size, chunk_size=PARTIAL_CHUNK_SIZE):
+    """
+    只读取文件头尾各一块计算hash，用于在完整hash之前快速排除大小相同但内容不同的文件
+    """
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        sha256.update(f.read(chunk_size))
+        if size > chunk_size * 2:
+            f.seek(size - chunk_size)
+            sha256.update(f.read(chunk_size))
+        elif size > chunk_size:
+            sha256.update(f.read())
+    return sha256.hexdigest()
+
+
+def find_duplicates(files, hash_service, known_hashes=None, max_workers=4, chunk_size=PARTIAL_CHUNK_SIZE):
+    """
+    查找内容完全相同的模型文件
+    1. 按文件大小分桶，大小唯一的文件直接排除（不读取）
+    2. 同大小的文件比较头尾块hash
+    3. 头尾一致的候选才计算完整SHA-256（使用HashService的缓存）
+
+    Args:
+        files: [(路径, 大小), ...]
+        hash_service: HashService 实例
+        known_hashes: 已知的完整hash {路径: sha256}（如快照中记录的hash），可跳过读取
+        max_workers: 计算头尾hash的线程数
+        chunk_size: 头尾块大小
+
+    Returns:
+        (重复组列表, 统计)
+        重复组: {"sha256", "size", "paths": [...], "reclaimable": 可释放字节数}，按可释放字节数倒序
+        统计: {"files", "size_candidates", "partial_candidates", "full_hashed"}
+    """
+    known_hashes = known_hashes or {}
+    by_size = {}
+    for path, size in files:
+        if size >= MIN_SIZE:
+            by_size.setdefault(size, []).append(path)
+    size_buckets = [(size, paths) for size, paths in by_size.items() if len(paths) > 1]
+    size_candidates = sum(len(paths) for _, paths in size_buckets)
+
+    # 头尾hash分桶，已知完整hash的文件直接用完整hash
+    def bucket_key(item):
+        path, size = item
+        if path in known_hashes:
+            return item, ("full", known_hashes[path])
+        try:
+            return item, ("partial", partial_hash(path, size, chunk_size))
+        except OSError as e:
+            _log.warning(f"读取文件失败 {path}: {e}")
+            return item, None
+
+    items = [(path, size) for size, paths in size_buckets for path in paths]
+    partial_buckets = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for (path, size), key in executor.map(bucket_key, items):
+            if key is None:
+                continue
+            # 完整hash相同的文件头尾也一定相同，合并到同一个候选桶里再比较
+            partial_buckets.setdefault(size, {}).setdefault(key, []).append(path)
+
+    candidates = []
+    for size, buckets in partial_buckets.items():
+        partial_paths = [path for key, paths in buckets.items() if key[0] == "partial" for path in paths]
+        full_paths = [path for key, paths in buckets.items() if key[0] == "full" for path in paths]
+        for key, paths in buckets.items():
+            if key[0] != "partial":
+                continue
+            # 头尾hash唯一且没有同大小的已知hash文件时可以排除
+            if len(paths) > 1 or full_paths:
+                candidates.extend((path, size) for path in paths)
+        if len(full_paths) > 1 or (full_paths and partial_paths):
+            candidates.extend((path, size) for path in full_paths)
+    partial_candidates = len(candidates)
+
+    to_hash = [path for path, _ in candidates if path not in known_hashes]
+    full_hashes = dict(known_hashes)
+    full_hashes.update(hash_service.hash_files(to_hash))
+
+    groups = {}
+    for path, size in candidates:
+        sha256 = full_hashes.get(path)
+        if sha256:
+            groups.setdefault((sha256, size), []).append(path)
+
+    duplicates = []
+    for (sha256, size), paths in groups.items():
+        if len(paths) > 1:
+            paths.sort()
+            duplicates.append({
+                "sha256": sha256,
+                "size": size,
+                "paths": paths,
+                "reclaimable": size * (len(paths) - 1),
+            })
+    duplicates.sort(key=lambda group: group["reclaimable"], reverse=True)
+
+    stats = {
+        "files": len(files),
+        "size_candidates": size_candidates,
+        "partial_candidates": partial_candidates,
+        "full_hashed": len(to_hash),
+    }
+    return duplicates, stats
+
+
+def snapshot_files(snapshot, exts=MODEL_EXTS):
+    """
+    从ModelSnapshot中取出模型文件及已记录的hash，不再访问磁盘
+
+    Returns:
+        ([(绝对路径, 大小), ...], {绝对路径: sha256})
+    """
+    files = []
+    known_hashes = {}
+    for rel_path, (size, _, file_hash) in snapshot.entries.items():
+        if not rel_path.lower().endswith(exts):
+            continue
+        path = os.path.join(snapshot.root, rel_path)
+        files.append((path, size))
+        if file_hash:
+            known_hashes[path] = file_hash
+    return files, known_hashes
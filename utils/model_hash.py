@@ -0,0 +1,202 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_log = logging.getLogger(__name__)
+
+# hash缓存文件名，保存在模型根目录下
+HASH_CACHE_NAME = "model_hash_cache.json"
+HASH_CACHE_VERSION = 1
+
+# 每次读取的块大小，大块顺序读取对机械硬盘和大文件更友好
+CHUNK_SIZE = 16 * 1024 * 1024
+
+# AutoV2 短hash长度（即SHA-256的前10位，与WebUI/Civitai一致）
+AUTOV2_LENGTH = 10
+
+
+def sha256_file(path, chunk_size=CHUNK_SIZE):
+    """
+    以大块流式读取计算文件的SHA-256，复用同一个缓冲区避免重复分配内存
+
+    Returns:
+        64位小写十六进制字符串
+    """
+    sha256 = hashlib.sha256()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                break
+            sha256.update(view[:size])
+    return sha256.hexdigest()
+
+
+def autov2(sha256):
+    """由完整的SHA-256得到AutoV2短hash"""
+    return sha256[:AUTOV2_LENGTH].lower() if sha256 else ""
+
+
+def hash_matches(expected, sha256):
+    """
+    比较表格中记录的hash与计算出的SHA-256，支持完整SHA-256和AutoV2两种格式
+
+    Returns:
+        一致返回True，不一致返回False，格式无法识别（如AutoV1）返回None
+    """
+    expected = str(expected or "").strip().lower()
+    if len(expected) == 64:
+        return expected == sha256
+    if len(expected) == AUTOV2_LENGTH:
+        return expected == autov2(sha256)
+    return None
+
+
+def _key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+class HashService:
+    """
+    模型文件hash计算服务
+    结果按 (路径, 大小, 修改时间) 缓存并保存到磁盘，文件未变化时不会重新计算；
+    按所在磁盘分组，每个磁盘只用固定数量的线程顺序读取，避免多线程同时读取同一块硬盘造成寻道抖动
+    可以直接作为 ModelSnapshot.scan 的 hash_func 使用
+    """
+
+    def __init__(self, cache_path=None, chunk_size=CHUNK_SIZE, workers_per_disk=1):
+        """
+        Args:
+            cache_path: 缓存文件路径，None表示只在内存中缓存
+            chunk_size: 读取块大小
+            workers_per_disk: 每个磁盘的线程数（固态硬盘可以适当调大）
+        """
+        self.cache_path = cache_path
+        self.chunk_size = chunk_size
+        self.workers_per_disk = workers_per_disk
+        # {规范化绝对路径: [大小, 修改时间ns, sha256]}
+        self.cache = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        if cache_path:
+            self._load()
+
+    @classmethod
+    def for_library(cls, folder_path, **kwargs):
+        """在模型根目录下使用默认的缓存文件"""
+        return cls(os.path.join(folder_path, HASH_CACHE_NAME), **kwargs)
+
+    def _load(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == HASH_CACHE_VERSION:
+                self.cache = data.get("entries", {})
+        except Exception as e:
+            _log.warning(f"读取hash缓存 {self.cache_path} 失败: {e}")
+
+    def save(self):
+        """有新的计算结果时保存缓存（先写临时文件再替换）"""
+        if not self.cache_path or not self._dirty:
+            return
+        tmp_path = self.cache_path + ".tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": HASH_CACHE_VERSION, "entries": self.cache}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+            self._dirty = False
+
+    def get_cached(self, path, stat=None):
+        """
+        返回缓存中的SHA-256，文件大小或修改时间变化后视为无缓存
+
+        Returns:
+            sha256字符串，无缓存返回None
+        """
+        stat = stat or os.stat(path)
+        with self._lock:
+            entry = self.cache.get(_key(path))
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        return None
+
+    def hash_file(self, path):
+        """计算单个文件的SHA-256（优先使用缓存）"""
+        stat = os.stat(path)
+        sha256 = self.get_cached(path, stat)
+        if sha256 is None:
+            sha256 = sha256_file(path, self.chunk_size)
+            with self._lock:
+                self.cache[_key(path)] = [stat.st_size, stat.st_mtime_ns, sha256]
+                self._dirty = True
+        return sha256
+
+    __call__ = hash_file
+
+    def hash_files(self, paths, progress=None):
+        """
+        批量计算SHA-256：已缓存的直接返回，其余按磁盘分组并行计算
+
+        Args:
+            paths: 文件路径列表
+            progress: 每完成一个文件调用一次 progress(路径, sha256, 已完成数, 需计算总数)
+
+        Returns:
+            {路径: sha256}，读取失败的文件不包含在结果中
+        """
+        results = {}
+        pending = {}
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError as e:
+                _log.warning(f"无法读取文件 {path}: {e}")
+                continue
+            sha256 = self.get_cached(path, stat)
+            if sha256 is not None:
+                results[path] = sha256
+            else:
+                # 同一磁盘的文件放在同一队列
+                pending.setdefault(stat.st_dev, []).append(path)
+
+        total = sum(len(group) for group in pending.values())
+        if not total:
+            return results
+
+        done = 0
+        done_lock = threading.Lock()
+
+        def run_queue(queue):
+            nonlocal done
+            while True:
+                with done_lock:
+                    if not queue:
+                        return
+                    path = queue.pop()
+                try:
+                    sha256 = self.hash_file(path)
+                except OSError as e:
+                    _log.warning(f"计算hash失败 {path}: {e}")
+                    continue
+                with done_lock:
+                    results[path] = sha256
+                    done += 1
+                    count = done
+                if progress:
+                    progress(path, sha256, count, total)
+
+        queues = []
+        for group in pending.values():
+            # 按路径倒序，pop时按路径顺序读取
+            group.sort(reverse=True)
+            queues.extend([group] * self.workers_per_disk)
+        with ThreadPoolExecutor(max_workers=len(queues)) as executor:
+            list(executor.map(run_queue, queues))
+        return results
@@ -0,0 +1,186 @@
+import os
+import json
+import logging
+
+_log = logging.getLogger(__name__)
+
+# 快照文件名，保存在模型根目录下
+SNAPSHOT_NAME = "model_snapshot.json"
+SNAPSHOT_VERSION = 1
+
+# 扫描时跳过的目录（备份目录等以#开头）
+SKIP_DIR_PREFIX = "#"
+
+
+def _key(rel_path):
+    # Windows下路径不区分大小写，统一规范化后作为索引键
+    return os.path.normcase(os.path.normpath(rel_path))
+
+
+class ModelSnapshot:
+    """
+    模型库文件快照：一次 os.scandir 遍历记录所有文件的 (相对路径, 大小, 修改时间, hash)
+    用于替代逐个文件的 os.path.exists，并与上一次快照对比找出新增、删除、重命名和修改的文件
+    """
+
+    def __init__(self, root, entries=None):
+        """
+        Args:
+            root: 模型根目录，如 E:\\models
+            entries: {相对路径: [大小, 修改时间ns, hash或None]}
+        """
+        self.root = os.path.abspath(root)
+        self.entries = {}
+        self._index = {}
+        for rel_path, entry in (entries or {}).items():
+            self._add(rel_path, entry)
+
+    def _add(self, rel_path, entry):
+        self.entries[rel_path] = entry
+        self._index[_key(rel_path)] = rel_path
+
+    def _pop(self, rel_path):
+        real = self._index.pop(_key(rel_path), None)
+        if real is None:
+            return None
+        return self.entries.pop(real)
+
+    def _rel(self, path):
+        # 相对路径按当前目录解析（与os.path.exists一致），如 --folder models 时的 models\\Lora\\x.safetensors
+        return os.path.relpath(os.path.abspath(path), self.root)
+
+    @classmethod
+    def scan(cls, root, subdirs=None, previous=None, hash_func=None, hash_exts=(".safetensors", ".ckpt", ".pt", ".pth")):
+        """
+        遍历模型库生成快照
+
+        Args:
+            root: 模型根目录
+            subdirs: 只扫描这些子目录（如工作表名），None表示扫描全部
+            previous: 上一次的快照，大小和修改时间未变化的文件直接沿用其hash
+            hash_func: 计算文件hash的函数，参数为文件路径；为None时不计算hash
+            hash_exts: 需要计算hash的文件后缀
+
+        Returns:
+            ModelSnapshot 实例
+        """
+        snapshot = cls(root)
+        stack = [os.path.join(snapshot.root, d) for d in subdirs] if subdirs else [snapshot.root]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not entry.name.startswith(SKIP_DIR_PREFIX):
+                                stack.append(entry.path)
+                            continue
+                        if not entry.is_file() or entry.name.startswith(SNAPSHOT_NAME):
+                            continue
+                        stat = entry.stat()
+                        rel_path = os.path.relpath(entry.path, snapshot.root)
+                        file_hash = None
+                        if previous is not None:
+                            old = previous.get(rel_path)
+                            if old and old[0] == stat.st_size and old[1] == stat.st_mtime_ns:
+                                file_hash = old[2]
+                        if file_hash is None and hash_func and entry.name.lower().endswith(hash_exts):
+                            file_hash = hash_func(entry.path)
+                        snapshot._add(rel_path, [stat.st_size, stat.st_mtime_ns, file_hash])
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                _log.warning(f"扫描目录 {current} 时出错: {e}")
+        return snapshot
+
+    def get(self, path):
+        """返回文件记录 [大小, 修改时间ns, hash]，不存在返回None"""
+        real = self._index.get(_key(self._rel(path)))
+        return self.entries.get(real) if real is not None else None
+
+    def exists(self, path):
+        """判断文件在快照中是否存在，参数可以是绝对路径或相对当前目录的路径"""
+        return _key(self._rel(path)) in self._index
+
+    def rename(self, old_path, new_path):
+        """文件被重命名/移动后同步更新快照"""
+        entry = self._pop(self._rel(old_path))
+        if entry is not None:
+            self._add(self._rel(new_path), entry)
+
+    def remove(self, path):
+        self._pop(self._rel(path))
+
+    def diff(self, previous):
+        """
+        与上一次快照对比
+
+        Args:
+            previous: 上一次的快照，None表示全部视为新增
+
+        Returns:
+            {"added": [...], "removed": [...], "modified": [...], "renamed": [(旧路径, 新路径), ...]}
+        """
+        if previous is None:
+            return {"added": sorted(self.entries), "removed": [], "modified": [], "renamed": []}
+
+        added = [p for k, p in self._index.items() if k not in previous._index]
+        removed = [p for k, p in previous._index.items() if k not in self._index]
+        modified = []
+        for k, p in self._index.items():
+            old_path = previous._index.get(k)
+            if old_path is None:
+                continue
+            new_entry = self.entries[p]
+            old_entry = previous.entries[old_path]
+            if new_entry[0] != old_entry[0] or new_entry[1] != old_entry[1]:
+                modified.append(p)
+
+        # 重命名/移动检测：hash一致，或大小和修改时间一致（os.rename不会改变修改时间）
+        def identity(entry):
+            return ("hash", entry[2]) if entry[2] else ("stat", entry[0], entry[1])
+
+        removed_by_identity = {}
+        for p in removed:
+            removed_by_identity.setdefault(identity(previous.entries[p]), []).append(p)
+        renamed = []
+        still_added = []
+        for p in added:
+            candidates = removed_by_identity.get(identity(self.entries[p]))
+            if candidates:
+                renamed.append((candidates.pop(0), p))
+            else:
+                still_added.append(p)
+        renamed_old = {old for old, _ in renamed}
+
+        return {
+            "added": sorted(still_added),
+            "removed": sorted(p for p in removed if p not in renamed_old),
+            "modified": sorted(modified),
+            "renamed": sorted(renamed),
+        }
+
+    def save(self, path=None):
+        """保存快照（先写临时文件再替换）"""
+        path = path or os.path.join(self.root, SNAPSHOT_NAME)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": SNAPSHOT_VERSION, "root": self.root, "entries": self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, root, path=None):
+        """读取上一次保存的快照，不存在或版本不一致时返回None"""
+        path = path or os.path.join(os.path.abspath(root), SNAPSHOT_NAME)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != SNAPSHOT_VERSION:
+                return None
+            return cls(root, data.get("entries"))
+        except Exception as e:
+            _log.warning(f"读取快照 {path} 失败: {e}")
+            return None
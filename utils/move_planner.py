@@ -0,0 +1,291 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_log = logging.getLogger(__name__)
+
+
+def _key(path):
+    return os.path.normcase(os.path.normpath(path))
+
+
+class MovePlanner:
+    """
+    批量重命名/移动计划
+    先收集全部移动操作，检查冲突后再执行；执行过程写入日志(journal)，可据此回滚或续做，
+    并在全部成功后按日志把对应的表格行更新写回工作簿
+    """
+
+    def __init__(self, exists=os.path.exists):
+        """
+        Args:
+            exists: 判断文件是否存在的函数（可传入快照的exists以避免访问磁盘）
+        """
+        self.exists = exists
+        self.ops = []
+        # 每个分组（通常是表格中的一行）对应的单元格更新 {分组: (工作表名, 行号, {列号: 值})}
+        self.row_updates = {}
+
+    def add_move(self, src, dst, group=None):
+        """添加一个移动操作，src与dst相同时忽略"""
+        if _key(src) == _key(dst):
+            return
+        self.ops.append({"id": len(self.ops), "src": src, "dst": dst, "group": group, "tmp": None})
+
+    def set_row_update(self, group, sheet, row, values):
+        """记录分组成功后需要写回工作簿的单元格值 {列号(从1开始): 值}"""
+        self.row_updates[group] = (sheet, row, values)
+
+    def validate(self):
+        """
+        检查冲突：重复的源文件、多个操作移动到同一目标、目标文件已存在且不会被移走
+
+        Returns:
+            [(分组, 冲突说明), ...]
+        """
+        conflicts = []
+        sources = {}
+        targets = {}
+        for op in self.ops:
+            src_key, dst_key = _key(op["src"]), _key(op["dst"])
+            if src_key in sources:
+                conflicts.append((op["group"], f"源文件重复: {op['src']}"))
+            sources.setdefault(src_key, op)
+            if dst_key in targets:
+                conflicts.append((op["group"], f"目标冲突: {op['dst']}"))
+                conflicts.append((targets[dst_key]["group"], f"目标冲突: {op['dst']}"))
+            targets.setdefault(dst_key, op)
+        for op in self.ops:
+            dst_key = _key(op["dst"])
+            if dst_key not in sources and self.exists(op["dst"]):
+                conflicts.append((op["group"], f"目标文件已存在: {op['dst']}"))
+        return conflicts
+
+    def drop_groups(self, groups):
+        """移除指定分组的全部操作和表格更新"""
+        groups = set(groups)
+        self.ops = [op for op in self.ops if op["group"] not in groups]
+        for i, op in enumerate(self.ops):
+            op["id"] = i
+        for group in groups:
+            self.row_updates.pop(group, None)
+
+    def resolve_conflicts(self):
+        """
+        反复检查冲突并移除冲突的分组，直到没有冲突为止
+        （移除一个分组后，它原本要移走的文件会留在原处，可能让其他操作的目标变为已存在）
+
+        Returns:
+            全部被移除的 [(分组, 冲突说明), ...]
+        """
+        dropped = []
+        while True:
+            conflicts = self.validate()
+            if not conflicts:
+                return dropped
+            dropped.extend(conflicts)
+            self.drop_groups(group for group, _ in conflicts)
+
+    def _prepare_waves(self):
+        """
+        生成执行批次：
+        第一批把"会被其他操作占用为目标"的源文件先移到同目录的临时名，解决链式和循环重命名；
+        第二批把所有文件移到最终位置。每批内部互不依赖，可以并行执行
+        """
+        targets = {_key(op["dst"]) for op in self.ops}
+        first_wave = []
+        second_wave = []
+        for op in self.ops:
+            if _key(op["src"]) in targets:
+                directory = os.path.dirname(op["src"])
+                op["tmp"] = os.path.join(directory, f".move_{uuid.uuid4().hex[:12]}.tmp")
+                first_wave.append((op, op["src"], op["tmp"]))
+                second_wave.append((op, op["tmp"], op["dst"]))
+            else:
+                second_wave.append((op, op["src"], op["dst"]))
+        return [wave for wave in (first_wave, second_wave) if wave]
+
+    def execute(self, journal_path, max_workers=8, rollback_on_error=True):
+        """
+        执行计划：按源目录分组并行执行，每完成一次移动就写入日志
+
+        Args:
+            journal_path: 日志文件路径（JSON Lines）
+            max_workers: 并行线程数
+            rollback_on_error: 出错时是否按日志回滚已完成的移动
+
+        Returns:
+            {"success": bool, "moved": 完成的移动次数, "planned": 计划操作数, "elapsed": 秒, "error": 错误信息}
+        """
+        start_time = time.perf_counter()
+        waves = self._prepare_waves()
+        os.makedirs(os.path.dirname(os.path.abspath(journal_path)), exist_ok=True)
+        lock = threading.Lock()
+        failed = threading.Event()
+        errors = []
+        moved = 0
+
+        with open(journal_path, "w", encoding="utf-8") as journal:
+            def write(record):
+                journal.write(json.dumps(record, ensure_ascii=False) + "\n")
+                journal.flush()
+
+            write({
+                "type": "plan",
+                "ops": self.ops,
+                "row_updates": [[sheet, row, {str(col): value for col, value in values.items()}]
+                                for sheet, row, values in self.row_updates.values()],
+            })
+
+            def run_group(steps):
+                nonlocal moved
+                for op, src, dst in steps:
+                    if failed.is_set():
+                        return
+                    try:
+                        # 目标此时仍存在说明没有被计划中的操作移走，拒绝覆盖（os.rename在非Windows系统上会直接覆盖）
+                        if os.path.exists(dst):
+                            raise FileExistsError(f"目标文件已存在: {dst}")
+                        os.makedirs(os.path.dirname(dst), exist_ok=True)
+                        os.rename(src, dst)
+                    except Exception as e:
+                        with lock:
+                            errors.append(f"{src} -> {dst}: {e}")
+                        failed.set()
+                        return
+                    with lock:
+                        write({"type": "step", "id": op["id"], "from": src, "to": dst})
+                        moved += 1
+
+            for wave in waves:
+                groups = {}
+                for step in wave:
+                    groups.setdefault(_key(os.path.dirname(step[1])), []).append(step)
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    list(executor.map(run_group, groups.values()))
+                if failed.is_set():
+                    break
+
+            if failed.is_set():
+                write({"type": "failed", "errors": errors})
+            else:
+                write({"type": "commit"})
+
+        result = {
+            "success": not failed.is_set(),
+            "moved": moved,
+            "planned": len(self.ops),
+            "elapsed": time.perf_counter() - start_time,
+            "error": "; ".join(errors) if errors else None,
+        }
+        if failed.is_set() and rollback_on_error:
+            _log.warning(f"移动过程中出错，开始回滚: {result['error']}")
+            rollback_journal(journal_path)
+        return result
+
+
+def read_journal(journal_path):
+    """
+    读取日志
+
+    Returns:
+        (计划记录, 已完成的步骤列表, 结束状态: "commit"/"failed"/"rollback"/None)
+    """
+    plan = None
+    steps = []
+    status = None
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 中途崩溃时最后一行可能不完整
+                break
+            if record["type"] == "plan":
+                plan = record
+            elif record["type"] == "step":
+                steps.append(record)
+            else:
+                status = record["type"]
+    return plan, steps, status
+
+
+def rollback_journal(journal_path):
+    """
+    按日志倒序撤销已完成的移动
+
+    Returns:
+        撤销的移动次数
+    """
+    _, steps, status = read_journal(journal_path)
+    if status == "rollback":
+        return 0
+    undone = 0
+    for step in reversed(steps):
+        if os.path.exists(step["to"]) and not os.path.exists(step["from"]):
+            os.rename(step["to"], step["from"])
+            undone += 1
+    with open(journal_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"type": "rollback", "undone": undone}, ensure_ascii=False) + "\n")
+    return undone
+
+
+def replay_journal(journal_path):
+    """
+    按日志续做未完成的移动（程序中途退出后使用），完成后日志标记为commit
+
+    Returns:
+        续做的移动次数
+    """
+    plan, steps, status = read_journal(journal_path)
+    if plan is None or status in ("commit", "rollback"):
+        return 0
+    # 每个操作当前所在位置
+    location = {op["id"]: op["src"] for op in plan["ops"]}
+    for step in steps:
+        location[step["id"]] = step["to"]
+    done = 0
+    with open(journal_path, "a", encoding="utf-8") as f:
+        def move(op, target):
+            nonlocal done
+            current = location[op["id"]]
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.rename(current, target)
+            location[op["id"]] = target
+            f.write(json.dumps({"type": "step", "id": op["id"], "from": current, "to": target}, ensure_ascii=False) + "\n")
+            f.flush()
+            done += 1
+
+        # 先把需要让位的源文件移到临时名，再把所有文件移到最终位置
+        for op in plan["ops"]:
+            if op["tmp"] and _key(location[op["id"]]) == _key(op["src"]):
+                move(op, op["tmp"])
+        for op in plan["ops"]:
+            if _key(location[op["id"]]) != _key(op["dst"]):
+                move(op, op["dst"])
+        f.write(json.dumps({"type": "commit"}) + "\n")
+    return done
+
+
+def apply_journal_to_workbook(wb, journal_path):
+    """
+    日志状态为commit时，把计划中的表格行更新写回工作簿
+
+    Returns:
+        更新的行数，日志未提交时返回0
+    """
+    plan, _, status = read_journal(journal_path)
+    if plan is None or status != "commit":
+        return 0
+    for sheet, row, values in plan["row_updates"]:
+        ws = wb[sheet]
+        for col, value in values.items():
+            ws.cell(row=row, column=int(col)).value = value
+    return len(plan["row_updates"])
@@ -0,0 +1,222 @@
+import os
+import json
+import html
+import hashlib
+import logging
+import pathlib
+import threading
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+
+_log = logging.getLogger(__name__)
+
+# 预览目录，以#开头，文件快照扫描时会跳过
+PREVIEW_DIR = "#preview"
+MANIFEST_NAME = "preview_manifest.json"
+MANIFEST_VERSION = 1
+
+# 缩略图高度（像素）
+THUMB_HEIGHT = 256
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<title>模型预览</title>
+<style>
+body {{ font-family: sans-serif; margin: 16px; background: #f4f4f4; }}
+nav a {{ margin-right: 12px; }}
+h2 {{ margin-top: 32px; }}
+.grid {{ display: flex; flex-wrap: wrap; gap: 12px; }}
+.card {{ width: 220px; background: #fff; border-radius: 6px; padding: 8px; box-shadow: 0 1px 3px rgba(0,0,0,.15); font-size: 12px; word-break: break-all; }}
+.card:target {{ outline: 3px solid #1e88e5; }}
+.card img {{ display: block; max-width: 100%; height: auto; margin-bottom: 4px; }}
+.extra img {{ display: inline-block; width: 64px; }}
+.name {{ font-weight: bold; }}
+.muted {{ color: #777; }}
+</style>
+</head>
+<body>
+<nav>{nav}</nav>
+{sections}
+</body>
+</html>
+"""
+
+
+def anchor(sheet, name):
+    """模型在预览页中的锚点"""
+    return quote(f"{sheet}/{name}", safe="")
+
+
+class PreviewGallery:
+    """
+    静态HTML模型预览：把预览图压缩为缩略图并生成一个网页，表格中只保存指向网页锚点的超链接，
+    不再把图片嵌入model_info.xlsx。缩略图按源图片的 (大小, 修改时间) 增量生成
+    """
+
+    def __init__(self, root, thumb_height=THUMB_HEIGHT):
+        """
+        Args:
+            root: 模型根目录，预览文件生成在其下的 #preview 文件夹
+            thumb_height: 缩略图高度
+        """
+        self.root = os.path.abspath(root)
+        self.preview_dir = os.path.join(self.root, PREVIEW_DIR)
+        self.thumb_dir = os.path.join(self.preview_dir, "thumbs")
+        self.html_path = os.path.join(self.preview_dir, "index.html")
+        self.manifest_path = os.path.join(self.preview_dir, MANIFEST_NAME)
+        self.thumb_height = thumb_height
+        # {源图片规范化路径: [大小, 修改时间ns, 缩略图文件名]}
+        self.manifest = self._load_manifest()
+        self._lock = threading.Lock()
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION and data.get("thumb_height") == self.thumb_height:
+                return data.get("entries", {})
+        except Exception as e:
+            _log.warning(f"读取预览清单失败，将重新生成缩略图: {e}")
+        return {}
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "thumb_height": self.thumb_height, "entries": self.manifest},
+                      f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def link(self, sheet, name):
+        """表格中使用的超链接（绝对file地址，#preview中的#会被转义）"""
+        return f"{pathlib.Path(self.html_path).as_uri()}#{anchor(sheet, name)}"
+
+    def _make_thumb(self, src, thumb_path):
+        from PIL import Image as PILImage
+
+        with PILImage.open(src) as img:
+            img = img.convert("RGB")
+            width, height = img.size
+            if height > self.thumb_height:
+                img = img.resize((max(int(width * self.thumb_height / height), 1), self.thumb_height),
+                                 PILImage.Resampling.LANCZOS)
+            tmp_path = thumb_path + ".tmp"
+            img.save(tmp_path, format="JPEG", quality=85)
+        os.replace(tmp_path, thumb_path)
+
+    def _thumb(self, src, signature):
+        """
+        返回缩略图文件名，源图片未变化时直接复用
+
+        Returns:
+            (缩略图文件名或None, 是否重新生成)
+        """
+        key = os.path.normcase(os.path.abspath(src))
+        with self._lock:
+            entry = self.manifest.get(key)
+        thumb_name = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16] + ".jpg"
+        thumb_path = os.path.join(self.thumb_dir, thumb_name)
+        if entry and entry[:2] == list(signature) and os.path.exists(thumb_path):
+            return thumb_name, False
+        try:
+            self._make_thumb(src, thumb_path)
+        except Exception as e:
+            _log.warning(f"生成缩略图失败 {src}: {e}")
+            return None, False
+        with self._lock:
+            self.manifest[key] = [signature[0], signature[1], thumb_name]
+        return thumb_name, True
+
+    def build(self, items, signature=None, max_workers=8):
+        """
+        生成缩略图和预览网页
+
+        Args:
+            items: [{"sheet", "name", "folder", "images": [图片路径...], "url", "trigger_words", "notes"}, ...]
+            signature: 获取图片 (大小, 修改时间ns) 的函数，不存在时返回None；默认使用os.stat
+            max_workers: 生成缩略图的线程数
+
+        Returns:
+            {"images": 图片数, "generated": 重新生成数, "removed": 删除的过期缩略图数, "html_changed": bool}
+        """
+        os.makedirs(self.thumb_dir, exist_ok=True)
+
+        def stat_signature(path):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return None
+            return stat.st_size, stat.st_mtime_ns
+        signature = signature or stat_signature
+
+        sources = []
+        for item in items:
+            for src in item["images"]:
+                sig = signature(src)
+                if sig is not None:
+                    sources.append((src, sig))
+        sources = list(dict(sources).items())
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = dict(zip([src for src, _ in sources], executor.map(lambda args: self._thumb(*args), sources)))
+        generated = sum(1 for _, regenerated in results.values() if regenerated)
+
+        # 删除不再使用的缩略图
+        used = {os.path.normcase(os.path.abspath(src)) for src, _ in sources}
+        removed = 0
+        for key in [key for key in self.manifest if key not in used]:
+            thumb_path = os.path.join(self.thumb_dir, self.manifest.pop(key)[2])
+            if os.path.exists(thumb_path):
+                os.remove(thumb_path)
+                removed += 1
+
+        content = self._render(items, {src: thumb for src, (thumb, _) in results.items() if thumb})
+        html_changed = self._write_if_changed(self.html_path, content.encode("utf-8"))
+        self._save_manifest()
+        return {"images": len(sources), "generated": generated, "removed": removed, "html_changed": html_changed}
+
+    def _render(self, items, thumbs):
+        sections = {}
+        for item in items:
+            sections.setdefault(item["sheet"], []).append(item)
+        nav = " ".join(f'<a href="#sheet-{quote(sheet, safe="")}">{html.escape(sheet)} ({len(cards)})</a>'
+                       for sheet, cards in sections.items())
+        parts = []
+        for sheet, cards in sections.items():
+            parts.append(f'<h2 id="sheet-{quote(sheet, safe="")}">{html.escape(sheet)}</h2>\n<div class="grid">')
+            for item in cards:
+                images = [thumbs[src] for src in item["images"] if src in thumbs]
+                lines = [f'<div class="card" id="{anchor(sheet, item["name"])}">']
+                if images:
+                    lines.append(f'<img loading="lazy" src="thumbs/{images[0]}" alt="">')
+                    if len(images) > 1:
+                        lines.append('<div class="extra">' + "".join(
+                            f'<img loading="lazy" src="thumbs/{thumb}" alt="">' for thumb in images[1:]) + '</div>')
+                lines.append(f'<div class="name">{html.escape(str(item["name"]))}</div>')
+                if item.get("folder"):
+                    lines.append(f'<div class="muted">{html.escape(str(item["folder"]))}</div>')
+                if item.get("trigger_words"):
+                    lines.append(f'<div>{html.escape(str(item["trigger_words"]))}</div>')
+                if item.get("notes"):
+                    lines.append(f'<div class="muted">{html.escape(str(item["notes"]))}</div>')
+                if item.get("url"):
+                    lines.append(f'<a href="{html.escape(str(item["url"]), quote=True)}" target="_blank">🌐</a>')
+                lines.append('</div>')
+                parts.append("\n".join(lines))
+            parts.append('</div>')
+        return PAGE_TEMPLATE.format(nav=nav, sections="\n".join(parts))
+
+    @staticmethod
+    def _write_if_changed(path, content):
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                if f.read() == content:
+                    return False
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        return True
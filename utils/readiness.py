@@ -0,0 +1,88 @@
+import time
+import random
+import socket
+import logging
+import urllib.error
+import urllib.request
+
+_log = logging.getLogger(__name__)
+
+
+def backoff_delays(initial=0.25, factor=2.0, max_delay=5.0, jitter=0.5, rng=random):
+    """
+    指数退避的等待间隔：initial, initial*factor, ... 不超过max_delay，
+    每个间隔随机缩短最多jitter比例，避免多个等待方同时重试
+
+    Returns:
+        无限生成器
+    """
+    delay = initial
+    while True:
+        yield delay * (1 - jitter * rng.random())
+        delay = min(delay * factor, max_delay)
+
+
+def wait_until(check, timeout=60.0, name=None, initial=0.25, factor=2.0, max_delay=5.0, jitter=0.5,
+               sleep=time.sleep, clock=time.monotonic):
+    """
+    以指数退避反复调用check直到返回真值或超过总时限，check抛出的异常视为尚未就绪
+
+    Args:
+        check: 无参数的检查函数
+        timeout: 总时限（秒），最后一次等待会截短到时限为止
+        name: 日志中显示的等待对象名称
+        sleep, clock: 等待和计时函数（测试时可替换）
+
+    Returns:
+        (是否就绪, 实际等待秒数)
+    """
+    start = clock()
+    deadline = start + timeout
+    attempts = 0
+    delays = backoff_delays(initial, factor, max_delay, jitter)
+    while True:
+        attempts += 1
+        try:
+            ready = check()
+        except Exception as e:
+            _log.debug(f"等待{name or '就绪'}: 第{attempts}次检查出错: {e}")
+            ready = False
+        elapsed = clock() - start
+        if ready:
+            if name:
+                _log.info(f"{name}已就绪，等待 {elapsed:.1f} 秒，检查 {attempts} 次")
+            return True, elapsed
+        remaining = deadline - clock()
+        if remaining <= 0:
+            if name:
+                _log.warning(f"等待{name}超时，已等待 {elapsed:.1f} 秒，检查 {attempts} 次")
+            return False, elapsed
+        sleep(min(next(delays), remaining))
+
+
+def port_open(host, port, timeout=2.0):
+    """TCP端口能否连接"""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def http_ok(url, timeout=2.0):
+    """HTTP请求是否返回2xx/3xx状态"""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return 200 <= response.status < 400
+    except (urllib.error.URLError, OSError, ValueError):
+        return False
+
+
+def wait_for_port(host, port, timeout=60.0, name=None, **kwargs):
+    """等待TCP端口可以连接，返回 (是否就绪, 等待秒数)"""
+    return wait_until(lambda: port_open(host, port), timeout=timeout, name=name or f"{host}:{port}", **kwargs)
+
+
+def wait_for_http(url, timeout=60.0, name=None, **kwargs):
+    """等待HTTP地址返回正常状态（比端口检查更可靠：服务可能先监听端口、稍后才能处理请求），返回 (是否就绪, 等待秒数)"""
+    return wait_until(lambda: http_ok(url), timeout=timeout, name=name or url, **kwargs)
@@ -0,0 +1,159 @@
+import os
+import re
+import json
+import mmap
+import struct
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+_log = logging.getLogger(__name__)
+
+# 头部长度上限，超过视为文件损坏（正常模型的头部通常只有几十KB到几MB）
+MAX_HEADER_SIZE = 100 * 1024 * 1024
+
+# ss_base_model_version / modelspec.architecture 中的关键字 -> 底模类型（与模型json中sd version的取值一致）
+BASE_MODEL_KEYWORDS = [
+    ("flux", "Flux"),
+    ("sd3", "SD3"),
+    ("sdxl", "SDXL"),
+    ("stable-diffusion-xl", "SDXL"),
+    ("sd_v2", "SD2"),
+    ("stable-diffusion-v2", "SD2"),
+    ("sd_v1", "SD1"),
+    ("stable-diffusion-v1", "SD1"),
+]
+
+
+def read_header(path):
+    """
+    读取 .safetensors 文件头：只映射文件并解析开头8字节的长度和其后的JSON头，不读取张量数据
+
+    Returns:
+        头部字典（张量名 -> {dtype, shape, data_offsets}，以及可选的 __metadata__）
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < 8:
+            raise ValueError(f"文件过小，不是有效的safetensors文件: {path}")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            (header_size,) = struct.unpack("<Q", mm[:8])
+            if header_size > MAX_HEADER_SIZE or 8 + header_size > size:
+                raise ValueError(f"头部长度异常({header_size})，文件可能已损坏: {path}")
+            return json.loads(mm[8:8 + header_size])
+
+
+def read_metadata(path):
+    """返回 __metadata__ 字典（值均为字符串），没有时返回空字典"""
+    return read_header(path).get("__metadata__") or {}
+
+
+def _parse_json_value(value, default=None):
+    # kohya 把 ss_tag_frequency 等嵌套结构序列化成字符串保存
+    if not isinstance(value, str):
+        return value if value is not None else default
+    try:
+        return json.loads(value)
+    except ValueError:
+        return default
+
+
+def detect_base_model(header):
+    """
+    推断底模类型：优先使用元数据，没有元数据时按张量名特征判断
+
+    Returns:
+        "SD1" / "SD2" / "SDXL" / "SD3" / "Flux"，无法判断返回""
+    """
+    metadata = header.get("__metadata__") or {}
+    for key in ("modelspec.architecture", "ss_base_model_version"):
+        value = str(metadata.get(key, "")).lower()
+        for keyword, base_model in BASE_MODEL_KEYWORDS:
+            if keyword in value:
+                return base_model
+    if metadata.get("ss_v2") == "True":
+        return "SD2"
+
+    names = [name for name in header if name != "__metadata__"]
+    if any("double_blocks" in name or "single_blocks" in name for name in names):
+        return "Flux"
+    if any("joint_blocks" in name for name in names):
+        return "SD3"
+    if any(name.startswith("lora_te2_") or "conditioner.embedders.1" in name for name in names):
+        return "SDXL"
+    if any(name.startswith("lora_te_") or "cond_stage_model.transformer" in name for name in names):
+        return "SD1"
+    return ""
+
+
+def top_tags(metadata, limit=10):
+    """
+    按 ss_tag_frequency 统计训练集中出现次数最多的标签
+
+    Returns:
+        [(标签, 次数), ...]
+    """
+    frequency = _parse_json_value(metadata.get("ss_tag_frequency"), {}) or {}
+    counts = {}
+    for tags in frequency.values():
+        if not isinstance(tags, dict):
+            continue
+        for tag, count in tags.items():
+            tag = tag.strip()
+            if tag:
+                counts[tag] = counts.get(tag, 0) + int(count)
+    return sorted(counts.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+def dataset_names(metadata):
+    """
+    从 ss_tag_frequency 的数据集目录名（如"10_marie rose"）中去掉重复次数前缀，得到训练时的触发词/类别词
+    """
+    frequency = _parse_json_value(metadata.get("ss_tag_frequency"), {}) or {}
+    names = []
+    for folder in frequency:
+        name = re.sub(r"^\d+_", "", str(folder)).strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def summarize(header):
+    """
+    提取表格需要的模型信息
+
+    Returns:
+        {"base_model", "trigger_words", "network_dim", "network_alpha", "network_module",
+         "output_name", "training_comment", "top_tags"}
+    """
+    metadata = header.get("__metadata__") or {}
+    tags = top_tags(metadata)
+    # 优先使用训练时写入的触发词，其次按kohya数据集目录名"重复次数_触发词"取触发词
+    trigger_words = metadata.get("modelspec.trigger_phrase") or ", ".join(dataset_names(metadata))
+    return {
+        "base_model": detect_base_model(header),
+        "trigger_words": trigger_words,
+        "network_dim": metadata.get("ss_network_dim", ""),
+        "network_alpha": metadata.get("ss_network_alpha", ""),
+        "network_module": metadata.get("ss_network_module", ""),
+        "output_name": metadata.get("ss_output_name", ""),
+        "training_comment": metadata.get("ss_training_comment", ""),
+        "top_tags": [tag for tag, _ in tags],
+    }
+
+
+def read_summaries(paths, max_workers=8):
+    """
+    并行读取多个模型的头部信息
+
+    Returns:
+        {路径: summarize结果}，读取失败的文件不包含在结果中
+    """
+    def read(path):
+        try:
+            return path, summarize(read_header(path))
+        except Exception as e:
+            _log.warning(f"读取safetensors头部失败 {path}: {e}")
+            return path, None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return {path: summary for path, summary in executor.map(read, paths) if summary is not None}
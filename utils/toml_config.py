@@ -0,0 +1,177 @@
+import os
+import copy
+import math
+import tomllib
+import logging
+import threading
+
+_log = logging.getLogger(__name__)
+
+# 模板解析缓存 {绝对路径: ((mtime_ns, size), 数据)}
+_lock = threading.Lock()
+_template_cache = {}
+
+
+def load_toml(path):
+    """
+    解析toml文件，按文件修改时间缓存解析结果，返回的是副本，可以直接修改
+
+    Returns:
+        字典
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        cached = _template_cache.get(path)
+    if cached is None or cached[0] != signature:
+        with open(path, "rb") as f:
+            data = tomllib.load(f)
+        cached = (signature, data)
+        with _lock:
+            _template_cache[path] = cached
+    return copy.deepcopy(cached[1])
+
+
+def _format_string(value):
+    escapes = {"\\": "\\\\", "\"": "\\\"", "\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+    chars = []
+    for char in value:
+        if char in escapes:
+            chars.append(escapes[char])
+        elif ord(char) < 0x20 or ord(char) == 0x7f:
+            chars.append(f"\\u{ord(char):04x}")
+        else:
+            chars.append(char)
+    return "\"" + "".join(chars) + "\""
+
+
+def _format_key(key):
+    key = str(key)
+    if key and all(char.isascii() and (char.isalnum() or char in "-_") for char in key):
+        return key
+    return _format_string(key)
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "nan"
+        if math.isinf(value):
+            return "inf" if value > 0 else "-inf"
+        return repr(value)
+    if isinstance(value, str):
+        return _format_string(value)
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(_format_value(item) for item in value) + "]"
+    if isinstance(value, dict):
+        return "{ " + ", ".join(f"{_format_key(k)} = {_format_value(v)}" for k, v in value.items()) + " }"
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"不支持写入toml的值类型: {type(value).__name__}")
+
+
+def dumps(data):
+    """
+    将字典序列化为toml文本：顶层键值在前，嵌套字典输出为 [表]
+
+    Returns:
+        toml文本
+    """
+    lines = []
+
+    def write_table(table, prefix):
+        scalars = [(k, v) for k, v in table.items() if not isinstance(v, dict)]
+        tables = [(k, v) for k, v in table.items() if isinstance(v, dict)]
+        if prefix and (scalars or not tables):
+            if lines:
+                lines.append("")
+            lines.append("[" + ".".join(_format_key(k) for k in prefix) + "]")
+        for key, value in scalars:
+            lines.append(f"{_format_key(key)} = {_format_value(value)}")
+        for key, value in tables:
+            write_table(value, prefix + [key])
+
+    write_table(data, [])
+    return "\n".join(lines) + "\n"
+
+
+def coerce_value(value, like):
+    """
+    按模板中原值的类型转换表格中填写的值（表格中的数字、布尔值常被保存为文本）
+
+    Args:
+        value: 表格中的值
+        like: 模板中的原值，None表示模板中没有该参数
+
+    Returns:
+        转换后的值，无法转换时原样返回
+    """
+    if isinstance(value, str):
+        text = value.strip()
+        if isinstance(like, bool) or (like is None and text.lower() in ("true", "false")):
+            if text.lower() in ("true", "1", "是"):
+                return True
+            if text.lower() in ("false", "0", "否"):
+                return False
+            return value
+        if isinstance(like, int) and not isinstance(like, bool):
+            try:
+                return int(text)
+            except ValueError:
+                pass
+        if isinstance(like, (int, float)) and not isinstance(like, bool):
+            try:
+                return float(text)
+            except ValueError:
+                return value
+        return value
+    if isinstance(like, bool) and isinstance(value, (int, float)):
+        return bool(value)
+    if isinstance(like, float) and isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(like, str) and isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return value
+
+
+def build_config(template_path, overrides):
+    """
+    以模板为基础应用覆盖参数，不修改模板文件
+
+    Args:
+        template_path: 模板toml路径
+        overrides: {参数名: 值}，参数名可以用"."表示嵌套表中的参数
+
+    Returns:
+        新的配置字典
+    """
+    config = load_toml(template_path)
+    for name, value in overrides.items():
+        table = config
+        keys = str(name).split(".")
+        for key in keys[:-1]:
+            table = table.setdefault(key, {})
+        table[keys[-1]] = coerce_value(value, table.get(keys[-1]))
+    return config
+
+
+def write_toml(path, data):
+    """
+    写入toml文件（先写临时文件再替换），写入后重新解析一次确认格式正确
+
+    Returns:
+        文件路径
+    """
+    content = dumps(data)
+    tomllib.loads(content)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return path
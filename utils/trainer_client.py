@@ -0,0 +1,106 @@
+import json
+import logging
+import urllib.error
+import urllib.request
+
+from .readiness import wait_until
+
+_log = logging.getLogger(__name__)
+
+# 训练服务器（F:\LoraTrain 的网页界面）默认地址
+DEFAULT_BASE_URL = "http://127.0.0.1:28000"
+
+# 任务状态（与训练服务器返回的一致）
+TASK_RUNNING = "RUNNING"
+TASK_FINISHED_STATES = ("FINISHED", "TERMINATED")
+
+
+class TrainerApiError(Exception):
+    """训练服务器接口请求失败或返回失败状态"""
+
+
+class TrainerClient:
+    """
+    直接调用训练服务器的HTTP接口：提交训练配置（与网页上"开始训练"发送的请求相同）并查询任务状态，
+    不需要启动浏览器
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, timeout=10):
+        """
+        Args:
+            base_url: 训练服务器地址
+            timeout: 单次请求超时（秒）
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method, path, payload=None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(f"{self.base_url}{path}", data=data, method=method,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = json.loads(response.read().decode("utf-8") or "{}")
+        except urllib.error.HTTPError as e:
+            raise TrainerApiError(f"{method} {path} 返回HTTP {e.code}") from e
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            raise TrainerApiError(f"{method} {path} 请求失败: {e}") from e
+        if body.get("status") not in (None, "success"):
+            raise TrainerApiError(f"{method} {path} 失败: {body.get('message') or body}")
+        return body
+
+    def tasks(self):
+        """
+        Returns:
+            [{"id", "status"}, ...]
+        """
+        body = self._request("GET", "/api/tasks")
+        return (body.get("data") or {}).get("tasks", [])
+
+    def available(self):
+        """训练服务器的接口是否可以访问"""
+        try:
+            self.tasks()
+            return True
+        except TrainerApiError:
+            return False
+
+    def task_status(self, task_id):
+        """返回任务状态，任务不存在时返回None"""
+        for task in self.tasks():
+            if task.get("id") == task_id:
+                return task.get("status")
+        return None
+
+    def submit(self, config, start_timeout=30):
+        """
+        提交训练配置并等待服务器创建新的训练任务
+
+        Args:
+            config: 训练配置字典（与项目toml内容相同，需包含model_train_type）
+            start_timeout: 等待新任务出现的时间（秒）
+
+        Returns:
+            新任务的id，服务器没有返回任务列表时返回None
+        """
+        known = {task.get("id") for task in self.tasks()}
+        body = self._request("POST", "/api/run", config)
+        _log.info(f"训练配置已提交: {body.get('message') or 'success'}")
+
+        new_task = {}
+
+        def task_created():
+            for task in self.tasks():
+                if task.get("id") not in known:
+                    new_task.update(task)
+                    return True
+            return False
+
+        ready, waited = wait_until(task_created, timeout=start_timeout, name="训练任务")
+        if not ready:
+            _log.warning(f"提交后 {waited:.1f} 秒内没有出现新的训练任务")
+            return None
+        return new_task.get("id")
+
+    def terminate(self, task_id):
+        self._request("GET", f"/api/tasks/terminate/{task_id}")
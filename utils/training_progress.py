@@ -0,0 +1,350 @@
+import os
+import re
+import time
+import struct
+import logging
+from collections import deque
+
+_log = logging.getLogger(__name__)
+
+# TensorBoard 事件文件名前缀
+EVENT_FILE_PREFIX = "events.out.tfevents."
+
+# kohya 控制台进度条，如 "steps:  12%|█▏   | 120/1000 [01:23<10:12,  1.44it/s, avr_loss=0.123]"
+STEPS_PATTERN = re.compile(
+    r"steps:\s*\d+%\|[^|]*\|\s*(\d+)/(\d+)\s*\[[^\]]*?([\d.]+)\s*(it/s|s/it)(?:,\s*avr_loss=([-\d.eE+]+))?")
+EPOCH_PATTERN = re.compile(r"epoch\s+(\d+)/(\d+)", re.IGNORECASE)
+
+# 表示当前损失的标签（按优先级）
+LOSS_TAGS = ("loss/current", "loss/average", "avr_loss", "loss")
+EPOCH_TAGS = ("loss/epoch", "epoch")
+
+
+def _read_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _iter_fields(data):
+    """
+    最小的protobuf解码：依次返回 (字段号, 线路类型, 值)，长度分隔类型的值为bytes
+    """
+    pos = 0
+    end = len(data)
+    while pos < end:
+        key, pos = _read_varint(data, pos)
+        number, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = _read_varint(data, pos)
+        elif wire_type == 1:
+            value = data[pos:pos + 8]
+            pos += 8
+        elif wire_type == 2:
+            length, pos = _read_varint(data, pos)
+            value = data[pos:pos + length]
+            pos += length
+        elif wire_type == 5:
+            value = data[pos:pos + 4]
+            pos += 4
+        else:
+            raise ValueError(f"不支持的protobuf线路类型: {wire_type}")
+        yield number, wire_type, value
+
+
+def _parse_summary_value(data):
+    tag = None
+    value = None
+    for number, wire_type, field in _iter_fields(data):
+        if number == 1 and wire_type == 2:
+            tag = field.decode("utf-8", "replace")
+        elif number == 2 and wire_type == 5:
+            value = struct.unpack("<f", field)[0]
+        elif number == 8 and wire_type == 2:
+            # 新版写入方式：标量保存在TensorProto的float_val/double_val中
+            for tensor_number, tensor_wire, tensor_field in _iter_fields(field):
+                if tensor_number == 5 and tensor_wire == 5:
+                    value = struct.unpack("<f", tensor_field)[0]
+                elif tensor_number == 5 and tensor_wire == 2 and len(tensor_field) >= 4:
+                    value = struct.unpack("<f", tensor_field[:4])[0]
+                elif tensor_number == 6 and tensor_wire == 1:
+                    value = struct.unpack("<d", tensor_field)[0]
+                elif tensor_number == 6 and tensor_wire == 2 and len(tensor_field) >= 8:
+                    value = struct.unpack("<d", tensor_field[:8])[0]
+    return tag, value
+
+
+def parse_event(data):
+    """
+    解析一条TensorBoard Event记录
+
+    Returns:
+        (时间戳, step, [(标签, 数值), ...])
+    """
+    wall_time = None
+    step = 0
+    scalars = []
+    for number, wire_type, field in _iter_fields(data):
+        if number == 1 and wire_type == 1:
+            wall_time = struct.unpack("<d", field)[0]
+        elif number == 2 and wire_type == 0:
+            step = field
+        elif number == 5 and wire_type == 2:
+            for value_number, value_wire, value_field in _iter_fields(field):
+                if value_number == 1 and value_wire == 2:
+                    tag, value = _parse_summary_value(value_field)
+                    if tag is not None and value is not None:
+                        scalars.append((tag, value))
+    return wall_time, step, scalars
+
+
+class EventFileTail:
+    """
+    增量读取TensorBoard事件文件（TFRecord格式），记录读取位置，末尾未写完整的记录留到下次读取
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+
+    def read(self):
+        """
+        Returns:
+            [{"time", "step", 标签: 数值, ...}, ...]
+        """
+        records = []
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        pos = 0
+        while pos + 12 <= len(data):
+            (length,) = struct.unpack("<Q", data[pos:pos + 8])
+            end = pos + 12 + length + 4
+            if end > len(data):
+                break
+            try:
+                wall_time, step, scalars = parse_event(data[pos + 12:pos + 12 + length])
+            except (ValueError, IndexError, struct.error) as e:
+                _log.warning(f"解析事件记录失败 {self.path}: {e}")
+                scalars = []
+            if scalars:
+                record = {"time": wall_time, "step": step}
+                record.update(scalars)
+                records.append(record)
+            pos = end
+        self.offset += pos
+        return records
+
+
+class EventLogSource:
+    """
+    在训练日志目录中查找本次训练的事件文件（目录名以log_prefix开头，且在训练开始后创建）并增量读取
+    """
+
+    def __init__(self, logging_dir, log_prefix, since=None):
+        self.logging_dir = logging_dir
+        self.log_prefix = log_prefix
+        self.since = since if since is not None else time.time()
+        self._tails = {}
+
+    def _find_files(self):
+        if not os.path.isdir(self.logging_dir):
+            return []
+        files = []
+        with os.scandir(self.logging_dir) as it:
+            for entry in it:
+                if not entry.is_dir() or not entry.name.startswith(self.log_prefix):
+                    continue
+                for dirpath, _, filenames in os.walk(entry.path):
+                    for filename in filenames:
+                        if filename.startswith(EVENT_FILE_PREFIX):
+                            path = os.path.join(dirpath, filename)
+                            # 允许少量时钟误差
+                            if os.path.getmtime(path) >= self.since - 60:
+                                files.append(path)
+        return files
+
+    def read(self):
+        for path in self._find_files():
+            if path not in self._tails:
+                self._tails[path] = EventFileTail(path)
+        records = []
+        for tail in self._tails.values():
+            try:
+                records.extend(tail.read())
+            except OSError as e:
+                _log.warning(f"读取事件文件失败 {tail.path}: {e}")
+        records.sort(key=lambda record: (record["time"] or 0, record["step"]))
+        return records
+
+
+class TextLogSource:
+    """
+    增量读取训练控制台输出的文本日志，解析进度条中的step、总步数、速度和损失，以及epoch行
+    """
+
+    def __init__(self, path, encoding="utf-8"):
+        self.path = path
+        self.encoding = encoding
+        self.offset = 0
+        self._partial = ""
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        self.offset += len(data)
+        text = self._partial + data.decode(self.encoding, "replace")
+        # 进度条用\r刷新，\r和\n都作为行分隔，最后一段可能不完整
+        lines = re.split(r"[\r\n]", text)
+        self._partial = lines.pop()
+        records = []
+        now = time.time()
+        for line in lines:
+            match = STEPS_PATTERN.search(line)
+            if match:
+                rate = float(match.group(3))
+                record = {
+                    "time": now,
+                    "step": int(match.group(1)),
+                    "total_steps": int(match.group(2)),
+                    "it/s": rate if match.group(4) == "it/s" else (1 / rate if rate else 0.0),
+                }
+                if match.group(5):
+                    record["loss"] = float(match.group(5))
+                records.append(record)
+                continue
+            match = EPOCH_PATTERN.search(line)
+            if match:
+                records.append({"time": now, "epoch": int(match.group(1)), "total_epochs": int(match.group(2))})
+        return records
+
+
+class ProgressTracker:
+    """
+    根据日志记录跟踪训练进度：step、epoch、损失、速度（it/s）和预计剩余时间，
+    step计数长时间不变时判断为卡住
+    """
+
+    def __init__(self, source, total_epochs=None, total_steps=None, rate_window=60):
+        """
+        Args:
+            source: EventLogSource 或 TextLogSource
+            total_epochs: 总epoch数（toml中的max_train_epochs）
+            total_steps: 总步数，未知时由第一个epoch的步数推算
+            rate_window: 计算速度的时间窗口（秒）
+        """
+        self.source = source
+        self.total_epochs = total_epochs
+        self.total_steps = total_steps
+        self.rate_window = rate_window
+        self.step = None
+        self.epoch = None
+        self.loss = None
+        self.rate = None
+        self.steps_per_epoch = None
+        # 最近的 (日志时间, step)，用于计算速度
+        self._history = deque()
+        # step最后一次增加时的本地时间
+        self.last_progress_time = None
+
+    def poll(self):
+        """读取新的日志记录并更新状态，返回新记录数"""
+        records = self.source.read()
+        now = time.time()
+        for record in records:
+            self._update(record, now)
+        return len(records)
+
+    def _update(self, record, now):
+        if "total_steps" in record:
+            self.total_steps = record["total_steps"]
+        if "total_epochs" in record:
+            self.total_epochs = record["total_epochs"]
+        if "it/s" in record:
+            self.rate = record["it/s"]
+        for tag in LOSS_TAGS:
+            if tag in record:
+                self.loss = record[tag]
+                break
+
+        epoch = record.get("epoch")
+        if epoch is None and any(tag in record for tag in EPOCH_TAGS):
+            # 事件日志中每个epoch结束时以epoch序号作为step记录一次
+            epoch = record["step"]
+            if self.step and epoch and self.steps_per_epoch is None:
+                self.steps_per_epoch = self.step // epoch
+            record = {key: value for key, value in record.items() if key != "step"}
+        if epoch is not None:
+            self.epoch = epoch
+
+        step = record.get("step")
+        if step is not None and (self.step is None or step > self.step):
+            self.step = step
+            self.last_progress_time = now
+            timestamp = record.get("time") or now
+            self._history.append((timestamp, step))
+            while len(self._history) > 2 and timestamp - self._history[0][0] > self.rate_window:
+                self._history.popleft()
+            if "it/s" not in record and len(self._history) >= 2:
+                (first_time, first_step), (last_time, last_step) = self._history[0], self._history[-1]
+                if last_time > first_time:
+                    self.rate = (last_step - first_step) / (last_time - first_time)
+
+    def has_progress(self):
+        return self.step is not None
+
+    def expected_total_steps(self):
+        if self.total_steps:
+            return self.total_steps
+        if self.steps_per_epoch and self.total_epochs:
+            return self.steps_per_epoch * self.total_epochs
+        return None
+
+    def eta(self):
+        """预计剩余秒数，无法估计时返回None"""
+        total = self.expected_total_steps()
+        if not total or not self.rate or self.step is None:
+            return None
+        return max(total - self.step, 0) / self.rate
+
+    def finished(self):
+        total = self.expected_total_steps()
+        if total and self.step is not None and self.step >= total:
+            return True
+        return bool(self.total_epochs and self.epoch and self.epoch >= self.total_epochs)
+
+    def stalled(self, timeout, now=None):
+        """step超过timeout秒没有增加"""
+        if self.last_progress_time is None:
+            return False
+        return (now or time.time()) - self.last_progress_time > timeout
+
+    def reset_stall(self):
+        """重启训练后重新计时"""
+        self.last_progress_time = time.time()
+
+    def summary(self):
+        """进度描述文本"""
+        parts = []
+        total = self.expected_total_steps()
+        if self.step is not None:
+            parts.append(f"step {self.step}/{total}" if total else f"step {self.step}")
+        if self.epoch is not None:
+            parts.append(f"epoch {self.epoch}/{self.total_epochs}" if self.total_epochs else f"epoch {self.epoch}")
+        if self.loss is not None:
+            parts.append(f"loss {self.loss:.4f}")
+        if self.rate:
+            parts.append(f"{self.rate:.2f} it/s")
+        eta = self.eta()
+        if eta is not None:
+            parts.append(f"剩余 {int(eta // 3600)}:{int(eta % 3600 // 60):02d}:{int(eta % 60):02d}")
+        return ", ".join(parts) if parts else "暂无进度"
@@ -5,7 +5,12 @@ import os
 import yaml
 from hashlib import md5
 
+from .translate_common import pack_batches
+
 class BaiduTranslator:
+    # 单次请求q的长度上限（UTF-8字节），官方建议不超过6000
+    MAX_QUERY_BYTES = 6000
+
     def __init__(self, appid=None, appkey=None):
         """
         初始化翻译器
@@ -25,6 +30,8 @@ class BaiduTranslator:
         self.path = '/api/trans/vip/translate'
         self.url = self.endpoint + self.path
         self.headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+        # 复用连接（keep-alive），不再每次请求重新建立连接
+        self.session = requests.Session()
         
     def _load_config(self):
         """
@@ -50,13 +57,10 @@ class BaiduTranslator:
         """
         return md5(s.encode(encoding)).hexdigest()
 
-    def translate(self, query, from_lang='zh', to_lang='en'):
+    def _request(self, query, from_lang, to_lang):
         """
-        翻译文本
-        :param query: 需要翻译的文本
-        :param from_lang: 源语言，默认中文
-        :param to_lang: 目标语言，默认英文
-        :return: 翻译结果或错误信息
+        发送一次翻译请求（参数放在请求体中，多行的长文本不受URL长度限制）
+        :return: 接口返回的字典
         """
         salt = random.randint(32768, 65536)
         sign = self._make_md5(self.appid + query + str(salt) + self.appkey)
@@ -68,16 +72,70 @@ class BaiduTranslator:
             'salt': salt,
             'sign': sign
         }
+        response = self.session.post(self.url, data=payload, headers=self.headers)
+        return response.json()
 
+    def translate(self, query, from_lang='zh', to_lang='en'):
+        """
+        翻译文本
+        :param query: 需要翻译的文本
+        :param from_lang: 源语言，默认中文
+        :param to_lang: 目标语言，默认英文
+        :return: 翻译结果或错误信息
+        """
         try:
-            response = requests.post(self.url, params=payload, headers=self.headers)
-            result = response.json()
+            result = self._request(query, from_lang, to_lang)
             if "error_code" in result:
                 return f"Error {result['error_code']}: {result.get('error_msg', 'Unknown error')}"
             return result['trans_result'][0]['dst']
         except requests.exceptions.RequestException as e:
             return f"Request failed: {e}"
 
+    def translate_batch(self, texts, from_lang='zh', to_lang='en'):
+        """
+        批量翻译：百度对q中的每一行分别翻译，把多条文本的各行拼接到同一个请求中，按长度上限分批
+        :param texts: 需要翻译的文本列表（文本本身可以包含多行）
+        :param from_lang: 源语言，默认中文
+        :param to_lang: 目标语言，默认英文
+        :return: 与texts等长的翻译结果列表，翻译失败的条目为None
+        """
+        # 把每条文本拆成非空行，记录每一行属于哪条文本
+        lines = []
+        owners = []
+        for owner, text in enumerate(texts):
+            for line in (text or "").split("\n"):
+                line = line.strip()
+                if line:
+                    lines.append(line)
+                    owners.append(owner)
+
+        translated = [None] * len(lines)
+        for batch in pack_batches(lines, self.MAX_QUERY_BYTES, size=lambda line: len(line.encode('utf-8')) + 1):
+            try:
+                result = self._request("\n".join(line for _, line in batch), from_lang, to_lang)
+            except requests.exceptions.RequestException as e:
+                print(f"百度批量翻译请求失败: {e}")
+                continue
+            if "error_code" in result:
+                print(f"百度批量翻译失败 {result['error_code']}: {result.get('error_msg', 'Unknown error')}")
+                continue
+            dst = [item['dst'] for item in result.get('trans_result', [])]
+            if len(dst) != len(batch):
+                print(f"百度批量翻译返回 {len(dst)} 行，与请求的 {len(batch)} 行不一致，丢弃该批结果")
+                continue
+            for (index, _), text in zip(batch, dst):
+                translated[index] = text
+
+        # 按原文本重新组合各行，任意一行失败则该条文本视为失败
+        parts = [[] for _ in texts]
+        failed = set()
+        for owner, text in zip(owners, translated):
+            if text is None:
+                failed.add(owner)
+            else:
+                parts[owner].append(text)
+        return [None if owner in failed else "\n".join(lines) for owner, lines in enumerate(parts)]
+
 # 使用示例
 if __name__ == "__main__":
     # 从配置文件加载API密钥
@@ -0,0 +1,27 @@
+def pack_batches(items, max_size, size=len, max_items=None):
+    """
+    按大小上限把条目依次打包成批次（保持原顺序），单个条目超过上限时单独成为一批
+
+    Args:
+        items: 条目列表
+        max_size: 每批的大小上限
+        size: 计算单个条目大小的函数
+        max_items: 每批的条目数上限，None表示不限制
+
+    Returns:
+        [[(原序号, 条目), ...], ...]
+    """
+    batches = []
+    current = []
+    current_size = 0
+    for index, item in enumerate(items):
+        item_size = size(item)
+        if current and (current_size + item_size > max_size or (max_items and len(current) >= max_items)):
+            batches.append(current)
+            current = []
+            current_size = 0
+        current.append((index, item))
+        current_size += item_size
+    if current:
+        batches.append(current)
+    return batches
@@ -4,11 +4,18 @@ import json
 import time
 import os
 import yaml
+import threading
+import http.client
 from datetime import datetime
 from http.client import HTTPSConnection
 
+from .translate_common import pack_batches
+
 
 class TencentTranslator:
+    # TextTranslateBatch 单次请求的文本总长度上限（字符）
+    MAX_BATCH_CHARS = 5000
+
     def __init__(self, secret_id=None, secret_key=None, source="zh", target="en", region=None):
         # 从配置文件加载API密钥和区域设置
         if secret_id is None or secret_key is None or region is None:
@@ -28,6 +35,9 @@ class TencentTranslator:
         self.algorithm = "TC3-HMAC-SHA256"
         self.version = "2018-03-21"
         self.action = "TextTranslate"
+        # 复用同一个HTTPS连接（keep-alive），不再每次请求重新握手
+        self._connection = None
+        self._lock = threading.Lock()
         
     def _load_config(self):
         """
@@ -47,12 +57,12 @@ class TencentTranslator:
     def sign(self, key, msg):
         return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
 
-    def build_canonical_request(self, payload):
+    def build_canonical_request(self, payload, action=None):
         http_request_method = "POST"
         canonical_uri = "/"
         canonical_querystring = ""
         ct = "application/json; charset=utf-8"
-        canonical_headers = f"content-type:{ct}\nhost:{self.host}\nx-tc-action:{self.action.lower()}\n"
+        canonical_headers = f"content-type:{ct}\nhost:{self.host}\nx-tc-action:{(action or self.action).lower()}\n"
         signed_headers = "content-type;host;x-tc-action"
         hashed_request_payload = hashlib.sha256(payload.encode("utf-8")).hexdigest()
         canonical_request = (
@@ -94,20 +104,19 @@ class TencentTranslator:
         )
         return authorization
 
-    def translate(self, text):
+    def _post(self, action, body):
+        """
+        签名并发送一次请求，连接断开时重新连接重试一次
+        :param action: 接口名称
+        :param body: 请求参数字典
+        :return: 响应内容字符串
+        """
         timestamp = int(time.time())
         date = datetime.utcfromtimestamp(timestamp).strftime("%Y-%m-%d")
-
-        # 构造请求 payload
-        payload = json.dumps({
-            "SourceText": text,
-            "Source": self.source,
-            "Target": self.target,
-            "ProjectId": 0  # 默认 ProjectId，可根据需求调整
-        })
+        payload = json.dumps(body)
 
         # 构造请求
-        canonical_request = self.build_canonical_request(payload)
+        canonical_request = self.build_canonical_request(payload, action)
         string_to_sign = self.build_string_to_sign(canonical_request, timestamp, date)
         signature = self.calculate_signature(string_to_sign, date)
         authorization = self.build_authorization(signature, date)
@@ -116,20 +125,72 @@ class TencentTranslator:
             "Authorization": authorization,
             "Content-Type": "application/json; charset=utf-8",
             "Host": self.host,
-            "X-TC-Action": self.action,
+            "X-TC-Action": action,
             "X-TC-Timestamp": str(timestamp),
             "X-TC-Version": self.version,
             "X-TC-Region": self.region
         }
 
+        with self._lock:
+            for attempt in range(2):
+                conn = self._connection or HTTPSConnection(self.host, timeout=30)
+                try:
+                    conn.request("POST", "/", headers=headers, body=payload.encode("utf-8"))
+                    data = conn.getresponse().read().decode("utf-8")
+                    self._connection = conn
+                    return data
+                except (http.client.HTTPException, OSError):
+                    conn.close()
+                    self._connection = None
+                    if attempt:
+                        raise
+
+    def translate(self, text):
+        # 构造请求 payload
+        body = {
+            "SourceText": text,
+            "Source": self.source,
+            "Target": self.target,
+            "ProjectId": 0  # 默认 ProjectId，可根据需求调整
+        }
         try:
-            req = HTTPSConnection(self.host)
-            req.request("POST", "/", headers=headers, body=payload.encode("utf-8"))
-            resp = req.getresponse()
-            return resp.read().decode("utf-8")
+            return self._post(self.action, body)
         except Exception as err:
             return str(err)
 
+    def translate_batch(self, texts):
+        """
+        批量翻译：使用 TextTranslateBatch 接口，一次请求翻译多条文本，按总长度上限分批
+        :param texts: 需要翻译的文本列表
+        :return: 与texts等长的翻译结果列表，空文本结果为空字符串，翻译失败的条目为None
+        """
+        results = [None if text and text.strip() else "" for text in texts]
+        pending = [text for text in texts if text and text.strip()]
+        positions = [i for i, text in enumerate(texts) if text and text.strip()]
+
+        for batch in pack_batches(pending, self.MAX_BATCH_CHARS):
+            body = {
+                "SourceTextList": [text for _, text in batch],
+                "Source": self.source,
+                "Target": self.target,
+                "ProjectId": 0
+            }
+            try:
+                response = json.loads(self._post("TextTranslateBatch", body))['Response']
+            except Exception as err:
+                print(f"腾讯批量翻译请求失败: {err}")
+                continue
+            if 'Error' in response:
+                print(f"腾讯批量翻译失败: {response['Error'].get('Message', response['Error'])}")
+                continue
+            targets = response.get('TargetTextList', [])
+            if len(targets) != len(batch):
+                print(f"腾讯批量翻译返回 {len(targets)} 条，与请求的 {len(batch)} 条不一致，丢弃该批结果")
+                continue
+            for (index, _), target in zip(batch, targets):
+                results[positions[index]] = target
+        return results
+
 
 # 使用示例
 if __name__ == "__main__":
@@ -0,0 +1,221 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+
+_log = logging.getLogger(__name__)
+
+# 默认的翻译记忆文件，保存在仓库根目录的cache文件夹下，所有项目共用
+DEFAULT_MEMORY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                   "cache", "translation_memory.json")
+MEMORY_VERSION = 1
+
+# 淘汰上限：条目数和原文+译文的总字符数，超过时淘汰最久未使用的条目
+DEFAULT_MAX_ENTRIES = 50000
+DEFAULT_MAX_CHARS = 20 * 1024 * 1024
+
+# 两次自动保存之间的最短间隔（秒）
+SAVE_INTERVAL = 60
+
+# 句子结尾：中文标点之后，或英文句末标点后跟空白（避免拆开 1.5 这样的小数）
+_SENTENCE_END = re.compile(r"(?<=[。！？；…])|(?<=[.!?;])(?=\s)")
+
+# 译文中句子之间不加空格的目标语言
+_CJK_LANGS = ("zh", "cht", "zh-tw", "wyw", "jp", "ja", "kor", "ko")
+
+
+def normalize_text(text):
+    """翻译记忆的键：NFKC规范化（全角/半角统一）并合并连续空白"""
+    return " ".join(unicodedata.normalize("NFKC", text or "").split())
+
+
+def split_sentences(text):
+    """
+    按行、再按句子拆分文本
+
+    Returns:
+        [[句子, ...], ...]，每行一个列表，空行为空列表
+    """
+    lines = []
+    for line in (text or "").split("\n"):
+        lines.append([part.strip() for part in _SENTENCE_END.split(line) if part.strip()])
+    return lines
+
+
+def join_sentences(lines, target):
+    """split_sentences 的逆操作，译文按目标语言决定句子之间是否加空格"""
+    joiner = "" if (target or "").lower() in _CJK_LANGS else " "
+    return "\n".join(joiner.join(sentences) for sentences in lines).strip()
+
+
+class TranslationMemory:
+    """
+    持久化的翻译记忆：按 (翻译服务, 源语言, 目标语言, 规范化原文) 缓存句子级译文，
+    文本只修改了部分句子时只需翻译新的句子；按最近使用顺序淘汰，并统计命中率
+    """
+
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES, max_chars=DEFAULT_MAX_CHARS,
+                 save_interval=SAVE_INTERVAL):
+        """
+        Args:
+            path: 记忆文件路径，None表示只在内存中缓存
+            max_entries: 条目数上限
+            max_chars: 原文+译文总字符数上限
+            save_interval: translate_many 结束时自动保存的最短间隔（秒）
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.save_interval = save_interval
+        # {(翻译服务, 源语言, 目标语言, 规范化原文): 译文}，按最近使用排序
+        self.entries = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        # 统计（句子级）
+        self.hits = 0
+        self.misses = 0
+        self.remote_sentences = 0
+        self.evictions = 0
+        if path:
+            self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MEMORY_VERSION:
+                for provider, source, target, text, translation in data.get("entries", []):
+                    self._store((provider, source, target, text), translation)
+                self._evict()
+        except Exception as e:
+            _log.warning(f"读取翻译记忆 {self.path} 失败: {e}")
+
+    def save(self, min_interval=0):
+        """
+        有新条目时保存（先写临时文件再替换）
+
+        Args:
+            min_interval: 距上次保存不足该秒数时跳过
+        """
+        if not self.path or not self._dirty or time.monotonic() - self._saved_at < min_interval:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with self._lock:
+            entries = [[*key, translation] for key, translation in self.entries.items()]
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": MEMORY_VERSION, "entries": entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+            self._saved_at = time.monotonic()
+
+    def _store(self, key, translation):
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self._chars -= len(key[3]) + len(old)
+        self.entries[key] = translation
+        self._chars += len(key[3]) + len(translation)
+
+    def _evict(self):
+        while self.entries and (len(self.entries) > self.max_entries or self._chars > self.max_chars):
+            key, translation = self.entries.popitem(last=False)
+            self._chars -= len(key[3]) + len(translation)
+            self.evictions += 1
+
+    def get(self, provider, source, target, text):
+        """返回缓存的译文并标记为最近使用，没有时返回None（不计入统计）"""
+        key = (provider, source, target, normalize_text(text))
+        with self._lock:
+            translation = self.entries.get(key)
+            if translation is not None:
+                self.entries.move_to_end(key)
+            return translation
+
+    def put(self, provider, source, target, text, translation):
+        if not translation:
+            return
+        with self._lock:
+            self._store((provider, source, target, normalize_text(text)), translation)
+            self._evict()
+            self._dirty = True
+
+    def translate_many(self, texts, source, target, providers):
+        """
+        按句子查询翻译记忆，未命中的句子依次交给各个翻译服务批量翻译
+
+        Args:
+            texts: 文本列表
+            source, target: 源语言和目标语言
+            providers: [(翻译服务名称, 批量翻译函数), ...]，按优先顺序排列；
+                       函数接收句子列表，返回等长的译文列表，失败的句子为None或空字符串
+
+        Returns:
+            与texts等长的译文列表，有句子所有翻译服务都翻译失败时该条为None
+        """
+        structures = [split_sentences(text) for text in texts]
+        sentences = list(dict.fromkeys(s for lines in structures for line in lines for s in line))
+
+        translated = {}
+        pending = []
+        for sentence in sentences:
+            for provider, _ in providers:
+                translation = self.get(provider, source, target, sentence)
+                if translation is not None:
+                    translated[sentence] = translation
+                    break
+            else:
+                pending.append(sentence)
+        self.hits += len(translated)
+        self.misses += len(pending)
+
+        for provider, translate in providers:
+            if not pending:
+                break
+            self.remote_sentences += len(pending)
+            try:
+                results = translate(pending)
+            except Exception as e:
+                _log.warning(f"{provider} 翻译失败: {e}")
+                continue
+            remaining = []
+            for sentence, translation in zip(pending, results):
+                if translation:
+                    translated[sentence] = translation
+                    self.put(provider, source, target, sentence, translation)
+                else:
+                    remaining.append(sentence)
+            pending = remaining + pending[len(results):]
+
+        results = []
+        for lines in structures:
+            if any(s not in translated for line in lines for s in line):
+                results.append(None)
+            else:
+                results.append(join_sentences([[translated[s] for s in line] for line in lines], target))
+        self.save(self.save_interval)
+        return results
+
+    def translate(self, text, source, target, providers):
+        """翻译单条文本，参数同 translate_many，失败时返回None"""
+        return self.translate_many([text], source, target, providers)[0]
+
+    def stats(self):
+        """命中率和容量统计"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "chars": self._chars,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "remote_sentences": self.remote_sentences,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,120 @@
+import logging
+import threading
+
+_log = logging.getLogger(__name__)
+
+# 进程内共享的"热"资源：队列模式下多个项目依次运行时复用，避免每个项目重新连接/加载
+_lock = threading.Lock()
+_comfy_clients = {}
+_translators = {}
+_chrome_pools = {}
+_translation_memory = None
+
+
+def get_comfy_client(server_address):
+    """
+    获取（或创建）指定ComfyUI服务器的WebSocket客户端，连接断开时自动重连
+
+    Args:
+        server_address: 服务器地址，格式如 "127.0.0.1:8191"
+
+    Returns:
+        ComfyWebSocketClient 实例
+    """
+    from .comfy_websocket_wrapper import ComfyWebSocketClient
+
+    with _lock:
+        client = _comfy_clients.get(server_address)
+        if client is None:
+            _log.info(f"创建ComfyUI连接: {server_address}")
+            client = ComfyWebSocketClient(server_address)
+            _comfy_clients[server_address] = client
+        elif not getattr(client.ws, "connected", False):
+            _log.info(f"ComfyUI连接已断开，重新连接: {server_address}")
+            client.connect()
+        return client
+
+
+def get_baidu_translator():
+    """
+    获取共享的百度翻译器实例（配置文件只加载一次）
+    """
+    from .translate_baidu_request import BaiduTranslator
+
+    with _lock:
+        translator = _translators.get("baidu")
+        if translator is None:
+            translator = BaiduTranslator()
+            _translators["baidu"] = translator
+        return translator
+
+
+def get_tencent_translator(source="auto", target="zh"):
+    """
+    获取共享的腾讯翻译器实例，按 (源语言, 目标语言) 缓存
+    """
+    from .translate_tencent_request import TencentTranslator
+
+    key = ("tencent", source, target)
+    with _lock:
+        translator = _translators.get(key)
+        if translator is None:
+            translator = TencentTranslator(source=source, target=target)
+            _translators[key] = translator
+        return translator
+
+
+def get_translation_memory():
+    """
+    获取共享的翻译记忆（使用默认的记忆文件，所有项目共用）
+    """
+    from .translation_memory import TranslationMemory, DEFAULT_MEMORY_PATH
+
+    global _translation_memory
+    with _lock:
+        if _translation_memory is None:
+            _translation_memory = TranslationMemory(DEFAULT_MEMORY_PATH)
+        return _translation_memory
+
+
+def get_chrome_pool(config, size=1):
+    """
+    获取（或创建）共享的Chrome会话池，按用户数据目录缓存，队列中的多个项目复用同一个浏览器
+
+    Args:
+        config: ChromeManager配置
+        size: 会话数量上限
+
+    Returns:
+        ChromePool 实例
+    """
+    from .ChromeManager import ChromePool
+
+    key = config['user_data_dir']
+    with _lock:
+        pool = _chrome_pools.get(key)
+        if pool is None:
+            pool = ChromePool(config, size=size)
+            _chrome_pools[key] = pool
+        return pool
+
+
+def close_all():
+    """
+    关闭所有共享资源（队列全部完成后调用）
+    """
+    with _lock:
+        for server_address, client in _comfy_clients.items():
+            try:
+                client.close()
+            except Exception as e:
+                _log.warning(f"关闭ComfyUI连接 {server_address} 时出错: {e}")
+        _comfy_clients.clear()
+        _translators.clear()
+        if _translation_memory is not None:
+            _log.info(f"翻译记忆: {_translation_memory.stats()}")
+            _translation_memory.save()
+        for key, pool in _chrome_pools.items():
+            _log.info(f"关闭Chrome会话池 {key}: {pool.stats()}")
+            pool.close()
+        _chrome_pools.clear()